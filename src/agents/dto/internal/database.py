@@ -33,10 +33,24 @@ class QueryResultDTO(BaseModel):
     rows: List[QueryResultRowDTO] = Field(default_factory=list, description="List of query result rows")
     row_count: int = Field(..., ge=0, description="Total number of rows returned")
     execution_time_ms: Optional[float] = Field(None, ge=0, description="Query execution time in milliseconds")
+    truncated: bool = Field(False, description="Whether the result was cut off by a row or size limit")
+    truncation_reason: Optional[str] = Field(None, description="Which limit truncated the result")
+    columnar: Optional[Any] = Field(None, description="Columnar result (pyarrow.Table) used instead of rows")
+    
+    class Config:
+        arbitrary_types_allowed = True
     
     @model_validator(mode='after')
     def validate_row_count_matches(self):
         """Ensure row_count matches the actual number of rows"""
+        if self.columnar is not None:
+            if self.rows:
+                raise ValueError("A columnar result cannot also carry rows")
+            if self.row_count != self.columnar.num_rows:
+                raise ValueError(
+                    f"row_count ({self.row_count}) does not match columnar result length ({self.columnar.num_rows})"
+                )
+            return self
         if self.row_count != len(self.rows):
             raise ValueError(
                 f"row_count ({self.row_count}) does not match actual number of rows ({len(self.rows)})"
@@ -47,6 +61,8 @@ class DatabaseQueryRequestDTO(BaseModel):
     """Represents a database query request"""
     query: str = Field(..., min_length=1, description="SQL query to execute")
     parameters: Optional[Dict[str, Any]] = Field(None, description="Query parameters for parameterized queries")
+    max_rows: Optional[int] = Field(None, ge=1, description="Maximum number of rows to return")
+    columnar: bool = Field(False, description="Return the result as a columnar table instead of rows")
     
     @field_validator('query')
     @classmethod
@@ -96,6 +112,8 @@ class QueryRequestDTO(BaseModel):
 class RunSQLRequestDTO(BaseModel):
     """Request to execute a SQL query"""
     sql: str = Field(..., min_length=1, description="SQL query to execute")
+    columnar: bool = Field(False, description="Return the result as a pyarrow.Table instead of a DataFrame")
+    use_cache: bool = Field(True, description="Serve and store the result through the SQL result cache")
     
     @field_validator('sql')
     @classmethod
@@ -124,6 +142,8 @@ class GeneratePlotlyCodeRequestDTO(BaseModel):
     question: str = Field(..., min_length=1, description="Natural language question about the visualization")
     sql: str = Field(..., min_length=1, description="SQL query that generated the data")
     df_metadata: Optional[str] = Field(None, description="Metadata about the DataFrame structure")
+    df_schema: Optional[Dict[str, str]] = Field(None, description="Column name -> dtype of the result, used by the rule-based chart synthesizer")
+    row_count: Optional[int] = Field(None, ge=0, description="Number of rows in the result")
     
     @field_validator('question', 'sql')
     @classmethod
@@ -173,6 +193,14 @@ class GetPlotlyFigureRequestDTO(BaseModel):
         return v
 
 # === Vanna Data Agent Response DTOs ===
+class PlanEstimateDTO(BaseModel):
+    """Planner estimate for a SQL query, read from EXPLAIN (FORMAT JSON)"""
+    total_cost: float = Field(..., ge=0, description="Estimated total cost of the root plan node")
+    plan_rows: int = Field(..., ge=0, description="Estimated number of rows returned")
+    max_scan_rows: int = Field(0, ge=0, description="Largest estimated row count produced by a table scan")
+    node_type: Optional[str] = Field(None, description="Node type of the root plan node")
+    seq_scans: List[str] = Field(default_factory=list, description="Relations read with a sequential scan")
+
 class GenerateSQLResultDTO(BaseModel):
     """Response containing generated SQL query"""
     result: str = Field(..., description="Generated SQL query")
@@ -187,9 +215,12 @@ class GenerateSQLResultDTO(BaseModel):
 
 class RunSQLResultDTO(BaseModel):
     """Response containing SQL query execution results"""
-    result: Any = Field(..., description="DataFrame containing query results")
+    result: Any = Field(..., description="DataFrame (or pyarrow.Table for columnar requests) containing query results")
     row_count: Optional[int] = Field(None, ge=0, description="Number of rows returned")
     execution_time_ms: Optional[float] = Field(None, ge=0, description="Execution time in milliseconds")
+    plan_estimate: Optional[PlanEstimateDTO] = Field(None, description="Planner estimate of the executed query")
+    bounded_sql: Optional[str] = Field(None, description="Rewritten SQL actually executed when the query was bounded")
+    cached: bool = Field(False, description="Whether the result was served from the SQL result cache")
     
     class Config:
         arbitrary_types_allowed = True
@@ -197,12 +228,13 @@ class RunSQLResultDTO(BaseModel):
     @field_validator('result')
     @classmethod
     def validate_result_dataframe(cls, v: Any) -> Any:
-        """Validate that result is a DataFrame"""
+        """Validate that result is a DataFrame or pyarrow.Table"""
         try:
             import pandas as pd
-            if not isinstance(v, pd.DataFrame):
+            import pyarrow as pa
+            if not isinstance(v, (pd.DataFrame, pa.Table)):
                 # Changed to TypeError for type mismatch
-                raise TypeError("Result must be a pandas DataFrame")
+                raise TypeError("Result must be a pandas DataFrame or pyarrow Table")
         except ImportError:
             pass
         return v
@@ -213,7 +245,7 @@ class RunSQLResultDTO(BaseModel):
         if self.row_count is not None:
             try:
                 import pandas as pd
-                if isinstance(self.result, pd.DataFrame):
+                if isinstance(self.result, pd.DataFrame) or hasattr(self.result, "num_rows"):
                     actual_count = len(self.result)
                     if self.row_count != actual_count:
                         raise ValueError(
@@ -226,6 +258,7 @@ class RunSQLResultDTO(BaseModel):
 class GeneratePlotlyCodeResultDTO(BaseModel):
     """Response containing generated Plotly code"""
     result: str = Field(..., description="Generated Plotly visualization code")
+    synthesized: bool = Field(False, description="Whether the code was built by the rule-based synthesizer instead of the LLM")
     
     @field_validator('result')
     @classmethod
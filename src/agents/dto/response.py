@@ -27,6 +27,7 @@ class ErrorType(str, Enum):
     UNAUTHORIZED = "unauthorized"
     INTERNAL_ERROR = "internal_error"
     EXAMPLE_ERROR = "example_error"
+    QUERY_TOO_EXPENSIVE = "query_too_expensive"
 
 class ErrorDTO(BaseModel):
     type: ErrorType
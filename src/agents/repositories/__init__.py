@@ -1,3 +1,12 @@
 from src.agents.repositories.ss.data import HistorianDatabaseRepository
 from src.agents.repositories.vanna import CustomVanna, VannaRepository
-from src.agents.repositories.reporting import ReportingRepository
\ No newline at end of file
+from src.agents.repositories.reporting import ReportingRepository
+from src.agents.repositories.sql_cache import SemanticSQLCache
+from src.agents.repositories.sql_templates import SQLTemplateEngine
+from src.agents.repositories.prompt_builder import PromptBuilder
+from src.agents.repositories.pg_pool import PostgresConnectionPool
+from src.agents.repositories.result_cache import SQLResultCache
+from src.agents.repositories.result_store import QueryResultStore
+from src.agents.repositories.conversation_archive import ConversationArchiveRepository
+from src.agents.repositories.plotly_code_cache import PlotlyCodeCache
+from src.agents.repositories.artifact_cache import ArtifactCache
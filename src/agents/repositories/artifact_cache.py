@@ -0,0 +1,318 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from src.core import logger
+
+
+@dataclass(frozen=True)
+class CachedArtifact:
+    """An artifact version as stored (possibly compressed), with what is needed to decode it."""
+    data: bytes
+    mime_type: str
+    codec: str
+
+
+class ArtifactCache:
+    """
+    Two-tier read cache of artifact versions, keyed by (path, version).
+
+    The memory tier is an LRU bounded by total payload bytes. The optional disk tier keeps one
+    file per version under disk_path, also LRU-bounded by bytes; memory misses that hit on disk
+    are promoted back to memory. Payloads are cached as stored, so compressed artifacts take
+    their compressed size in both tiers.
+
+    Saved versions never change and version numbers are never reused (deleting an artifact keeps its
+    version counter), so entries are only dropped by eviction or when the artifact is deleted. The "latest version" of each path is remembered separately: it is cleared by every
+    save or delete through this process and expires after latest_ttl_seconds, which bounds how
+    long a save made by another process can go unseen.
+    """
+
+    # Paths whose last invalidation is remembered individually; older ones share one floor
+    _MAX_TRACKED_INVALIDATIONS = 4096
+
+    def __init__(
+        self,
+        max_bytes: int = 128 * 1024 * 1024,
+        max_entry_bytes: int = 16 * 1024 * 1024,
+        disk_path: Optional[str] = None,
+        disk_max_bytes: int = 1024 * 1024 * 1024,
+        latest_ttl_seconds: Optional[float] = 30,
+    ):
+        """
+        Args:
+            max_bytes: Maximum total size of payloads held in memory before LRU eviction.
+            max_entry_bytes: Payloads larger than this are not cached.
+            disk_path: Directory of the disk tier. None keeps the cache in memory only.
+            disk_max_bytes: Maximum total size of the disk tier before LRU eviction.
+            latest_ttl_seconds: How long the latest version of a path is trusted. None never expires it.
+        """
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.disk_path = Path(disk_path) if disk_path else None
+        self.disk_max_bytes = disk_max_bytes
+        self.latest_ttl_seconds = latest_ttl_seconds
+
+        self._entries: "OrderedDict[Tuple[str, int], CachedArtifact]" = OrderedDict()
+        self._bytes = 0
+        self._disk_entries: "OrderedDict[Tuple[str, int], int]" = OrderedDict()
+        self._disk_bytes = 0
+        self._latest: Dict[str, Tuple[int, float]] = {}
+        # Bumped by every invalidation and recorded for the invalidated path; a load of that path
+        # that started before it must not be cached, loads of other paths are unaffected
+        self._generation = 0
+        self._invalidated_at: "OrderedDict[str, int]" = OrderedDict()
+        # Highest generation dropped from _invalidated_at; applies to every path not listed there
+        self._invalidated_floor = 0
+        self._lock = threading.Lock()
+
+        self._memory_hits = 0
+        self._disk_hits = 0
+        self._misses = 0
+        self._latest_hits = 0
+        self._evictions = 0
+        self._disk_evictions = 0
+        self._invalidations = 0
+        self._skipped_too_large = 0
+        self._disk_errors = 0
+
+        if self.disk_path is not None:
+            self.disk_path.mkdir(parents=True, exist_ok=True)
+            self._load_disk_index()
+
+    # --- disk tier ------------------------------------------------------------------------
+
+    def _path_dir(self, path: str) -> Path:
+        # Artifact paths contain user-controlled filenames; hash them into a flat directory name
+        return self.disk_path / hashlib.sha256(path.encode("utf-8")).hexdigest()[:32]
+
+    def _disk_file(self, path: str, version: int) -> Path:
+        return self._path_dir(path) / f"{version}.bin"
+
+    def _load_disk_index(self) -> None:
+        """Index files left by a previous process, oldest first. Their paths are read from the headers."""
+        files = []
+        for file in self.disk_path.glob("*/*.bin"):
+            try:
+                with open(file, "rb") as f:
+                    header = json.loads(f.readline())
+                files.append((file.stat().st_mtime, header["path"], int(file.stem), file.stat().st_size))
+            except (OSError, ValueError, KeyError):
+                file.unlink(missing_ok=True)
+        for _, path, version, size in sorted(files):
+            self._disk_entries[(path, version)] = size
+            self._disk_bytes += size
+
+    def _read_disk(self, path: str, version: int) -> Optional[CachedArtifact]:
+        file = self._disk_file(path, version)
+        try:
+            with open(file, "rb") as f:
+                header = json.loads(f.readline())
+                data = f.read()
+            os.utime(file)
+        except (OSError, ValueError) as e:
+            if not isinstance(e, FileNotFoundError):
+                self._disk_errors += 1
+                logger.warning(f"ArtifactCache could not read {file}: {e}")
+            return None
+        return CachedArtifact(data=data, mime_type=header["mime_type"], codec=header["codec"])
+
+    def _write_disk(self, path: str, version: int, artifact: CachedArtifact) -> Optional[int]:
+        file = self._disk_file(path, version)
+        header = json.dumps({"path": path, "mime_type": artifact.mime_type, "codec": artifact.codec}).encode("utf-8")
+        # Write to a temp name first so readers never see a partial file
+        tmp_file = file.with_suffix(f".{threading.get_ident()}.tmp")
+        try:
+            file.parent.mkdir(exist_ok=True)
+            with open(tmp_file, "wb") as f:
+                f.write(header + b"\n")
+                f.write(artifact.data)
+            os.replace(tmp_file, file)
+            return file.stat().st_size
+        except OSError as e:
+            self._disk_errors += 1
+            logger.warning(f"ArtifactCache could not write {file}: {e}")
+            tmp_file.unlink(missing_ok=True)
+            return None
+
+    # --- cache operations -----------------------------------------------------------------
+
+    def _forget_latest(self, key: Tuple[str, int]) -> None:
+        # Called with the lock held once a version is in neither tier
+        path, version = key
+        if key not in self._entries and key not in self._disk_entries and self._latest.get(path, (None,))[0] == version:
+            del self._latest[path]
+
+    def _put_memory(self, key: Tuple[str, int], artifact: CachedArtifact) -> None:
+        # Called with the lock held
+        if key in self._entries:
+            self._bytes -= len(self._entries.pop(key).data)
+        self._entries[key] = artifact
+        self._bytes += len(artifact.data)
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            oldest, evicted = self._entries.popitem(last=False)
+            self._bytes -= len(evicted.data)
+            self._evictions += 1
+            self._forget_latest(oldest)
+
+    def generation(self) -> int:
+        """Token to pass to put(): loads that overlap an invalidation of their path are not cached."""
+        with self._lock:
+            return self._generation
+
+    def _is_stale(self, path: str, generation: int) -> bool:
+        # Called with the lock held
+        return self._invalidated_at.get(path, self._invalidated_floor) > generation
+
+    def _bump_generation(self, path: str) -> None:
+        # Called with the lock held
+        self._generation += 1
+        self._invalidated_at.pop(path, None)
+        self._invalidated_at[path] = self._generation
+        while len(self._invalidated_at) > self._MAX_TRACKED_INVALIDATIONS:
+            _, generation = self._invalidated_at.popitem(last=False)
+            self._invalidated_floor = max(self._invalidated_floor, generation)
+
+    def get_latest(self, path: str) -> Optional[CachedArtifact]:
+        """Return the latest version of a path if it is known and fresh and still cached, else None."""
+        with self._lock:
+            latest = self._latest.get(path)
+            if latest is not None and self.latest_ttl_seconds is not None and time.monotonic() - latest[1] > self.latest_ttl_seconds:
+                del self._latest[path]
+                latest = None
+            if latest is None:
+                self._misses += 1
+                return None
+            self._latest_hits += 1
+        return self.get(path, latest[0])
+
+    def get(self, path: str, version: int) -> Optional[CachedArtifact]:
+        """
+        Return a cached artifact version, or None on a miss.
+
+        Memory is checked first, then the disk tier; disk hits are promoted to memory.
+        """
+        key = (path, version)
+        with self._lock:
+            artifact = self._entries.get(key)
+            if artifact is not None:
+                self._entries.move_to_end(key)
+                self._memory_hits += 1
+                return artifact
+            on_disk = key in self._disk_entries
+            generation = self._generation
+            if not on_disk:
+                self._misses += 1
+                return None
+
+        artifact = self._read_disk(path, version)
+        with self._lock:
+            if artifact is None and key in self._disk_entries:
+                self._disk_bytes -= self._disk_entries.pop(key)
+            if artifact is None or self._is_stale(path, generation):
+                self._misses += 1
+                return None
+            if key in self._disk_entries:
+                self._disk_entries.move_to_end(key)
+            self._disk_hits += 1
+            self._put_memory(key, artifact)
+        return artifact
+
+    def put(self, path: str, version: int, artifact: CachedArtifact, generation: int, latest: bool = False) -> bool:
+        """
+        Cache an artifact version loaded from the database.
+
+        Args:
+            path: The artifact path.
+            version: The version loaded.
+            artifact: The payload as stored.
+            generation: generation() read before the database load started.
+            latest: The version was loaded as the path's latest version.
+
+        Returns:
+            True when the artifact was cached.
+        """
+        key = (path, version)
+        with self._lock:
+            if self._is_stale(path, generation):
+                return False
+            if len(artifact.data) > self.max_entry_bytes:
+                self._skipped_too_large += 1
+                return False
+            self._put_memory(key, artifact)
+            if latest:
+                self._latest[path] = (version, time.monotonic())
+            write_disk = self.disk_path is not None and key not in self._disk_entries
+
+        if not write_disk:
+            return True
+        size = self._write_disk(path, version, artifact)
+        evicted = []
+        with self._lock:
+            if size is None:
+                return True
+            if self._is_stale(path, generation):
+                # Invalidated while writing: the file may belong to a deleted artifact
+                evicted.append(key)
+            else:
+                self._disk_entries[key] = size
+                self._disk_bytes += size
+                while self._disk_bytes > self.disk_max_bytes and len(self._disk_entries) > 1:
+                    oldest, oldest_size = self._disk_entries.popitem(last=False)
+                    self._disk_bytes -= oldest_size
+                    self._disk_evictions += 1
+                    self._forget_latest(oldest)
+                    evicted.append(oldest)
+        for evicted_path, evicted_version in evicted:
+            self._disk_file(evicted_path, evicted_version).unlink(missing_ok=True)
+        return True
+
+    def invalidate_latest(self, path: str) -> None:
+        """Forget the latest version of a path (a new version was saved)."""
+        with self._lock:
+            self._bump_generation(path)
+            self._latest.pop(path, None)
+
+    def invalidate(self, path: str) -> None:
+        """Drop every cached version of a path from both tiers (the artifact was deleted)."""
+        with self._lock:
+            self._bump_generation(path)
+            self._invalidations += 1
+            self._latest.pop(path, None)
+            for key in [key for key in self._entries if key[0] == path]:
+                self._bytes -= len(self._entries.pop(key).data)
+            for key in [key for key in self._disk_entries if key[0] == path]:
+                self._disk_bytes -= self._disk_entries.pop(key)
+        if self.disk_path is not None:
+            shutil.rmtree(self._path_dir(path), ignore_errors=True)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters per tier, hit ratio, evictions and memory/disk use."""
+        with self._lock:
+            hits = self._memory_hits + self._disk_hits
+            lookups = hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "disk_entries": len(self._disk_entries),
+                "disk_bytes": self._disk_bytes,
+                "disk_max_bytes": self.disk_max_bytes if self.disk_path is not None else 0,
+                "memory_hits": self._memory_hits,
+                "disk_hits": self._disk_hits,
+                "misses": self._misses,
+                "hit_ratio": hits / lookups if lookups else 0.0,
+                "latest_hits": self._latest_hits,
+                "evictions": self._evictions,
+                "disk_evictions": self._disk_evictions,
+                "invalidations": self._invalidations,
+                "skipped_too_large": self._skipped_too_large,
+                "disk_errors": self._disk_errors,
+            }
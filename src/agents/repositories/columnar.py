@@ -0,0 +1,78 @@
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+import pyarrow as pa
+
+from src.core import logger
+
+
+def _column_array(values: Sequence[Any]) -> pa.Array:
+    """Convert one column of driver values, falling back to strings for values Arrow cannot type."""
+    try:
+        return pa.array(values, from_pandas=True)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError) as e:
+        logger.debug(f"Falling back to string column for Arrow conversion: {e}")
+        return pa.array([None if value is None else str(value) for value in values], type=pa.string())
+
+
+def table_from_dataframe(df: Any) -> pa.Table:
+    """
+    Convert a pandas DataFrame to an Arrow table (without its index).
+
+    Object columns Arrow cannot type as a whole (mixed values, inet addresses, ...) fall back to
+    strings column by column, as driver rows do in record_batch_from_rows.
+    """
+    try:
+        return pa.Table.from_pandas(df, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError) as e:
+        logger.debug(f"Converting DataFrame column by column for Arrow: {e}")
+    arrays = []
+    for column in df.columns:
+        values = df[column]
+        arrays.append(_column_array(values.tolist()) if values.dtype == object else pa.array(values, from_pandas=True))
+    return pa.Table.from_arrays(arrays, names=[str(column) for column in df.columns])
+
+
+def record_batch_from_rows(column_names: Sequence[str], rows: Sequence[Sequence[Any]]) -> pa.RecordBatch:
+    """
+    Build an Arrow record batch from a batch of driver row tuples.
+
+    The batch is transposed once into columns; no per-row dicts or DTOs are created.
+    """
+    columns = list(zip(*rows)) if rows else [() for _ in column_names]
+    return pa.RecordBatch.from_arrays([_column_array(column) for column in columns], names=list(column_names))
+
+
+def table_from_batches(column_names: Sequence[str], batches: Iterable[Sequence[Sequence[Any]]]) -> pa.Table:
+    """
+    Build an Arrow table from batches of driver row tuples (e.g. cursor.fetchmany results).
+
+    Column types are inferred per batch and unified, so a leading batch of NULLs does not pin
+    a column to the null type.
+    """
+    tables = [pa.Table.from_batches([record_batch_from_rows(column_names, rows)]) for rows in batches if rows]
+    if not tables:
+        return pa.table({name: pa.array([], type=pa.null()) for name in column_names})
+    if len(tables) == 1:
+        return tables[0]
+    return pa.concat_tables(tables, promote_options="permissive")
+
+
+def table_to_rows(table: pa.Table) -> List[Dict[str, Any]]:
+    """Row form of an Arrow table, for callers that really need a list of dicts."""
+    return table.to_pylist()
+
+
+def table_to_dataframe(table: pa.Table):
+    """Convert an Arrow table to a pandas DataFrame (zero-copy where the column types allow it)."""
+    return table.to_pandas()
+
+
+def table_to_numpy(table: pa.Table) -> Dict[str, np.ndarray]:
+    """Dict of NumPy arrays, one per column."""
+    return {name: table.column(name).to_numpy(zero_copy_only=False) for name in table.column_names}
+
+
+def slice_rows(table: pa.Table, limit: Optional[int]) -> pa.Table:
+    """First `limit` rows of a table (the whole table when limit is None)."""
+    return table if limit is None else table.slice(0, limit)
@@ -0,0 +1,125 @@
+import json
+import threading
+from typing import Any, Dict, List, Optional
+
+import psycopg2
+
+from src.core import logger
+from src.agents.repositories.pg_pool import PostgresConnectionPool
+
+
+class ConversationArchiveRepository:
+    """
+    Cold storage for Vanna conversations evicted from session state.
+
+    Conversations are stored as JSONB rows keyed by (session_key, conversation_id) in a table
+    created on first use, so evicted entries can still be resolved by id on demand.
+    """
+
+    def __init__(self, pool: PostgresConnectionPool, table: str = "vanna_conversation_archive"):
+        """
+        Args:
+            pool: Shared PostgreSQL connection pool.
+            table: Name of the archive table.
+        """
+        self.pool = pool
+        self.table = table
+        self._schema_ready = False
+        self._schema_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._archived = 0
+        self._restored = 0
+        self._errors = 0
+
+    def _ensure_table(self, conn) -> None:
+        if self._schema_ready:
+            return
+        with self._schema_lock:
+            if self._schema_ready:
+                return
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    f"""
+                    CREATE TABLE IF NOT EXISTS {self.table} (
+                        session_key TEXT NOT NULL,
+                        conversation_id TEXT NOT NULL,
+                        question TEXT,
+                        archived_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+                        conversation JSONB NOT NULL,
+                        PRIMARY KEY (session_key, conversation_id)
+                    )
+                    """
+                )
+            conn.commit()
+            self._schema_ready = True
+
+    def archive(self, session_key: str, conversations: List[Dict[str, Any]]) -> int:
+        """
+        Write evicted conversations to the archive table.
+
+        Args:
+            session_key: Identifier of the session the conversations belong to.
+            conversations: Conversation dicts as stored in session state.
+
+        Returns:
+            Number of conversations archived (0 when the write failed; the failure is logged).
+        """
+        if not conversations:
+            return 0
+        try:
+            with self.pool.connection() as conn:
+                self._ensure_table(conn)
+                with conn.cursor() as cursor:
+                    cursor.executemany(
+                        f"""
+                        INSERT INTO {self.table} (session_key, conversation_id, question, conversation)
+                        VALUES (%s, %s, %s, %s)
+                        ON CONFLICT (session_key, conversation_id)
+                        DO UPDATE SET conversation = EXCLUDED.conversation, archived_at = now()
+                        """,
+                        [
+                            (session_key, conversation["id"], conversation.get("question"), json.dumps(conversation, default=str))
+                            for conversation in conversations
+                        ],
+                    )
+                conn.commit()
+        except psycopg2.Error as e:
+            with self._stats_lock:
+                self._errors += 1
+            logger.error(f"ConversationArchiveRepository.archive failed: {e}")
+            return 0
+        with self._stats_lock:
+            self._archived += len(conversations)
+        return len(conversations)
+
+    def load(self, session_key: str, conversation_id: str) -> Optional[Dict[str, Any]]:
+        """Load an archived conversation by id, or None if it was never archived."""
+        try:
+            with self.pool.connection() as conn:
+                self._ensure_table(conn)
+                with conn.cursor() as cursor:
+                    cursor.execute(
+                        f"SELECT conversation FROM {self.table} WHERE session_key = %s AND conversation_id = %s",
+                        (session_key, conversation_id),
+                    )
+                    row = cursor.fetchone()
+        except psycopg2.Error as e:
+            with self._stats_lock:
+                self._errors += 1
+            logger.error(f"ConversationArchiveRepository.load failed: {e}")
+            return None
+        if row is None:
+            return None
+        with self._stats_lock:
+            self._restored += 1
+        # psycopg2 decodes JSONB to a dict
+        return row[0]
+
+    def stats(self) -> Dict[str, Any]:
+        """Return archive/restore counters."""
+        with self._stats_lock:
+            return {
+                "archived": self._archived,
+                "restored": self._restored,
+                "errors": self._errors,
+            }
@@ -0,0 +1,347 @@
+import asyncio
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+import asyncpg
+import pandas as pd
+import psycopg2
+import psycopg2.extensions
+import pyarrow as pa
+from psycopg2.pool import ThreadedConnectionPool
+from vanna.exceptions import ValidationError
+
+from src.core import logger
+from src.core.errors import ConnectionPoolTimeoutError
+from src.agents.repositories.columnar import table_from_batches
+
+
+class PostgresConnectionPool:
+    """
+    Shared PostgreSQL connections for CustomVanna.run_sql.
+
+    Synchronous callers borrow from a psycopg2 ThreadedConnectionPool; async callers use an asyncpg
+    pool created lazily on the running event loop. Both pools are bounded by max_size and wait at
+    most acquire_timeout seconds for a free connection before raising ConnectionPoolTimeoutError.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        dbname: str,
+        user: str,
+        password: str,
+        port: Any = 5432,
+        min_size: int = 1,
+        max_size: int = 10,
+        acquire_timeout: float = 10.0,
+        statement_timeout_ms: int = 60000,
+        fetch_size: int = 5000,
+    ):
+        """
+        Args:
+            host: Database host.
+            dbname: Database name.
+            user: Database user.
+            password: Database password.
+            port: Database port.
+            min_size: Connections opened up front by each pool.
+            max_size: Maximum connections per pool (sync and async are sized separately).
+            acquire_timeout: Seconds to wait for a free connection.
+            statement_timeout_ms: Server-side statement_timeout applied to every connection.
+            fetch_size: Rows per fetch when building columnar (Arrow) results.
+        """
+        self.host = host
+        self.dbname = dbname
+        self.user = user
+        self.password = password
+        self.port = int(port) if port else 5432
+        self.min_size = min_size
+        self.max_size = max_size
+        self.acquire_timeout = acquire_timeout
+        self.statement_timeout_ms = statement_timeout_ms
+        self.fetch_size = fetch_size
+
+        self._pool: Optional[ThreadedConnectionPool] = None
+        self._pool_lock = threading.Lock()
+        # ThreadedConnectionPool raises instead of waiting when exhausted; the semaphore makes callers queue
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._async_pool: Optional[asyncpg.Pool] = None
+        self._async_pool_lock: Optional[asyncio.Lock] = None
+
+        self._stats_lock = threading.Lock()
+        self._in_use = 0
+        self._acquires = 0
+        self._timeouts = 0
+        self._wait_ms = 0.0
+        self._async_acquires = 0
+        self._async_timeouts = 0
+        self._async_wait_ms = 0.0
+
+    # --- sync -----------------------------------------------------------------------------
+
+    def _get_pool(self) -> ThreadedConnectionPool:
+        """Lazy initialization of the psycopg2 pool."""
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    self._pool = ThreadedConnectionPool(
+                        self.min_size,
+                        self.max_size,
+                        host=self.host,
+                        dbname=self.dbname,
+                        user=self.user,
+                        password=self.password,
+                        port=self.port,
+                        options=f"-c statement_timeout={self.statement_timeout_ms}",
+                    )
+        return self._pool
+
+    @contextmanager
+    def connection(self) -> Iterator[Any]:
+        """Borrow a psycopg2 connection, returning it (or discarding it if broken) afterwards."""
+        start = time.perf_counter()
+        if not self._slots.acquire(timeout=self.acquire_timeout):
+            with self._stats_lock:
+                self._timeouts += 1
+            raise ConnectionPoolTimeoutError(
+                f"No database connection available within {self.acquire_timeout}s (pool size {self.max_size})"
+            )
+        pool = None
+        conn = None
+        broken = False
+        try:
+            pool = self._get_pool()
+            conn = pool.getconn()
+            with self._stats_lock:
+                self._acquires += 1
+                self._in_use += 1
+                self._wait_ms += (time.perf_counter() - start) * 1000
+            yield conn
+        except psycopg2.extensions.QueryCanceledError:
+            # statement_timeout cancelled the query; the connection itself is still usable
+            raise
+        except (psycopg2.InterfaceError, psycopg2.OperationalError) as e:
+            broken = isinstance(e, psycopg2.InterfaceError) or bool(conn is not None and conn.closed)
+            # Lets run_sql tell a lost connection apart from a failed statement
+            e.connection_lost = broken
+            raise
+        finally:
+            if conn is not None:
+                with self._stats_lock:
+                    self._in_use -= 1
+                if not broken and not conn.closed:
+                    try:
+                        # End the read transaction so the connection is not left idle in transaction
+                        conn.rollback()
+                    except psycopg2.Error:
+                        broken = True
+                pool.putconn(conn, close=broken or bool(conn.closed))
+            self._slots.release()
+
+    def _execute(self, sql: str) -> pd.DataFrame:
+        with self.connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(sql)
+                if cursor.description is None:
+                    return pd.DataFrame()
+                results = cursor.fetchall()
+                return pd.DataFrame(results, columns=[desc[0] for desc in cursor.description])
+
+    def _execute_arrow(self, sql: str) -> pa.Table:
+        with self.connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(sql)
+                if cursor.description is None:
+                    return pa.table({})
+                column_names = [desc[0] for desc in cursor.description]
+                return table_from_batches(column_names, iter(lambda: cursor.fetchmany(self.fetch_size), []))
+
+    def run_sql_arrow(self, sql: str) -> pa.Table:
+        """
+        Run a query on a pooled connection into an Arrow table, built from fetchmany batches.
+
+        Args:
+            sql: The SQL to run.
+
+        Returns:
+            The result as a pyarrow.Table.
+        """
+        try:
+            return self._execute_arrow(sql)
+        except psycopg2.Error as e:
+            raise ValidationError(e)
+
+    def run_sql(self, sql: str) -> pd.DataFrame:
+        """
+        Run a query on a pooled connection.
+
+        Args:
+            sql: The SQL to run.
+
+        Returns:
+            The result as a DataFrame.
+        """
+        try:
+            return self._execute(sql)
+        except psycopg2.extensions.QueryCanceledError as e:
+            # Hit statement_timeout; running it again would only hold the slot for another timeout
+            raise ValidationError(e)
+        except (psycopg2.InterfaceError, psycopg2.OperationalError) as e:
+            if not getattr(e, "connection_lost", False):
+                raise ValidationError(e)
+            # The server closed an idle connection; retry once on a fresh one
+            logger.warning(f"PostgresConnectionPool retrying query after connection error: {e}")
+            try:
+                return self._execute(sql)
+            except psycopg2.Error as retry_error:
+                raise ValidationError(retry_error)
+        except psycopg2.Error as e:
+            raise ValidationError(e)
+
+    # --- async ----------------------------------------------------------------------------
+
+    async def _get_async_pool(self) -> asyncpg.Pool:
+        """Lazy initialization of the asyncpg pool."""
+        if self._async_pool is None:
+            if self._async_pool_lock is None:
+                self._async_pool_lock = asyncio.Lock()
+            async with self._async_pool_lock:
+                if self._async_pool is None:
+                    self._async_pool = await asyncpg.create_pool(
+                        host=self.host,
+                        database=self.dbname,
+                        user=self.user,
+                        password=self.password,
+                        port=self.port,
+                        min_size=self.min_size,
+                        max_size=self.max_size,
+                        server_settings={"statement_timeout": str(self.statement_timeout_ms)},
+                    )
+        return self._async_pool
+
+    async def _acquire_async(self) -> Tuple[asyncpg.Pool, asyncpg.Connection]:
+        pool = await self._get_async_pool()
+        start = time.perf_counter()
+        try:
+            conn = await pool.acquire(timeout=self.acquire_timeout)
+        except asyncio.TimeoutError:
+            with self._stats_lock:
+                self._async_timeouts += 1
+            raise ConnectionPoolTimeoutError(
+                f"No database connection available within {self.acquire_timeout}s (pool size {self.max_size})"
+            )
+        with self._stats_lock:
+            self._async_acquires += 1
+            self._async_wait_ms += (time.perf_counter() - start) * 1000
+        return pool, conn
+
+    @staticmethod
+    async def _prepare(conn: asyncpg.Connection, sql: str) -> asyncpg.prepared_stmt.PreparedStatement:
+        try:
+            return await conn.prepare(sql)
+        except asyncpg.PostgresSyntaxError as e:
+            # Prepared statements take one command; the psycopg2 path ran the whole script
+            if "multiple commands" in str(e):
+                raise ValidationError("Only a single SQL statement can be run at a time")
+            raise
+
+    async def run_sql_arrow_async(self, sql: str) -> pa.Table:
+        """
+        Run a query on a pooled asyncpg connection into an Arrow table, fetching in batches.
+
+        Like the sync path, the query runs in a transaction that is always rolled back.
+
+        Args:
+            sql: The SQL to run.
+
+        Returns:
+            The result as a pyarrow.Table.
+        """
+        pool, conn = await self._acquire_async()
+        # asyncpg autocommits outside a transaction; this one also gives the cursor its transaction
+        transaction = conn.transaction()
+        try:
+            await transaction.start()
+            try:
+                statement = await self._prepare(conn, sql)
+                column_names = [attribute.name for attribute in statement.get_attributes()]
+                cursor = await statement.cursor()
+                batches = []
+                while True:
+                    batch = await cursor.fetch(self.fetch_size)
+                    if not batch:
+                        break
+                    batches.append([tuple(record) for record in batch])
+            finally:
+                await transaction.rollback()
+            return table_from_batches(column_names, batches)
+        except asyncpg.PostgresError as e:
+            raise ValidationError(e)
+        finally:
+            await pool.release(conn)
+
+    async def run_sql_async(self, sql: str) -> pd.DataFrame:
+        """
+        Run a query on a pooled asyncpg connection without blocking the event loop.
+
+        Like the sync path, the query runs in a transaction that is always rolled back.
+
+        Args:
+            sql: The SQL to run.
+
+        Returns:
+            The result as a DataFrame.
+        """
+        pool, conn = await self._acquire_async()
+        # asyncpg autocommits outside a transaction
+        transaction = conn.transaction()
+        try:
+            await transaction.start()
+            try:
+                statement = await self._prepare(conn, sql)
+                records = await statement.fetch()
+                columns = [attribute.name for attribute in statement.get_attributes()]
+            finally:
+                await transaction.rollback()
+            return pd.DataFrame([tuple(record) for record in records], columns=columns)
+        except asyncpg.PostgresError as e:
+            raise ValidationError(e)
+        finally:
+            await pool.release(conn)
+
+    # --- lifecycle and metrics ------------------------------------------------------------
+
+    async def close(self) -> None:
+        """Close both pools."""
+        if self._pool is not None:
+            self._pool.closeall()
+            self._pool = None
+        if self._async_pool is not None:
+            await self._async_pool.close()
+            self._async_pool = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Return pool sizing, in-use connections and acquire wait metrics."""
+        with self._stats_lock:
+            stats = {
+                "max_size": self.max_size,
+                "acquire_timeout_s": self.acquire_timeout,
+                "sync": {
+                    "in_use": self._in_use,
+                    "acquires": self._acquires,
+                    "acquire_timeouts": self._timeouts,
+                    "avg_wait_ms": self._wait_ms / self._acquires if self._acquires else 0.0,
+                },
+                "async": {
+                    "acquires": self._async_acquires,
+                    "acquire_timeouts": self._async_timeouts,
+                    "avg_wait_ms": self._async_wait_ms / self._async_acquires if self._async_acquires else 0.0,
+                },
+            }
+        if self._async_pool is not None:
+            size = self._async_pool.get_size()
+            stats["async"]["size"] = size
+            stats["async"]["in_use"] = size - self._async_pool.get_idle_size()
+        return stats
@@ -0,0 +1,163 @@
+import datetime
+import decimal
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple, Union
+
+import pyarrow as pa
+from pandas import DataFrame
+
+from src.agents.repositories.columnar import table_to_dataframe
+from src.agents.repositories.sql_cache import normalize_question
+
+
+def dataframe_metadata(result: Union[DataFrame, pa.Table]) -> str:
+    """
+    Describe a query result's schema for the Plotly code prompt, in the format Vanna uses
+    ("Running df.dtypes gives: ..."). Arrow tables are described by the dtypes they convert to.
+    """
+    df = table_to_dataframe(result.slice(0, 0)) if isinstance(result, pa.Table) else result
+    return f"Running df.dtypes gives:\n {df.dtypes}"
+
+
+def _object_dtype(values: Any, sample_size: int = 100) -> str:
+    """
+    "date" or "decimal" when an object column holds datetime.date/datetime or Decimal values
+    (how Postgres DATE and NUMERIC columns arrive in pandas), else "object".
+    """
+    sample = values.dropna().head(sample_size)
+    if sample.empty:
+        return "object"
+    if all(isinstance(value, datetime.date) for value in sample):
+        return "date"
+    if all(isinstance(value, decimal.Decimal) for value in sample):
+        return "decimal"
+    return "object"
+
+
+def dataframe_schema(result: Union[DataFrame, pa.Table]) -> Dict[str, str]:
+    """
+    Column name -> pandas dtype of a query result, in column order. Object columns of dates or
+    Decimals are reported as "date" or "decimal" instead of "object".
+    """
+    if isinstance(result, pa.Table):
+        df = table_to_dataframe(result.slice(0, 0))
+        arrow_types = {field.name: field.type for field in result.schema}
+        schema = {}
+        for column, dtype in df.dtypes.items():
+            arrow_type = arrow_types.get(column)
+            if arrow_type is not None and pa.types.is_date(arrow_type) and str(dtype) == "object":
+                schema[str(column)] = "date"
+            elif arrow_type is not None and pa.types.is_decimal(arrow_type):
+                schema[str(column)] = "decimal"
+            else:
+                schema[str(column)] = str(dtype)
+        return schema
+    return {
+        str(column): _object_dtype(result[column]) if str(dtype) == "object" else str(dtype)
+        for column, dtype in result.dtypes.items()
+    }
+
+
+def schema_fingerprint(df_metadata: str) -> str:
+    """Short stable hash of a df_metadata description."""
+    return hashlib.sha256(df_metadata.encode("utf-8")).hexdigest()[:16]
+
+
+class PlotlyCodeCache:
+    """
+    Cache of generated Plotly code keyed by (normalized question, schema fingerprint).
+
+    The generated code depends on what is asked and on the columns and dtypes of the data, not
+    on the rows, so a repeated chart request over a same-shaped result reuses the code instead
+    of calling the LLM. Bounded by entry count (LRU) and age (TTL).
+    """
+
+    def __init__(self, max_entries: int = 512, ttl_seconds: Optional[float] = 86400):
+        """
+        Args:
+            max_entries: Maximum number of cached snippets before LRU eviction.
+            ttl_seconds: Maximum entry age in seconds. None disables expiry.
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._rejected = 0
+
+    @staticmethod
+    def _key(question: str, df_metadata: str) -> Tuple[str, str]:
+        return normalize_question(question), schema_fingerprint(df_metadata)
+
+    def get(self, question: str, df_metadata: str) -> Optional[str]:
+        """Return cached Plotly code for the question and result schema, or None."""
+        key = self._key(question, df_metadata)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+            code, created_at = entry
+            if self.ttl_seconds is not None and time.monotonic() - created_at > self.ttl_seconds:
+                del self._entries[key]
+                self._expirations += 1
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return code
+
+    def put(self, question: str, df_metadata: str, plotly_code: str) -> bool:
+        """
+        Store generated Plotly code. Code that does not compile or never assigns `fig` is not
+        cached, so a bad generation is retried next time.
+
+        Returns:
+            Whether the code was cached.
+        """
+        try:
+            compile(plotly_code, "<plotly_code>", "exec")
+        except (SyntaxError, ValueError):
+            valid = False
+        else:
+            valid = "fig" in plotly_code
+        if not valid:
+            with self._lock:
+                self._rejected += 1
+            return False
+
+        key = self._key(question, df_metadata)
+        with self._lock:
+            self._entries[key] = (plotly_code, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+        return True
+
+    def clear(self) -> None:
+        """Remove every cached entry."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and current size."""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": self._hits / lookups if lookups else 0.0,
+                "evictions": self._evictions,
+                "expirations": self._expirations,
+                "rejected": self._rejected,
+            }
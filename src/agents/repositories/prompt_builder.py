@@ -0,0 +1,379 @@
+import re
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+from src.core import logger
+
+_TERM_RE = re.compile(r"[a-z][a-z0-9_\-]*[a-z0-9]|[a-z]")
+_HEADING_RE = re.compile(r"^(#{1,6})\s+(.*)$", re.MULTILINE)
+_RULE_RE = re.compile(r"^\s*-{3,}\s*$", re.MULTILINE)
+# Header sentence written by VannaBase.get_training_plan_generic for each INFORMATION_SCHEMA chunk
+_SCHEMA_DOC_RE = re.compile(r"^The following columns are in the (\S+) table in the (\S+) database:")
+_CREATE_TABLE_RE = re.compile(
+    r"CREATE\s+(?:TABLE|VIEW)\s+(?:IF\s+NOT\s+EXISTS\s+)?(?:\"?(\w+)\"?\.)?\"?(\w+)\"?", re.IGNORECASE
+)
+_STOP_WORDS = {
+    "the", "a", "an", "of", "for", "in", "on", "at", "to", "by", "and", "or", "is", "are", "was",
+    "what", "show", "me", "give", "with", "from", "per", "each", "all", "how", "much", "many",
+    "which", "this", "that", "last", "past", "over", "between", "during", "please",
+}
+# Markdown table columns that repeat the header sentence of an INFORMATION_SCHEMA chunk
+_REDUNDANT_SCHEMA_COLUMNS = {"", "table_catalog", "table_schema", "table_name"}
+_DDL_KEYWORDS = {"CONSTRAINT", "PRIMARY", "FOREIGN", "UNIQUE", "CHECK", "WITH", "TABLESPACE", "PARTITION"}
+
+
+def approx_tokens(text: str) -> int:
+    """Approximate token count, using the same 4 characters per token rule as VannaBase."""
+    return len(text) // 4
+
+
+def question_terms(text: str) -> Set[str]:
+    """Lower-cased content words of a question (identifiers like site-1 and pminc1 are kept whole)."""
+    terms = set(_TERM_RE.findall(text.lower())) - _STOP_WORDS
+    # Also index the parts of compound identifiers so "chw_s_temp" matches "temp"
+    for term in list(terms):
+        terms.update(part for part in re.split(r"[_\-]", term) if len(part) > 1 and part not in _STOP_WORDS)
+    return terms
+
+
+@dataclass
+class ContextChunk:
+    """One retrieved piece of prompt context with its relevance score."""
+    kind: str
+    content: Any
+    text: str
+    distance: Optional[float] = None
+    score: float = 0.0
+
+    @property
+    def tokens(self) -> int:
+        return approx_tokens(self.text)
+
+
+@dataclass
+class PromptBudgetReport:
+    """How much retrieved context was kept for one prompt."""
+    budget: int
+    tokens_before: int
+    tokens_after: int
+    kept: Dict[str, int] = field(default_factory=dict)
+    dropped: Dict[str, int] = field(default_factory=dict)
+
+    @property
+    def tokens_saved(self) -> int:
+        return self.tokens_before - self.tokens_after
+
+
+class PromptBuilder:
+    """
+    Token-budgeted selection of the context placed in SQL and Plotly prompts.
+
+    Retrieved DDL, documentation and question/SQL examples are cleaned (system catalog tables
+    dropped, oversized documents split by heading, wide column listings pruned to the columns the
+    question mentions), scored by vector distance and lexical overlap with the question, and then
+    added greedily in score order until the token budget is spent.
+    """
+
+    def __init__(
+        self,
+        token_budget: int = 6000,
+        max_chunk_tokens: int = 800,
+        max_columns_per_table: int = 30,
+        max_metadata_tokens: int = 1000,
+        system_schemas: Sequence[str] = ("pg_catalog", "information_schema"),
+        distance_weight: float = 0.6,
+    ):
+        """
+        Args:
+            token_budget: Maximum approximate tokens of retrieved context per prompt.
+            max_chunk_tokens: Documents larger than this are split by markdown heading.
+            max_columns_per_table: Column listings wider than this keep only relevant columns.
+            max_metadata_tokens: Maximum approximate tokens of DataFrame metadata in Plotly prompts.
+            system_schemas: Schemas whose tables are dropped unless the question names them.
+            distance_weight: Weight of vector similarity vs. lexical overlap in the score (0-1).
+        """
+        self.token_budget = token_budget
+        self.max_chunk_tokens = max_chunk_tokens
+        self.max_columns_per_table = max_columns_per_table
+        self.max_metadata_tokens = max_metadata_tokens
+        self.system_schemas = {schema.lower() for schema in system_schemas}
+        self.distance_weight = distance_weight
+
+        self._lock = threading.Lock()
+        self._prompts = 0
+        self._tokens_before = 0
+        self._tokens_after = 0
+
+    # --- cleaning -------------------------------------------------------------------------
+
+    def split_documentation(self, doc: str) -> List[str]:
+        """
+        Split an oversized markdown document into heading sections.
+
+        Each section keeps the chain of parent headings so it still reads in context.
+        Documents within max_chunk_tokens are returned unchanged.
+        """
+        if approx_tokens(doc) <= self.max_chunk_tokens:
+            return [doc]
+
+        headings = list(_HEADING_RE.finditer(doc))
+        if not headings:
+            return [doc]
+
+        sections = []
+        parents: List[Tuple[int, str]] = []
+        preamble = doc[:headings[0].start()].strip()
+        if preamble:
+            sections.append(preamble)
+        for index, heading in enumerate(headings):
+            level = len(heading.group(1))
+            end = headings[index + 1].start() if index + 1 < len(headings) else len(doc)
+            body = _RULE_RE.sub("", doc[heading.end():end]).strip()
+            parents = [(lvl, title) for lvl, title in parents if lvl < level]
+            if body:
+                breadcrumb = " > ".join(title for _, title in parents)
+                title = heading.group(0).strip()
+                sections.append(f"{breadcrumb}\n{title}\n{body}" if breadcrumb else f"{title}\n{body}")
+            parents.append((level, heading.group(2).strip()))
+        return sections
+
+    @staticmethod
+    def _split_row(line: str) -> List[str]:
+        return [cell.strip() for cell in line.strip().strip("|").split("|")]
+
+    def _prune_markdown_table(self, doc: str, terms: Set[str], keep_names: Set[str]) -> str:
+        """Drop columns that repeat the header sentence and, for wide tables, unrelated rows."""
+        lines = doc.splitlines()
+        table_start = next((i for i, line in enumerate(lines) if line.startswith("|")), None)
+        if table_start is None or table_start + 1 >= len(lines):
+            return doc
+
+        header = [name.lower() for name in self._split_row(lines[table_start])]
+        keep_cells = [i for i, name in enumerate(header) if name not in _REDUNDANT_SCHEMA_COLUMNS]
+        rows = [self._split_row(line) for line in lines[table_start + 2:] if line.startswith("|")]
+
+        omitted = 0
+        if "column_name" in header and len(rows) > self.max_columns_per_table:
+            name_index = header.index("column_name")
+            wanted = terms | keep_names
+            relevant = [row for row in rows if name_index < len(row) and row[name_index].lower() in wanted]
+            omitted = len(rows) - len(relevant)
+            rows = relevant
+
+        def project(cells: List[str]) -> str:
+            return "| " + " | ".join(cells[i] for i in keep_cells if i < len(cells)) + " |"
+
+        table = [project(self._split_row(lines[table_start])), "|" + "|".join(["---"] * len(keep_cells)) + "|"]
+        table += [project(row) for row in rows]
+        if omitted:
+            table.append(f"({omitted} other columns omitted)")
+        return "\n".join(lines[:table_start] + table)
+
+    def _table_schema(self, doc: str) -> Optional[str]:
+        """Read table_schema from the first row of an INFORMATION_SCHEMA chunk."""
+        lines = [line for line in doc.splitlines() if line.startswith("|")]
+        if len(lines) < 3:
+            return None
+        header = [name.lower() for name in self._split_row(lines[0])]
+        first_row = self._split_row(lines[2])
+        if "table_schema" not in header or len(first_row) != len(header):
+            return None
+        return first_row[header.index("table_schema")]
+
+    def _prune_ddl(self, ddl: str, terms: Set[str], keep_names: Set[str]) -> str:
+        """Keep only relevant column definitions of very wide CREATE TABLE statements."""
+        lines = ddl.splitlines()
+        columns = {}
+        for index, line in enumerate(lines):
+            match = re.match(r"^\s*\"?(\w+)\"?\s+\w+", line)
+            if match and not _CREATE_TABLE_RE.search(line) and match.group(1).upper() not in _DDL_KEYWORDS:
+                columns[index] = match.group(1).lower()
+        if len(columns) <= self.max_columns_per_table:
+            return ddl
+
+        wanted = terms | keep_names
+        drop = {index for index, name in columns.items() if name not in wanted}
+        kept = [line for index, line in enumerate(lines) if index not in drop]
+        kept.append(f"-- {len(drop)} other columns omitted")
+        return "\n".join(kept)
+
+    def _is_system_table(self, schema: Optional[str], table: str, terms: Set[str]) -> bool:
+        if schema is None or schema.lower() not in self.system_schemas:
+            return False
+        return table.lower() not in terms and schema.lower() not in terms
+
+    def clean_documentation(self, doc: str, terms: Set[str], keep_names: Set[str]) -> List[str]:
+        """Clean one documentation entry into zero or more prompt chunks."""
+        header = _SCHEMA_DOC_RE.match(doc)
+        if header is None:
+            return self.split_documentation(doc)
+        if self._is_system_table(self._table_schema(doc), header.group(1), terms):
+            return []
+        return [self._prune_markdown_table(doc, terms, keep_names)]
+
+    def clean_ddl(self, ddl: str, terms: Set[str], keep_names: Set[str]) -> Optional[str]:
+        """Clean one DDL entry, or return None when it describes an unrelated system table."""
+        match = _CREATE_TABLE_RE.search(ddl)
+        if match and self._is_system_table(match.group(1), match.group(2), terms):
+            return None
+        return self._prune_ddl(ddl, terms, keep_names)
+
+    # --- scoring and selection ------------------------------------------------------------
+
+    def _score(self, chunk: ContextChunk, terms: Set[str], rank: int, total: int) -> float:
+        if chunk.distance is not None:
+            similarity = 1.0 / (1.0 + max(chunk.distance, 0.0))
+        else:
+            # Without distances fall back to the retrieval order
+            similarity = 1.0 - rank / max(total, 1)
+        chunk_terms = question_terms(chunk.text)
+        overlap = len(terms & chunk_terms) / len(terms) if terms else 0.0
+        return self.distance_weight * similarity + (1.0 - self.distance_weight) * overlap
+
+    @staticmethod
+    def _example_text(example: Any) -> str:
+        if isinstance(example, dict):
+            return f"{example.get('question', '')}\n{example.get('sql', '')}"
+        return str(example)
+
+    def _chunks(
+        self,
+        kind: str,
+        items: Sequence[Any],
+        distances: Optional[Sequence[float]],
+        terms: Set[str],
+        keep_names: Set[str],
+    ) -> List[ContextChunk]:
+        chunks: List[ContextChunk] = []
+        for index, item in enumerate(items):
+            if item is None:
+                continue
+            distance = distances[index] if distances is not None and index < len(distances) else None
+            if kind == "example":
+                if not isinstance(item, dict) or "question" not in item or "sql" not in item:
+                    continue
+                chunks.append(ContextChunk(kind, item, self._example_text(item), distance))
+            elif kind == "ddl":
+                cleaned = self.clean_ddl(str(item), terms, keep_names)
+                if cleaned is not None:
+                    chunks.append(ContextChunk(kind, cleaned, cleaned, distance))
+            else:
+                for section in self.clean_documentation(str(item), terms, keep_names):
+                    chunks.append(ContextChunk(kind, section, section, distance))
+
+        for rank, chunk in enumerate(chunks):
+            chunk.score = self._score(chunk, terms, rank, len(chunks))
+        return chunks
+
+    def select(
+        self,
+        question: str,
+        question_sql_list: Sequence[Any],
+        ddl_list: Sequence[Any],
+        doc_list: Sequence[Any],
+        distances: Optional[Dict[str, Sequence[float]]] = None,
+        reserved_tokens: int = 0,
+    ) -> Tuple[List[Any], List[str], List[str], PromptBudgetReport]:
+        """
+        Choose the context to send for a question within the token budget.
+
+        Args:
+            question: The natural language question.
+            question_sql_list: Retrieved question/SQL examples.
+            ddl_list: Retrieved DDL statements.
+            doc_list: Retrieved documentation.
+            distances: Optional vector distances keyed by "example", "ddl" and "documentation",
+                aligned with the lists above.
+            reserved_tokens: Tokens already used by fixed prompt text (instructions, question).
+
+        Returns:
+            The selected (question_sql_list, ddl_list, doc_list) in score order, and a report.
+        """
+        distances = distances or {}
+        terms = question_terms(question)
+        # Column names used by the examples are relevant even when the question does not name them
+        keep_names = set()
+        for example in question_sql_list:
+            if isinstance(example, dict):
+                keep_names |= set(re.findall(r"[a-z_][a-z0-9_]*", str(example.get("sql", "")).lower()))
+
+        sources = {"example": question_sql_list, "ddl": ddl_list, "documentation": doc_list}
+        tokens_before = sum(
+            approx_tokens(self._example_text(item)) for items in sources.values() for item in items if item is not None
+        )
+        chunks = {
+            kind: self._chunks(kind, items, distances.get(kind), terms, keep_names)
+            for kind, items in sources.items()
+        }
+
+        budget = max(self.token_budget - reserved_tokens, 0)
+        selected: Dict[str, List[ContextChunk]] = {kind: [] for kind in chunks}
+        used = 0
+
+        # The best chunk of each kind first, so the LLM always sees some schema and an example
+        leaders = [max(kind_chunks, key=lambda c: c.score) for kind_chunks in chunks.values() if kind_chunks]
+        rest = sorted(
+            (chunk for kind_chunks in chunks.values() for chunk in kind_chunks if chunk not in leaders),
+            key=lambda c: c.score,
+            reverse=True,
+        )
+        for chunk in sorted(leaders, key=lambda c: c.score, reverse=True) + rest:
+            if used + chunk.tokens <= budget:
+                selected[chunk.kind].append(chunk)
+                used += chunk.tokens
+
+        report = PromptBudgetReport(
+            budget=self.token_budget,
+            tokens_before=tokens_before,
+            tokens_after=used,
+            kept={kind: len(items) for kind, items in selected.items()},
+            dropped={kind: len(chunks[kind]) - len(selected[kind]) for kind in chunks},
+        )
+        with self._lock:
+            self._prompts += 1
+            self._tokens_before += report.tokens_before
+            self._tokens_after += report.tokens_after
+        logger.info(
+            f"PromptBuilder kept {used}/{tokens_before} context tokens "
+            f"(saved {report.tokens_saved}, kept={report.kept}, dropped={report.dropped})"
+        )
+
+        for kind in selected:
+            selected[kind].sort(key=lambda c: c.score, reverse=True)
+        return (
+            [chunk.content for chunk in selected["example"]],
+            [chunk.content for chunk in selected["ddl"]],
+            [chunk.content for chunk in selected["documentation"]],
+            report,
+        )
+
+    def trim_text(self, text: Optional[str], max_tokens: Optional[int] = None) -> Optional[str]:
+        """Truncate free text (e.g. DataFrame metadata) at a line boundary to fit max_tokens."""
+        max_tokens = self.max_metadata_tokens if max_tokens is None else max_tokens
+        if text is None or approx_tokens(text) <= max_tokens:
+            return text
+        kept: List[str] = []
+        used = 0
+        for line in text.splitlines():
+            if used + approx_tokens(line + "\n") > max_tokens:
+                break
+            kept.append(line)
+            used += approx_tokens(line + "\n")
+        omitted = len(text.splitlines()) - len(kept)
+        with self._lock:
+            self._prompts += 1
+            self._tokens_before += approx_tokens(text)
+            self._tokens_after += used
+        return "\n".join(kept) + f"\n... ({omitted} more lines omitted)"
+
+    def stats(self) -> Dict[str, Any]:
+        """Return cumulative token savings."""
+        with self._lock:
+            return {
+                "prompts": self._prompts,
+                "token_budget": self.token_budget,
+                "tokens_before": self._tokens_before,
+                "tokens_after": self._tokens_after,
+                "tokens_saved": self._tokens_before - self._tokens_after,
+            }
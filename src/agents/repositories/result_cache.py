@@ -0,0 +1,354 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import pandas as pd
+import pyarrow as pa
+
+from src.core import logger
+
+_COMMENT_RE = re.compile(r"--[^\n]*|/\*.*?\*/", re.DOTALL)
+# Quoted literals and identifiers are kept verbatim; everything else is case-folded
+_QUOTED_RE = re.compile(r"('(?:[^']|'')*'|\"(?:[^\"]|\"\")*\")")
+_WHITESPACE_RE = re.compile(r"\s+")
+# Statements that write, lock rows or create objects; their results must never be replayed
+_WRITE_RE = re.compile(
+    r"\b(?:insert|update|delete|merge|upsert|create|drop|alter|truncate|grant|revoke|copy|call|do|vacuum|"
+    r"analyze|refresh|lock|into|nextval|setval)\b|\bfor\s+(?:no\s+key\s+)?(?:update|share|key\s+share)\b"
+)
+# Functions whose value changes with every execution of the same SQL text
+_VOLATILE_RE = re.compile(r"\b(?:random|gen_random_uuid|uuid_generate_v\d)\b")
+# Functions that read the clock: their results only hold for the time bucket they ran in
+_CLOCK_RE = re.compile(
+    r"\b(?:now|current_date|current_time|current_timestamp|localtime|localtimestamp|clock_timestamp|"
+    r"statement_timestamp|transaction_timestamp|timeofday)\b"
+)
+
+
+def normalize_sql(sql: str) -> str:
+    """
+    Normalize SQL text for cache keying.
+
+    Strips comments and the trailing semicolon, collapses whitespace and lower-cases everything
+    outside quoted literals, so "SELECT *  FROM power;" and "select * from power" share a key
+    while 'PMINC1' and 'pminc1' do not.
+    """
+    sql = _COMMENT_RE.sub(" ", sql).strip().rstrip(";")
+    parts = _QUOTED_RE.split(sql)
+    normalized = []
+    for i, part in enumerate(parts):
+        # split() with a capturing group alternates unquoted and quoted parts
+        normalized.append(part if i % 2 else _WHITESPACE_RE.sub(" ", part.lower()))
+    return "".join(normalized).strip()
+
+
+def _unquoted(normalized_sql: str) -> str:
+    return " ".join(part for i, part in enumerate(_QUOTED_RE.split(normalized_sql)) if i % 2 == 0)
+
+
+def is_cacheable_sql(sql: str) -> bool:
+    """
+    Whether the result of a query may be cached.
+
+    Only read-only statements (SELECT, VALUES, or WITH ... SELECT) qualify, and only when they call
+    no function such as random() that returns something new on every execution. Queries reading the
+    clock (NOW(), CURRENT_DATE) are cacheable per time bucket, see reads_clock. Quoted literals and
+    identifiers are ignored, so WHERE tagname = 'delete' is still cacheable.
+    """
+    unquoted = _unquoted(normalize_sql(sql))
+    if not re.match(r"\(*\s*(?:select|with|values)\b", unquoted):
+        return False
+    return _WRITE_RE.search(unquoted) is None and _VOLATILE_RE.search(unquoted) is None
+
+
+def reads_clock(sql: str) -> bool:
+    """Whether a query calls a clock function such as NOW() or CURRENT_DATE."""
+    return _CLOCK_RE.search(_unquoted(normalize_sql(sql))) is not None
+
+
+def table_to_ipc(table: pa.Table, compression: Optional[str] = "zstd") -> bytes:
+    """Serialize an Arrow table to (compressed) Arrow IPC stream bytes."""
+    sink = pa.BufferOutputStream()
+    options = pa.ipc.IpcWriteOptions(compression=compression)
+    with pa.ipc.new_stream(sink, table.schema, options=options) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def ipc_to_table(payload: bytes) -> pa.Table:
+    """Deserialize Arrow IPC stream bytes back to a table."""
+    return pa.ipc.open_stream(pa.py_buffer(payload)).read_all()
+
+
+@dataclass
+class _ResultEntry:
+    payload: bytes
+    row_count: int
+    watermarks: Dict[str, Any]
+    metadata: Dict[str, Any]
+    # Clock bucket the SQL ran in, for SQL calling NOW() or CURRENT_DATE
+    clock_bucket: Optional[int] = None
+    created_at: float = field(default_factory=time.monotonic)
+
+
+@dataclass
+class CachedResult:
+    """A cache hit: the result in the requested form plus the metadata stored with it."""
+    result: Any
+    row_count: int
+    metadata: Dict[str, Any]
+    age_seconds: float
+
+
+class SQLResultCache:
+    """
+    Result cache for executed SQL, keyed on normalized SQL text.
+
+    Results are stored as compressed Arrow IPC bytes and bounded by total size (LRU). Every entry
+    records the data watermark (e.g. max(datetimegenerated)) of each watched table its SQL reads;
+    the watermarks are polled at most every watermark_poll_seconds and an entry is dropped as soon
+    as one of them moves, so cached results never hide newly ingested rows for longer than the
+    poll interval. A TTL bounds entries whose SQL reads no watched table. SQL calling NOW() or
+    CURRENT_DATE is served only within the clock bucket (clock_bucket_seconds of wall-clock time)
+    it ran in, so "the last hour" moves on with the clock. Statements that are not read-only or
+    that call random() and the like are never cached.
+    """
+
+    def __init__(
+        self,
+        run_sql: Callable[[str], pd.DataFrame],
+        watermark_columns: Optional[Dict[str, str]] = None,
+        max_bytes: int = 256 * 1024 * 1024,
+        max_entry_bytes: int = 32 * 1024 * 1024,
+        ttl_seconds: Optional[float] = 900,
+        watermark_poll_seconds: float = 30,
+        clock_bucket_seconds: float = 60,
+        compression: Optional[str] = "zstd",
+    ):
+        """
+        Args:
+            run_sql: Callable used to read the watermarks (returns a DataFrame).
+            watermark_columns: Table name -> monotonically increasing timestamp column.
+            max_bytes: Maximum total size of cached payloads before LRU eviction.
+            max_entry_bytes: Results larger than this (compressed) are not cached.
+            ttl_seconds: Maximum entry age in seconds. None disables expiry.
+            watermark_poll_seconds: Minimum interval between watermark reads.
+            clock_bucket_seconds: Wall-clock bucket within which results of SQL calling NOW() or
+                CURRENT_DATE are reused.
+            compression: Arrow IPC compression codec ("zstd", "lz4" or None).
+        """
+        self.run_sql = run_sql
+        self.watermark_columns = watermark_columns or {
+            "power": "datetimegenerated",
+            "historian": "startdatetime",
+        }
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.ttl_seconds = ttl_seconds
+        self.watermark_poll_seconds = watermark_poll_seconds
+        self.clock_bucket_seconds = clock_bucket_seconds
+        self.compression = compression if compression and pa.Codec.is_available(compression) else None
+
+        self._table_patterns = {
+            table: re.compile(rf"\b(?:from|join)\s+(?:\"?public\"?\.)?\"?{re.escape(table)}\"?\b")
+            for table in self.watermark_columns
+        }
+        self._entries: "OrderedDict[str, _ResultEntry]" = OrderedDict()
+        self._bytes = 0
+        self._watermarks: Dict[str, Any] = {}
+        self._watermarks_read_at: Optional[float] = None
+        self._lock = threading.Lock()
+        self._watermark_lock = threading.Lock()
+
+        self._hits = 0
+        self._misses = 0
+        self._bypasses = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._invalidations = 0
+        self._skipped_too_large = 0
+        self._uncacheable = 0
+        self._watermark_errors = 0
+
+    # --- watermarks -----------------------------------------------------------------------
+
+    def _tables_for(self, normalized_sql: str) -> Tuple[str, ...]:
+        return tuple(table for table, pattern in self._table_patterns.items() if pattern.search(normalized_sql))
+
+    def _read_watermarks(self) -> Dict[str, Any]:
+        watermarks = {}
+        for table, column in self.watermark_columns.items():
+            try:
+                df = self.run_sql(f"SELECT max({column}) FROM public.{table}")
+                value = df.iloc[0, 0] if not df.empty else None
+                watermarks[table] = None if pd.isna(value) else str(value)
+            except Exception as e:
+                # An unreadable watermark never matches, so results for that table are not served
+                self._watermark_errors += 1
+                logger.warning(f"SQLResultCache could not read watermark of {table}: {e}")
+                watermarks[table] = object()
+        return watermarks
+
+    def current_watermarks(self) -> Dict[str, Any]:
+        """Return the data watermarks, re-reading them when the last poll is older than the interval."""
+        with self._watermark_lock:
+            now = time.monotonic()
+            if self._watermarks_read_at is None or now - self._watermarks_read_at >= self.watermark_poll_seconds:
+                self._watermarks = self._read_watermarks()
+                self._watermarks_read_at = now
+            return self._watermarks
+
+    # --- cache operations -----------------------------------------------------------------
+
+    def _clock_bucket(self, sql: str, at: Optional[float] = None) -> Optional[int]:
+        if not reads_clock(sql):
+            return None
+        return int((time.time() if at is None else at) // self.clock_bucket_seconds)
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key)
+        self._bytes -= len(entry.payload)
+
+    def get(self, sql: str, columnar: bool = False) -> Optional[CachedResult]:
+        """
+        Return the cached result of a query, or None on a miss.
+
+        Args:
+            sql: The SQL as submitted (before any cost-guard rewrite).
+            columnar: Return a pyarrow.Table instead of a DataFrame.
+
+        Returns:
+            A CachedResult, or None when the entry is missing, expired (or from an earlier clock
+            bucket) or its watermarks moved.
+        """
+        if not is_cacheable_sql(sql):
+            with self._lock:
+                self._uncacheable += 1
+            return None
+        key = normalize_sql(sql)
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            with self._lock:
+                self._misses += 1
+            return None
+
+        watermarks = self.current_watermarks() if entry.watermarks else {}
+        with self._lock:
+            if self._entries.get(key) is not entry:
+                self._misses += 1
+                return None
+            expired = self.ttl_seconds is not None and time.monotonic() - entry.created_at > self.ttl_seconds
+            if expired or entry.clock_bucket != self._clock_bucket(sql):
+                self._remove(key)
+                self._expirations += 1
+                self._misses += 1
+                return None
+            if any(watermarks.get(table) != value for table, value in entry.watermarks.items()):
+                self._remove(key)
+                self._invalidations += 1
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+
+        table = ipc_to_table(entry.payload)
+        return CachedResult(
+            result=table if columnar else table.to_pandas(),
+            row_count=entry.row_count,
+            metadata=dict(entry.metadata),
+            age_seconds=time.monotonic() - entry.created_at,
+        )
+
+    def put(
+        self,
+        sql: str,
+        result: Any,
+        metadata: Optional[Dict[str, Any]] = None,
+        ran_at: Optional[float] = None,
+    ) -> bool:
+        """
+        Cache the result of a query.
+
+        Args:
+            sql: The SQL as submitted (the same text later passed to get).
+            result: The result as a DataFrame or pyarrow.Table.
+            metadata: Extra JSON-friendly data returned with hits (e.g. the executed SQL).
+            ran_at: Wall-clock time (time.time()) the query started, which decides the clock
+                bucket of SQL calling NOW() or CURRENT_DATE. Defaults to now.
+
+        Returns:
+            True when the result was stored.
+        """
+        if not is_cacheable_sql(sql):
+            return False
+        key = normalize_sql(sql)
+        clock_bucket = self._clock_bucket(sql, ran_at)
+        # Read the watermarks before serializing so rows ingested meanwhile invalidate the entry
+        tables = self._tables_for(key)
+        watermarks = self.current_watermarks() if tables else {}
+        entry_watermarks = {table: watermarks.get(table) for table in tables}
+
+        try:
+            table = result if isinstance(result, pa.Table) else pa.Table.from_pandas(result, preserve_index=False)
+            payload = table_to_ipc(table, self.compression)
+        except (pa.ArrowException, TypeError, ValueError) as e:
+            logger.warning(f"SQLResultCache could not serialize result: {e}")
+            return False
+
+        with self._lock:
+            if len(payload) > self.max_entry_bytes:
+                self._skipped_too_large += 1
+                return False
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = _ResultEntry(
+                payload=payload,
+                row_count=table.num_rows,
+                watermarks=entry_watermarks,
+                metadata=dict(metadata or {}),
+                clock_bucket=clock_bucket,
+            )
+            self._bytes += len(payload)
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self._evictions += 1
+        return True
+
+    def record_bypass(self) -> None:
+        """Count a request that skipped the cache (fresh data was asked for, or the user turned it off)."""
+        with self._lock:
+            self._bypasses += 1
+
+    def invalidate(self) -> None:
+        """Drop every cached result."""
+        with self._lock:
+            if self._entries:
+                self._invalidations += 1
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters, hit rate and memory use."""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": self._hits / lookups if lookups else 0.0,
+                "bypasses": self._bypasses,
+                "evictions": self._evictions,
+                "expirations": self._expirations,
+                "invalidations": self._invalidations,
+                "skipped_too_large": self._skipped_too_large,
+                "uncacheable": self._uncacheable,
+                "watermark_errors": self._watermark_errors,
+                "watermarks": {table: str(value) for table, value in self._watermarks.items()},
+            }
@@ -0,0 +1,152 @@
+import os
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from src.agents.repositories.columnar import table_from_dataframe
+from src.core import logger
+
+
+class QueryResultStore:
+    """
+    Local-disk store for query results, written as compressed Parquet files.
+
+    Session state only keeps the returned reference plus row count and schema, so the size of
+    session writes no longer grows with the size of the result. Files older than max_age_seconds
+    are purged on write.
+    """
+
+    def __init__(
+        self,
+        path: str = "query_results",
+        compression: str = "zstd",
+        max_age_seconds: Optional[float] = 7 * 86400,
+        purge_interval_seconds: float = 3600,
+    ):
+        """
+        Args:
+            path: Directory the Parquet files are written to.
+            compression: Parquet compression codec.
+            max_age_seconds: Age after which stored results are deleted. None keeps them forever.
+            purge_interval_seconds: Minimum interval between purges of expired files.
+        """
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.compression = compression
+        self.max_age_seconds = max_age_seconds
+        self.purge_interval_seconds = purge_interval_seconds
+
+        self._last_purge = 0.0
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._reads = 0
+        self._missing = 0
+        self._bytes_written = 0
+        self._purged = 0
+
+    def _file(self, ref: str) -> Path:
+        # refs are generated here; reject anything that could escape the store directory
+        if not ref or os.sep in ref or "/" in ref or ref.startswith("."):
+            raise ValueError(f"Invalid query result reference: {ref!r}")
+        return self.path / f"{ref}.parquet"
+
+    def put(self, result: Any) -> Dict[str, Any]:
+        """
+        Store a query result.
+
+        Args:
+            result: The result as a DataFrame or pyarrow.Table.
+
+        Returns:
+            Dict with ref, row_count, columns, dtypes and bytes, suitable for session state.
+        """
+        table = result if isinstance(result, pa.Table) else table_from_dataframe(result)
+        ref = f"qr_{uuid.uuid4().hex}"
+        file = self._file(ref)
+        # Write to a temp name first so readers never see a partial file
+        tmp_file = file.with_suffix(".tmp")
+        pq.write_table(table, tmp_file, compression=self.compression)
+        os.replace(tmp_file, file)
+        size = file.stat().st_size
+
+        with self._lock:
+            self._writes += 1
+            self._bytes_written += size
+        self._maybe_purge()
+
+        return {
+            "ref": ref,
+            "row_count": table.num_rows,
+            "columns": table.column_names,
+            "dtypes": {field.name: str(field.type) for field in table.schema},
+            "bytes": size,
+        }
+
+    def load_table(self, ref: str, columns: Optional[List[str]] = None) -> Optional[pa.Table]:
+        """Load a stored result as a pyarrow.Table, or None if it no longer exists."""
+        file = self._file(ref)
+        try:
+            table = pq.read_table(file, columns=columns)
+        except FileNotFoundError:
+            with self._lock:
+                self._missing += 1
+            return None
+        with self._lock:
+            self._reads += 1
+        return table
+
+    def load(self, ref: str, columns: Optional[List[str]] = None) -> Optional[pd.DataFrame]:
+        """Load a stored result as a DataFrame, or None if it no longer exists."""
+        table = self.load_table(ref, columns=columns)
+        return table.to_pandas() if table is not None else None
+
+    def delete(self, ref: str) -> None:
+        """Delete a stored result if it exists."""
+        self._file(ref).unlink(missing_ok=True)
+
+    def _maybe_purge(self) -> None:
+        if self.max_age_seconds is None:
+            return
+        now = time.time()
+        with self._lock:
+            if now - self._last_purge < self.purge_interval_seconds:
+                return
+            self._last_purge = now
+        self.purge_expired(now)
+
+    def purge_expired(self, now: Optional[float] = None) -> int:
+        """Delete results older than max_age_seconds. Returns the number of files removed."""
+        if self.max_age_seconds is None:
+            return 0
+        cutoff = (now or time.time()) - self.max_age_seconds
+        removed = 0
+        for file in self.path.glob("qr_*.parquet"):
+            try:
+                if file.stat().st_mtime < cutoff:
+                    file.unlink()
+                    removed += 1
+            except FileNotFoundError:
+                continue
+        if removed:
+            logger.info(f"QueryResultStore purged {removed} expired results")
+            with self._lock:
+                self._purged += removed
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        """Return write/read counters and bytes written."""
+        with self._lock:
+            return {
+                "path": str(self.path),
+                "writes": self._writes,
+                "reads": self._reads,
+                "missing": self._missing,
+                "bytes_written": self._bytes_written,
+                "purged": self._purged,
+            }
@@ -0,0 +1,260 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, Hashable, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.core import logger
+
+_WHITESPACE_RE = re.compile(r"\s+")
+_TRAILING_PUNCTUATION_RE = re.compile(r"[\s\?\.!]+$")
+# Tokens that change the meaning of a question without moving its embedding much
+# (site ids, meter/chiller tags, years, quarters, numbers, quoted literals).
+_LITERAL_TOKEN_RE = re.compile(r"'[^']*'|\"[^\"]*\"|\b[\w\-]*\d[\w\-]*\b")
+# Words that flip the meaning of a question (last vs this month, max vs min, above vs below)
+# while barely moving its embedding: relative time, aggregates and comparisons
+_MEANING_WORD_RE = re.compile(
+    r"\b(?:today|yesterday|tomorrow|now|last|this|next|previous|prior|current|past|recent|latest|earliest|"
+    r"hour|hourly|day|daily|week|weekly|month|monthly|quarter|quarterly|year|yearly|annual|ytd|mtd|"
+    r"total|sum|average|avg|mean|median|max|maximum|highest|peak|min|minimum|lowest|count|top|bottom|"
+    r"above|below|over|under|more|less|greater|fewer|exceed|exceeds|exceeding|between|before|after|since|"
+    r"until|not|without|excluding|increase|decrease|most|least|first|ascending|descending)\b"
+)
+# Spellings of the same aggregate share a signature token
+_MEANING_WORD_ALIASES = {
+    "sum": "total", "avg": "average", "mean": "average",
+    "maximum": "max", "highest": "max", "peak": "max",
+    "minimum": "min", "lowest": "min",
+    "exceeds": "exceed", "exceeding": "exceed",
+}
+
+
+def normalize_question(question: str) -> str:
+    """
+    Normalize a natural language question for cache keying.
+
+    Lower-cases the text, collapses whitespace and strips trailing punctuation so that
+    "Total energy for site-1 last month?" and "total energy for site-1 last month" share a key.
+    """
+    normalized = _WHITESPACE_RE.sub(" ", question.strip().lower())
+    return _TRAILING_PUNCTUATION_RE.sub("", normalized)
+
+
+def literal_signature(question: str) -> Tuple[str, ...]:
+    """
+    Extract the literal tokens of a question (anything containing a digit or quoted) and its
+    relative-time, aggregate and comparison words.
+
+    Two questions can only share cached SQL when their literal signatures are identical,
+    which keeps "site-1" and "site-2", "last month" and "this month" or "max" and "min"
+    variants from being served each other's SQL even though their embeddings are nearly identical.
+    """
+    normalized = normalize_question(question)
+    tokens = set(_LITERAL_TOKEN_RE.findall(normalized))
+    tokens.update(_MEANING_WORD_ALIASES.get(word, word) for word in _MEANING_WORD_RE.findall(normalized))
+    return tuple(sorted(tokens))
+
+
+@dataclass
+class _CacheEntry:
+    normalized_question: str
+    signature: Tuple[str, ...]
+    sql: str
+    embedding: Optional[np.ndarray]
+    created_at: float = field(default_factory=time.monotonic)
+
+
+class SemanticSQLCache:
+    """
+    Similarity-keyed cache of generated SQL.
+
+    Entries are looked up first by normalized question text and then by cosine distance
+    between question embeddings (restricted to questions with the same literal signature:
+    literals, relative-time, aggregate and comparison words).
+    The cache is bounded by entry count (LRU) and age (TTL), and is cleared whenever the
+    training fingerprint of the vector store changes.
+    """
+
+    def __init__(
+        self,
+        distance_threshold: float = 0.08,
+        max_entries: int = 512,
+        ttl_seconds: Optional[float] = 86400,
+    ):
+        """
+        Args:
+            distance_threshold: Maximum cosine distance for a semantic hit.
+            max_entries: Maximum number of cached questions before LRU eviction.
+            ttl_seconds: Maximum entry age in seconds. None disables expiry.
+        """
+        self.distance_threshold = distance_threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+
+        self._entries: "OrderedDict[Tuple[str, bool], _CacheEntry]" = OrderedDict()
+        self._fingerprint: Optional[Hashable] = None
+        self._lock = threading.Lock()
+
+        self._exact_hits = 0
+        self._semantic_hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._invalidations = 0
+
+    @staticmethod
+    def _to_unit_vector(embedding: Sequence[float]) -> Optional[np.ndarray]:
+        vector = np.asarray(embedding, dtype=np.float32).ravel()
+        norm = float(np.linalg.norm(vector))
+        if norm == 0.0:
+            return None
+        return vector / norm
+
+    def _is_expired(self, entry: _CacheEntry) -> bool:
+        return self.ttl_seconds is not None and time.monotonic() - entry.created_at > self.ttl_seconds
+
+    def _sync_fingerprint(self, fingerprint: Hashable) -> None:
+        """Drop every entry when the training data behind the cached SQL has changed."""
+        if self._fingerprint != fingerprint:
+            if self._entries:
+                self._invalidations += 1
+                logger.info(f"SemanticSQLCache invalidated: training fingerprint changed to {fingerprint}")
+            self._entries.clear()
+            self._fingerprint = fingerprint
+
+    def get(self, question: str, fingerprint: Hashable, allow_llm_to_see_data: bool = True) -> Optional[str]:
+        """
+        Return cached SQL for an exact (normalized) question match, or None.
+
+        Args:
+            question: The natural language question.
+            fingerprint: Current training fingerprint of the vector store.
+            allow_llm_to_see_data: Flag the SQL was generated with.
+
+        Returns:
+            The cached SQL string, or None on a miss.
+        """
+        key = (normalize_question(question), allow_llm_to_see_data)
+        with self._lock:
+            self._sync_fingerprint(fingerprint)
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if self._is_expired(entry):
+                del self._entries[key]
+                self._expirations += 1
+                return None
+            self._entries.move_to_end(key)
+            self._exact_hits += 1
+            return entry.sql
+
+    def get_similar(
+        self,
+        question: str,
+        embedding: Sequence[float],
+        fingerprint: Hashable,
+        allow_llm_to_see_data: bool = True,
+    ) -> Optional[str]:
+        """
+        Return cached SQL for the closest previously seen question within the distance threshold.
+
+        Args:
+            question: The natural language question.
+            embedding: Embedding of the question from the vector store's embedding function.
+            fingerprint: Current training fingerprint of the vector store.
+            allow_llm_to_see_data: Flag the SQL was generated with.
+
+        Returns:
+            The cached SQL string, or None on a miss (the miss is counted).
+        """
+        query_vector = self._to_unit_vector(embedding)
+        signature = literal_signature(question)
+
+        with self._lock:
+            self._sync_fingerprint(fingerprint)
+            best_key = None
+            best_distance = self.distance_threshold
+
+            if query_vector is not None:
+                expired = []
+                for key, entry in self._entries.items():
+                    if key[1] != allow_llm_to_see_data or entry.signature != signature or entry.embedding is None:
+                        continue
+                    if self._is_expired(entry):
+                        expired.append(key)
+                        continue
+                    distance = 1.0 - float(np.dot(query_vector, entry.embedding))
+                    if distance <= best_distance:
+                        best_key, best_distance = key, distance
+                for key in expired:
+                    del self._entries[key]
+                    self._expirations += 1
+
+            if best_key is None:
+                self._misses += 1
+                return None
+
+            self._entries.move_to_end(best_key)
+            self._semantic_hits += 1
+            logger.debug(f"SemanticSQLCache hit for '{question}' (distance={best_distance:.4f})")
+            return self._entries[best_key].sql
+
+    def put(
+        self,
+        question: str,
+        sql: str,
+        embedding: Optional[Sequence[float]],
+        fingerprint: Hashable,
+        allow_llm_to_see_data: bool = True,
+    ) -> None:
+        """
+        Store generated SQL for a question.
+
+        Args:
+            question: The natural language question.
+            sql: The SQL generated for it.
+            embedding: Embedding of the question, or None to only allow exact hits.
+            fingerprint: Training fingerprint the SQL was generated under.
+            allow_llm_to_see_data: Flag the SQL was generated with.
+        """
+        normalized = normalize_question(question)
+        entry = _CacheEntry(
+            normalized_question=normalized,
+            signature=literal_signature(question),
+            sql=sql,
+            embedding=self._to_unit_vector(embedding) if embedding is not None else None,
+        )
+        with self._lock:
+            self._sync_fingerprint(fingerprint)
+            key = (normalized, allow_llm_to_see_data)
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def clear(self) -> None:
+        """Remove every cached entry."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and current size."""
+        with self._lock:
+            hits = self._exact_hits + self._semantic_hits
+            lookups = hits + self._misses
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": hits,
+                "exact_hits": self._exact_hits,
+                "semantic_hits": self._semantic_hits,
+                "misses": self._misses,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "evictions": self._evictions,
+                "expirations": self._expirations,
+                "invalidations": self._invalidations,
+            }
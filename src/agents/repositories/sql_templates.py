@@ -0,0 +1,404 @@
+import re
+import threading
+from collections import Counter
+from dataclasses import dataclass, field
+from difflib import SequenceMatcher
+from typing import Any, Callable, Dict, Hashable, List, Optional, Sequence, Tuple
+
+from src.core import logger
+
+_MONTHS = {
+    "january": 1, "jan": 1, "february": 2, "feb": 2, "march": 3, "mar": 3,
+    "april": 4, "apr": 4, "may": 5, "june": 6, "jun": 6, "july": 7, "jul": 7,
+    "august": 8, "aug": 8, "september": 9, "sep": 9, "sept": 9, "october": 10, "oct": 10,
+    "november": 11, "nov": 11, "december": 12, "dec": 12,
+}
+
+# Words that do not change the SQL a question maps to. Everything else must match exactly.
+_FILLER_WORDS = {
+    "a", "an", "the", "me", "show", "give", "tell", "please", "what", "whats", "was", "is", "are",
+    "were", "for", "at", "of", "in", "on", "over", "during", "from", "to", "and", "did", "do",
+    "does", "can", "you", "i", "we", "our", "my", "list", "display", "get", "find",
+}
+
+_SITE_RE = re.compile(r"\bsite[\s\-_]?(\d+)\b")
+_TAG_RE = re.compile(r"\b(?!site)([a-z]{2,}\d+)\b")
+_WORD_RE = re.compile(r"<\w+>|[a-z]+")
+
+_SLOT_MARKER = "__slot_{kind}_{index}__"
+_TIME_MARKER = "__slot_time__"
+
+
+@dataclass
+class TimeWindow:
+    """A resolved time window as PostgreSQL expressions. `end_sql` is None for open-ended windows."""
+    start_sql: str
+    end_sql: Optional[str] = None
+
+
+def _month_window(year: int, month: int, months: int = 1) -> TimeWindow:
+    end_month = month + months
+    end_year = year + (end_month - 1) // 12
+    end_month = (end_month - 1) % 12 + 1
+    return TimeWindow(f"'{year:04d}-{month:02d}-01'", f"'{end_year:04d}-{end_month:02d}-01'")
+
+
+def _relative_window(amount: int, unit: str) -> TimeWindow:
+    if unit == "hour":
+        return TimeWindow(f"CURRENT_TIMESTAMP - INTERVAL '{amount} hours'")
+    if unit == "week":
+        # Weeks are rolling 7-day windows, matching "past week" in the trained pairs
+        return TimeWindow(f"CURRENT_DATE - INTERVAL '{amount * 7} days'")
+    if unit == "month":
+        return TimeWindow(f"CURRENT_DATE - INTERVAL '{amount} months'")
+    return TimeWindow(f"CURRENT_DATE - INTERVAL '{amount} days'")
+
+
+# Ordered (pattern, resolver) pairs; the first pattern that matches wins. Resolutions follow the
+# conventions used by the trained question/SQL pairs in training_power.py ("past week" is a rolling
+# 7 days, "last month" is the previous calendar month).
+_TIME_PATTERNS: List[Tuple[re.Pattern, Callable[[re.Match], TimeWindow]]] = [
+    (
+        re.compile(r"\bq([1-4])\s*(?:of\s+)?(\d{4})\b"),
+        lambda m: _month_window(int(m.group(2)), (int(m.group(1)) - 1) * 3 + 1, 3),
+    ),
+    (
+        re.compile(r"\b(" + "|".join(sorted(_MONTHS, key=len, reverse=True)) + r")\s+(\d{4})\b"),
+        lambda m: _month_window(int(m.group(2)), _MONTHS[m.group(1)]),
+    ),
+    (
+        re.compile(r"\b(?:past|last|previous)\s+(\d+)\s+(hour|day|week|month)s?\b"),
+        lambda m: _relative_window(int(m.group(1)), m.group(2)),
+    ),
+    (
+        re.compile(r"\b(?:past|last|previous)\s+(hour|day|week)\b"),
+        lambda m: _relative_window(1, m.group(1)),
+    ),
+    (
+        re.compile(r"\b(?:past|last|previous)\s+month\b"),
+        lambda m: TimeWindow(
+            "DATE_TRUNC('month', CURRENT_DATE - INTERVAL '1 month')", "DATE_TRUNC('month', CURRENT_DATE)"
+        ),
+    ),
+    (
+        re.compile(r"\b(?:last|previous)\s+year\b"),
+        lambda m: TimeWindow(
+            "DATE_TRUNC('year', CURRENT_DATE - INTERVAL '1 year')", "DATE_TRUNC('year', CURRENT_DATE)"
+        ),
+    ),
+    (
+        re.compile(r"\bthis\s+(week|month|year)\b"),
+        lambda m: TimeWindow(f"DATE_TRUNC('{m.group(1)}', CURRENT_DATE)"),
+    ),
+    (
+        re.compile(r"\byesterday\b"),
+        lambda m: TimeWindow("CURRENT_DATE - INTERVAL '1 day'", "CURRENT_DATE"),
+    ),
+    (
+        re.compile(r"\btoday\b"),
+        lambda m: TimeWindow("CURRENT_DATE"),
+    ),
+    (
+        re.compile(r"\b(20\d{2})\b"),
+        lambda m: TimeWindow(f"'{m.group(1)}-01-01'", f"'{int(m.group(1)) + 1}-01-01'"),
+    ),
+]
+
+
+@dataclass
+class QuestionSlots:
+    """Slot values extracted from a question together with its slot-free skeleton."""
+    sites: List[str] = field(default_factory=list)
+    tags: List[str] = field(default_factory=list)
+    time_window: Optional[TimeWindow] = None
+    time_window_count: int = 0
+    tokens: List[str] = field(default_factory=list)
+
+    @property
+    def shape(self) -> Tuple[int, int, bool]:
+        return (len(self.sites), len(self.tags), self.time_window is not None)
+
+    @property
+    def content(self) -> Counter:
+        return Counter(token for token in self.tokens if token not in _FILLER_WORDS)
+
+
+def _unique(values: Sequence[str]) -> List[str]:
+    return list(dict.fromkeys(values))
+
+
+def extract_slots(question: str) -> QuestionSlots:
+    """
+    Extract site, tag and time window slots from a question.
+
+    The returned skeleton tokens have slot values replaced by <site>, <tag> and <time>, so
+    "energy for site-1 last month" and "energy for site-3 in Q2 2025" share a skeleton.
+    """
+    text = question.lower()
+    slots = QuestionSlots()
+
+    for pattern, resolver in _TIME_PATTERNS:
+        matches = list(pattern.finditer(text))
+        if not matches:
+            continue
+        if slots.time_window is None:
+            slots.time_window = resolver(matches[0])
+        slots.time_window_count += len(matches)
+        text = pattern.sub(" <time> ", text)
+
+    slots.sites = _unique([f"site-{number}" for number in _SITE_RE.findall(text)])
+    text = _SITE_RE.sub(" <site> ", text)
+
+    slots.tags = _unique(_TAG_RE.findall(text))
+    text = _TAG_RE.sub(" <tag> ", text)
+
+    slots.tokens = _WORD_RE.findall(text)
+    return slots
+
+
+def _consume_expression(sql: str, start: int) -> int:
+    """Return the end index of the SQL expression starting at `start` (stops at a top-level keyword)."""
+    depth = 0
+    index = start
+    stop_keywords = re.compile(r"(AND|OR|GROUP|ORDER|LIMIT|HAVING|UNION|WINDOW)\b", re.IGNORECASE)
+    while index < len(sql):
+        char = sql[index]
+        if char == "'":
+            closing = sql.find("'", index + 1)
+            index = len(sql) if closing == -1 else closing + 1
+            continue
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            if depth == 0:
+                break
+            depth -= 1
+        elif char == ";" and depth == 0:
+            break
+        elif depth == 0 and (index == 0 or not (sql[index - 1].isalnum() or sql[index - 1] == "_")):
+            if stop_keywords.match(sql, index):
+                break
+        index += 1
+    while index > start and sql[index - 1].isspace():
+        index -= 1
+    return index
+
+
+@dataclass
+class _TimePredicate:
+    column: str
+    span: Tuple[int, int]
+
+
+def find_time_predicates(sql: str, time_columns: Sequence[str]) -> List[_TimePredicate]:
+    """Find `col >= expr [AND col < expr]` range predicates on the given time columns."""
+    columns = "|".join(re.escape(column) for column in time_columns)
+    lower_re = re.compile(rf"(?P<col>(?:\w+\.)?(?:{columns}))\s*>=\s*", re.IGNORECASE)
+    predicates = []
+    for match in lower_re.finditer(sql):
+        end = _consume_expression(sql, match.end())
+        upper_re = re.compile(rf"\s+AND\s+{re.escape(match.group('col'))}\s*<\s*", re.IGNORECASE)
+        upper = upper_re.match(sql, end)
+        if upper:
+            end = _consume_expression(sql, upper.end())
+        predicates.append(_TimePredicate(column=match.group("col"), span=(match.start(), end)))
+    return predicates
+
+
+@dataclass
+class SQLTemplate:
+    """A trained SQL statement with its slot values replaced by markers."""
+    question: str
+    slots: QuestionSlots
+    sql: str
+    time_column: Optional[str] = None
+
+
+@dataclass
+class TemplateMatch:
+    template: SQLTemplate
+    confidence: float
+    sql: str
+
+
+class SQLTemplateEngine:
+    """
+    Parameterized SQL templates learned from trained question/SQL pairs.
+
+    Each trained pair whose question contains slots (sites, equipment tag prefixes, a time window)
+    that can be located in its SQL becomes a template. Incoming questions with the same slot shape
+    and the same content words are answered by filling the template, skipping the LLM entirely.
+    """
+
+    def __init__(
+        self,
+        min_confidence: float = 0.8,
+        time_columns: Sequence[str] = ("datetimegenerated", "startdatetime"),
+    ):
+        """
+        Args:
+            min_confidence: Minimum skeleton similarity (0-1) required to use a template.
+            time_columns: Timestamp columns whose range predicates can be parameterized.
+        """
+        self.min_confidence = min_confidence
+        self.time_columns = tuple(time_columns)
+
+        self._templates: List[SQLTemplate] = []
+        self._fingerprint: Optional[Hashable] = None
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def build_template(self, question: str, sql: str) -> Optional[SQLTemplate]:
+        """
+        Build a template from one trained pair, or return None when it cannot be parameterized.
+
+        Args:
+            question: The trained question.
+            sql: The trained SQL.
+
+        Returns:
+            The SQLTemplate, or None.
+        """
+        slots = extract_slots(question)
+        if slots.shape == (0, 0, False) or slots.time_window_count > 1:
+            return None
+
+        template_sql = sql
+        for index, site in enumerate(slots.sites):
+            literal = re.compile(re.escape(f"'{site}'"), re.IGNORECASE)
+            if not literal.search(template_sql):
+                return None
+            template_sql = literal.sub(f"'{_SLOT_MARKER.format(kind='site', index=index)}'", template_sql)
+
+        for index, tag in enumerate(slots.tags):
+            occurrence = re.compile(rf"(?<![a-z0-9]){re.escape(tag)}(?![0-9])", re.IGNORECASE)
+            if not occurrence.search(template_sql):
+                return None
+            template_sql = occurrence.sub(_SLOT_MARKER.format(kind="tag", index=index), template_sql)
+
+        time_column = None
+        if slots.time_window is not None:
+            predicates = find_time_predicates(template_sql, self.time_columns)
+            if len(predicates) != 1:
+                return None
+            predicate = predicates[0]
+            time_column = predicate.column
+            start, end = predicate.span
+            template_sql = template_sql[:start] + _TIME_MARKER + template_sql[end:]
+
+        return SQLTemplate(question=question, slots=slots, sql=template_sql, time_column=time_column)
+
+    def learn(self, pairs: Sequence[Dict[str, Any]], fingerprint: Hashable = None) -> int:
+        """
+        Replace the learned templates with those built from question/SQL pairs.
+
+        Args:
+            pairs: Dicts with "question" and "sql" keys.
+            fingerprint: Training fingerprint the pairs were read under.
+
+        Returns:
+            The number of templates learned.
+        """
+        templates = []
+        for pair in pairs:
+            question, sql = pair.get("question"), pair.get("sql")
+            if not question or not sql:
+                continue
+            template = self.build_template(question, sql)
+            if template is not None:
+                templates.append(template)
+
+        with self._lock:
+            self._templates = templates
+            self._fingerprint = fingerprint
+        logger.info(f"SQLTemplateEngine learned {len(templates)} templates from {len(pairs)} question/SQL pairs")
+        return len(templates)
+
+    @staticmethod
+    def render(template: SQLTemplate, slots: QuestionSlots) -> str:
+        """Fill a template with slot values."""
+        sql = template.sql
+        for index, site in enumerate(slots.sites):
+            sql = sql.replace(_SLOT_MARKER.format(kind="site", index=index), site)
+        for index, tag in enumerate(slots.tags):
+            sql = sql.replace(_SLOT_MARKER.format(kind="tag", index=index), tag)
+        if template.time_column is not None and slots.time_window is not None:
+            predicate = f"{template.time_column} >= {slots.time_window.start_sql}"
+            if slots.time_window.end_sql is not None:
+                predicate += f"\n    AND {template.time_column} < {slots.time_window.end_sql}"
+            sql = sql.replace(_TIME_MARKER, predicate)
+        return sql
+
+    def match(self, question: str) -> Optional[TemplateMatch]:
+        """
+        Find the best template for a question.
+
+        Args:
+            question: The natural language question.
+
+        Returns:
+            A TemplateMatch with the filled SQL, or None when no template matches with confidence.
+        """
+        slots = extract_slots(question)
+        if slots.shape == (0, 0, False) or slots.time_window_count > 1:
+            return None
+
+        content = slots.content
+        best: Optional[Tuple[float, SQLTemplate]] = None
+        with self._lock:
+            templates = list(self._templates)
+
+        for template in templates:
+            if template.slots.shape != slots.shape or template.slots.content != content:
+                continue
+            confidence = SequenceMatcher(None, template.slots.tokens, slots.tokens).ratio()
+            if confidence >= self.min_confidence and (best is None or confidence > best[0]):
+                best = (confidence, template)
+
+        if best is None:
+            return None
+        return TemplateMatch(template=best[1], confidence=best[0], sql=self.render(best[1], slots))
+
+    def fill(
+        self,
+        question: str,
+        fingerprint: Hashable,
+        load_pairs: Callable[[], Sequence[Dict[str, Any]]],
+    ) -> Optional[str]:
+        """
+        Return SQL filled from a matching template, relearning first if training data changed.
+
+        Args:
+            question: The natural language question.
+            fingerprint: Current training fingerprint of the vector store.
+            load_pairs: Callable returning the trained question/SQL pairs.
+
+        Returns:
+            The filled SQL, or None to fall back to the LLM.
+        """
+        if fingerprint != self._fingerprint:
+            self.learn(load_pairs(), fingerprint)
+
+        result = self.match(question)
+        with self._lock:
+            if result is None:
+                self._misses += 1
+                return None
+            self._hits += 1
+        logger.info(
+            f"SQL template hit for '{question}' from '{result.template.question}' "
+            f"(confidence={result.confidence:.2f})"
+        )
+        return result.sql
+
+    def stats(self) -> Dict[str, Any]:
+        """Return template counts and hit/miss counters."""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "templates": len(self._templates),
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": self._hits / lookups if lookups else 0.0,
+            }
@@ -1,52 +1,226 @@
 import time
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Iterator, List, Optional, Sequence, Tuple
 
+import pyarrow as pa
 from sqlalchemy import create_engine, text
 from sqlalchemy.orm import sessionmaker, Session
 
 from src.core import logger, DataAgentRepositoryError
+from src.agents.repositories.columnar import table_from_batches
+
+
+def approx_row_bytes(row: Dict[str, Any]) -> int:
+    """Cheap estimate of a row's size once serialized (string length of each value)."""
+    size = 0
+    for key, value in row.items():
+        size += len(key)
+        if isinstance(value, (str, bytes)):
+            size += len(value)
+        elif value is None:
+            size += 4
+        else:
+            size += len(str(value))
+    return size
+
 
 class HistorianDatabaseRepository:
-    def __init__(self, connection_string: str):
+    def __init__(
+        self,
+        connection_string: str,
+        max_rows: Optional[int] = 100_000,
+        max_bytes: Optional[int] = 50 * 1024 * 1024,
+        batch_size: int = 1_000,
+    ):
+        """
+        Args:
+            connection_string: SQLAlchemy connection string of the historian database.
+            max_rows: Default cap on rows returned by execute_query. None disables it.
+            max_bytes: Default cap on the approximate size of rows returned by execute_query. None disables it.
+            batch_size: Rows fetched from the server-side cursor per round trip.
+        """
         self.engine = create_engine(connection_string)
         self.SessionLocal = sessionmaker(bind=self.engine)
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.batch_size = batch_size
 
     def _get_session(self) -> Session:
         return self.SessionLocal()
 
-    def execute_query(self, query: str, parameters: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
-        start_time = time.time()
-        
+    def _stream_partitions(
+        self,
+        query: str,
+        parameters: Optional[Dict[str, Any]] = None,
+        batch_size: Optional[int] = None,
+    ) -> Iterator[Tuple[List[str], Sequence[Tuple[Any, ...]]]]:
+        """Yield (column_names, row tuples) batches from a server-side cursor."""
+        batch_size = batch_size or self.batch_size
         try:
             with self._get_session() as session:
-                stmt = text(query)
-                # Execute the query and store the result object
+                stmt = text(query).execution_options(yield_per=batch_size)
                 result = session.execute(stmt, parameters or {})
-                
-                # Get column names using the result object's keys() method
-                column_names = result.keys()
-                
-                # Now fetch all rows
-                rows_data = result.fetchall()
-                
-                execution_time = (time.time() - start_time) * 1000  # Convert to milliseconds
-                
-                if rows_data:
-                    rows = [
-                        dict(zip(column_names, row))
-                        for row in rows_data
-                    ]
-                else:
-                    rows = []
-                
-                query_result = {
-                    "rows": rows,
-                    "row_count": len(rows),
-                    "execution_time_ms": execution_time
-                }
-                
-                return query_result
-        
+                column_names = list(result.keys())
+                try:
+                    for partition in result.partitions(batch_size):
+                        yield column_names, partition
+                finally:
+                    result.close()
         except Exception as e:
-            logger.error(f"An error occurred in HistorianDatabaseRepository.execute_query: {e}", exc_info=True)
-            raise DataAgentRepositoryError(f"Database query execution failed: {e}")
\ No newline at end of file
+            logger.error(f"An error occurred in HistorianDatabaseRepository.stream_query: {e}", exc_info=True)
+            raise DataAgentRepositoryError(f"Database query execution failed: {e}")
+
+    def stream_query(
+        self,
+        query: str,
+        parameters: Optional[Dict[str, Any]] = None,
+        batch_size: Optional[int] = None,
+    ) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Execute a query on a server-side cursor and yield rows in batches.
+
+        Only one batch is held in memory at a time; closing the generator early closes the cursor.
+
+        Args:
+            query: The SQL query.
+            parameters: Optional bind parameters.
+            batch_size: Rows per batch (defaults to the repository batch size).
+
+        Yields:
+            Lists of row dicts.
+        """
+        partitions = self._stream_partitions(query, parameters, batch_size)
+        try:
+            for column_names, partition in partitions:
+                yield [dict(zip(column_names, row)) for row in partition]
+        finally:
+            partitions.close()
+
+    def _caps(self, max_rows: Optional[int], max_bytes: Optional[int]) -> Tuple[Optional[int], Optional[int]]:
+        # Callers can only tighten the configured caps, never lift them
+        return (
+            min([cap for cap in (max_rows, self.max_rows) if cap is not None], default=None),
+            min([cap for cap in (max_bytes, self.max_bytes) if cap is not None], default=None),
+        )
+
+    def execute_query_columnar(
+        self,
+        query: str,
+        parameters: Optional[Dict[str, Any]] = None,
+        max_rows: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """
+        Execute a query into an Arrow table, built batch by batch from the cursor's row tuples.
+
+        Args:
+            query: The SQL query.
+            parameters: Optional bind parameters.
+            max_rows: Row cap for this call (cannot exceed the repository cap).
+            max_bytes: Arrow byte cap for this call (cannot exceed the repository cap).
+
+        Returns:
+            Dict with table (pyarrow.Table), row_count, execution_time_ms, truncated and truncation_reason.
+        """
+        start_time = time.time()
+        max_rows, max_bytes = self._caps(max_rows, max_bytes)
+
+        batches: List[pa.Table] = []
+        column_names: List[str] = []
+        row_count = 0
+        bytes_read = 0
+        truncation_reason = None
+        partitions = self._stream_partitions(query, parameters)
+        try:
+            for column_names, partition in partitions:
+                if max_rows is not None and row_count + len(partition) > max_rows:
+                    partition = partition[:max_rows - row_count]
+                    truncation_reason = f"row limit of {max_rows} reached"
+                batch = table_from_batches(column_names, [partition])
+                if max_bytes is not None and bytes_read + batch.nbytes > max_bytes:
+                    # Keep the share of the batch that still fits
+                    keep = int(batch.num_rows * (max_bytes - bytes_read) / max(batch.nbytes, 1))
+                    batch = batch.slice(0, max(keep, 0))
+                    truncation_reason = f"size limit of {max_bytes} bytes reached"
+                batches.append(batch)
+                row_count += batch.num_rows
+                bytes_read += batch.nbytes
+                if truncation_reason:
+                    break
+        finally:
+            partitions.close()
+
+        if batches:
+            table = pa.concat_tables(batches, promote_options="permissive")
+        else:
+            table = table_from_batches(column_names, [])
+        execution_time = (time.time() - start_time) * 1000  # Convert to milliseconds
+        if truncation_reason:
+            logger.info(f"HistorianDatabaseRepository.execute_query_columnar truncated: {truncation_reason}")
+
+        return {
+            "table": table,
+            "row_count": table.num_rows,
+            "execution_time_ms": execution_time,
+            "truncated": truncation_reason is not None,
+            "truncation_reason": truncation_reason,
+            "bytes_read": bytes_read,
+        }
+
+    def execute_query(
+        self,
+        query: str,
+        parameters: Optional[Dict[str, Any]] = None,
+        max_rows: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """
+        Execute a query, reading at most max_rows rows / max_bytes bytes from the server.
+
+        Args:
+            query: The SQL query.
+            parameters: Optional bind parameters.
+            max_rows: Row cap for this call (cannot exceed the repository cap).
+            max_bytes: Approximate byte cap for this call (cannot exceed the repository cap).
+
+        Returns:
+            Dict with rows, row_count, execution_time_ms, truncated and truncation_reason.
+        """
+        start_time = time.time()
+        max_rows, max_bytes = self._caps(max_rows, max_bytes)
+
+        rows: List[Dict[str, Any]] = []
+        bytes_read = 0
+        truncation_reason = None
+        batches = self.stream_query(query, parameters)
+        try:
+            for batch in batches:
+                for row in batch:
+                    if max_rows is not None and len(rows) >= max_rows:
+                        truncation_reason = f"row limit of {max_rows} reached"
+                        break
+                    row_bytes = approx_row_bytes(row)
+                    if max_bytes is not None and bytes_read + row_bytes > max_bytes:
+                        truncation_reason = f"size limit of {max_bytes} bytes reached"
+                        break
+                    rows.append(row)
+                    bytes_read += row_bytes
+                if truncation_reason:
+                    break
+        finally:
+            # Stops fetching and closes the server-side cursor when truncated
+            batches.close()
+
+        execution_time = (time.time() - start_time) * 1000  # Convert to milliseconds
+        if truncation_reason:
+            logger.info(f"HistorianDatabaseRepository.execute_query truncated: {truncation_reason}")
+
+        query_result = {
+            "rows": rows,
+            "row_count": len(rows),
+            "execution_time_ms": execution_time,
+            "truncated": truncation_reason is not None,
+            "truncation_reason": truncation_reason,
+            "bytes_read": bytes_read,
+        }
+
+        return query_result
@@ -1,15 +1,42 @@
+import asyncio
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from src.core import logger
 from src.core.config import COMPLEX_GEMINI_MODEL, GEMINI_API_KEY, OPENAI_API_KEY
 from vanna.chromadb import ChromaDB_VectorStore
 from vanna.google import GoogleGeminiChat
 from vanna.openai import OpenAI_Chat
 from pandas import DataFrame
+import pyarrow as pa
 from plotly.graph_objs import Figure
 
 from src.agents.dto.response import ErrorDTO, ErrorType
+from src.agents.repositories.pg_pool import PostgresConnectionPool
+from src.agents.repositories.prompt_builder import PromptBuilder, approx_tokens
+from src.agents.repositories.sql_cache import SemanticSQLCache
+from src.agents.repositories.sql_templates import SQLTemplateEngine
+from src.agents.repositories.plotly_code_cache import PlotlyCodeCache
+
+
+@dataclass
+class RetrievalResult:
+    """Context retrieved from the vector store for one question, with per-stage timings in ms."""
+    question_sql_list: list
+    ddl_list: list
+    doc_list: list
+    embedding: Any = None
+    distances: Dict[str, list] = field(default_factory=dict)
+    timings: Dict[str, float] = field(default_factory=dict)
+
 
 class CustomVanna(ChromaDB_VectorStore, GoogleGeminiChat): #OpenAI_Chat):
     
-    def __init__(self, config=None):
+    def __init__(self, config=None, prompt_builder: Optional[PromptBuilder] = None):
         ChromaDB_VectorStore.__init__(
             self, 
             config=config
@@ -22,6 +49,291 @@ class CustomVanna(ChromaDB_VectorStore, GoogleGeminiChat): #OpenAI_Chat):
                 'model_name': COMPLEX_GEMINI_MODEL
             }
         )
+        # Bumped on every training change made through this instance
+        self._training_generation = 0
+        self.prompt_builder = prompt_builder
+        self.pool: Optional[PostgresConnectionPool] = None
+
+        # One worker per collection so the three similarity searches run concurrently
+        self._retrieval_executor = ThreadPoolExecutor(max_workers=3, thread_name_prefix="vanna-retrieval")
+        self._timings_lock = threading.Lock()
+        self._timing_totals: Dict[str, float] = {}
+        self._timing_count = 0
+        self.last_timings: Dict[str, float] = {}
+
+    def connect_to_postgres_pool(self, pool: PostgresConnectionPool) -> None:
+        """
+        Run SQL through a shared connection pool instead of a new connection per query.
+
+        Args:
+            pool: The pool to borrow connections from.
+        """
+        self.pool = pool
+        self.dialect = "PostgreSQL"
+        self.run_sql_is_set = True
+        self.run_sql = pool.run_sql
+
+    async def run_sql_async(self, sql: str) -> DataFrame:
+        """Run SQL without blocking the event loop (asyncpg when pooled, a worker thread otherwise)."""
+        if self.pool is not None:
+            return await self.pool.run_sql_async(sql)
+        return await asyncio.to_thread(self.run_sql, sql)
+
+    def run_sql_arrow(self, sql: str) -> pa.Table:
+        """Run SQL into a pyarrow.Table (built from driver batches when pooled)."""
+        if self.pool is not None:
+            return self.pool.run_sql_arrow(sql)
+        return pa.Table.from_pandas(self.run_sql(sql), preserve_index=False)
+
+    async def run_sql_arrow_async(self, sql: str) -> pa.Table:
+        """Async variant of run_sql_arrow."""
+        if self.pool is not None:
+            return await self.pool.run_sql_arrow_async(sql)
+        return await asyncio.to_thread(self.run_sql_arrow, sql)
+
+    def add_question_sql(self, question: str, sql: str, **kwargs) -> str:
+        id = super().add_question_sql(question=question, sql=sql, **kwargs)
+        self._training_generation += 1
+        return id
+
+    def add_ddl(self, ddl: str, **kwargs) -> str:
+        id = super().add_ddl(ddl=ddl, **kwargs)
+        self._training_generation += 1
+        return id
+
+    def add_documentation(self, documentation: str, **kwargs) -> str:
+        id = super().add_documentation(documentation=documentation, **kwargs)
+        self._training_generation += 1
+        return id
+
+    def remove_training_data(self, id: str, **kwargs) -> bool:
+        removed = super().remove_training_data(id=id, **kwargs)
+        self._training_generation += 1
+        return removed
+
+    def remove_collection(self, collection_name: str) -> bool:
+        removed = super().remove_collection(collection_name)
+        self._training_generation += 1
+        return removed
+
+    def training_fingerprint(self) -> Tuple[int, int, int, int]:
+        """
+        Identify the current state of the training collections.
+
+        Combines the in-process training generation with the size of each Chroma collection,
+        so training done by another process (e.g. training_power.py) is also detected.
+        """
+        return (
+            self._training_generation,
+            self.sql_collection.count(),
+            self.ddl_collection.count(),
+            self.documentation_collection.count(),
+        )
+
+    def get_question_sql_pairs(self) -> List[Dict[str, Any]]:
+        """Return every trained question/SQL pair without touching the DDL and documentation collections."""
+        sql_data = self.sql_collection.get(include=["documents"])
+        return [json.loads(document) for document in sql_data.get("documents") or []]
+
+    @staticmethod
+    def _query_collection(collection, embedding: Sequence[float], n_results: int) -> Tuple[list, list, float]:
+        start = time.perf_counter()
+        results = collection.query(query_embeddings=[embedding], n_results=n_results)
+        documents = ChromaDB_VectorStore._extract_documents(results) or []
+        distances = (results.get("distances") or [[]])[0] or []
+        return documents, list(distances), (time.perf_counter() - start) * 1000
+
+    def retrieve_context(self, question: str, embedding: Optional[Sequence[float]] = None) -> RetrievalResult:
+        """
+        Retrieve similar question/SQL pairs, DDL and documentation for a question.
+
+        The question is embedded once (or the caller's embedding is reused) and the three
+        collection searches run concurrently instead of each re-embedding the question.
+
+        Args:
+            question: The natural language question.
+            embedding: Optional precomputed embedding of the question.
+
+        Returns:
+            A RetrievalResult with the retrieved context and per-stage timings.
+        """
+        timings: Dict[str, float] = {}
+        start = time.perf_counter()
+        if embedding is None:
+            embedding = self.generate_embedding(question)
+            timings["embedding_ms"] = (time.perf_counter() - start) * 1000
+        else:
+            timings["embedding_ms"] = 0.0
+
+        search_start = time.perf_counter()
+        sql_future = self._retrieval_executor.submit(
+            self._query_collection, self.sql_collection, embedding, self.n_results_sql
+        )
+        ddl_future = self._retrieval_executor.submit(
+            self._query_collection, self.ddl_collection, embedding, self.n_results_ddl
+        )
+        doc_future = self._retrieval_executor.submit(
+            self._query_collection, self.documentation_collection, embedding, self.n_results_documentation
+        )
+        distances: Dict[str, list] = {}
+        question_sql_list, distances["example"], timings["question_sql_ms"] = sql_future.result()
+        ddl_list, distances["ddl"], timings["ddl_ms"] = ddl_future.result()
+        doc_list, distances["documentation"], timings["documentation_ms"] = doc_future.result()
+        timings["search_ms"] = (time.perf_counter() - search_start) * 1000
+        timings["retrieval_ms"] = (time.perf_counter() - start) * 1000
+
+        return RetrievalResult(
+            question_sql_list=question_sql_list,
+            ddl_list=ddl_list,
+            doc_list=doc_list,
+            embedding=embedding,
+            distances=distances,
+            timings=timings,
+        )
+
+    def _record_timings(self, timings: Dict[str, float]) -> None:
+        self.last_timings = timings
+        with self._timings_lock:
+            self._timing_count += 1
+            for stage, value in timings.items():
+                self._timing_totals[stage] = self._timing_totals.get(stage, 0.0) + value
+        logger.info("CustomVanna.generate_sql timings: " + ", ".join(f"{k}={v:.1f}" for k, v in timings.items()))
+
+    def timing_stats(self) -> Dict[str, Any]:
+        """Return the average per-stage latency (ms) of generate_sql calls."""
+        with self._timings_lock:
+            count = self._timing_count
+            return {
+                "calls": count,
+                "avg_ms": {stage: total / count for stage, total in self._timing_totals.items()} if count else {},
+                "last_ms": dict(self.last_timings),
+            }
+
+    def generate_sql(
+        self,
+        question: str,
+        allow_llm_to_see_data: bool = False,
+        embedding: Optional[Sequence[float]] = None,
+        **kwargs,
+    ) -> str:
+        """
+        Generate SQL for a question (same flow as VannaBase.generate_sql with concurrent retrieval).
+
+        Args:
+            question: The natural language question.
+            allow_llm_to_see_data: Whether an intermediate SQL query may be run for introspection.
+            embedding: Optional precomputed embedding of the question.
+
+        Returns:
+            The generated SQL, or the LLM's explanation when SQL cannot be generated.
+        """
+        initial_prompt = self.config.get("initial_prompt", None) if self.config is not None else None
+
+        context = self.retrieve_context(question, embedding=embedding)
+        timings = context.timings
+
+        prompt = self.get_sql_prompt(
+            initial_prompt=initial_prompt,
+            question=question,
+            question_sql_list=context.question_sql_list,
+            ddl_list=context.ddl_list,
+            doc_list=context.doc_list,
+            distances=context.distances,
+            **kwargs,
+        )
+        self.log(title="SQL Prompt", message=prompt)
+        llm_start = time.perf_counter()
+        llm_response = self.submit_prompt(prompt, **kwargs)
+        timings["llm_ms"] = (time.perf_counter() - llm_start) * 1000
+        self.log(title="LLM Response", message=llm_response)
+
+        if 'intermediate_sql' in llm_response:
+            if not allow_llm_to_see_data:
+                self._record_timings(timings)
+                return "The LLM is not allowed to see the data in your database. Your question requires database introspection to generate the necessary SQL. Please set allow_llm_to_see_data=True to enable this."
+
+            intermediate_sql = self.extract_sql(llm_response)
+            try:
+                self.log(title="Running Intermediate SQL", message=intermediate_sql)
+                df = self.run_sql(intermediate_sql)
+
+                prompt = self.get_sql_prompt(
+                    initial_prompt=initial_prompt,
+                    question=question,
+                    question_sql_list=context.question_sql_list,
+                    ddl_list=context.ddl_list,
+                    distances=context.distances,
+                    doc_list=context.doc_list,
+                    pinned_docs=[f"The following is a pandas DataFrame with the results of the intermediate SQL query {intermediate_sql}: \n" + df.to_markdown()],
+                    **kwargs,
+                )
+                self.log(title="Final SQL Prompt", message=prompt)
+                llm_start = time.perf_counter()
+                llm_response = self.submit_prompt(prompt, **kwargs)
+                timings["llm_ms"] += (time.perf_counter() - llm_start) * 1000
+                self.log(title="LLM Response", message=llm_response)
+            except Exception as e:
+                self._record_timings(timings)
+                return f"Error running intermediate SQL: {e}"
+
+        self._record_timings(timings)
+        return self.extract_sql(llm_response)
+
+    def get_sql_prompt(
+        self,
+        initial_prompt: str,
+        question: str,
+        question_sql_list: list,
+        ddl_list: list,
+        doc_list: list,
+        distances: Optional[Dict[str, list]] = None,
+        pinned_docs: Optional[list] = None,
+        **kwargs,
+    ):
+        """
+        Build the SQL prompt, first narrowing the retrieved context to the prompt builder's token budget.
+
+        Args:
+            initial_prompt: Optional system prompt prefix.
+            question: The natural language question.
+            question_sql_list: Retrieved question/SQL examples.
+            ddl_list: Retrieved DDL statements.
+            doc_list: Retrieved documentation.
+            distances: Optional vector distances aligned with the retrieved lists.
+            pinned_docs: Documentation that is always included ahead of the retrieved documentation
+                (e.g. intermediate SQL results); its tokens are reserved before selecting the rest.
+
+        Returns:
+            The message log for the LLM.
+        """
+        pinned_docs = list(pinned_docs or [])
+        if self.prompt_builder is not None:
+            pinned_docs = [self.prompt_builder.trim_text(doc) for doc in pinned_docs]
+            # Rough allowance for the instructions and response guidelines VannaBase adds
+            reserved_tokens = approx_tokens((initial_prompt or "") + question) + 300
+            reserved_tokens += sum(approx_tokens(doc) for doc in pinned_docs)
+            question_sql_list, ddl_list, doc_list, _ = self.prompt_builder.select(
+                question=question,
+                question_sql_list=question_sql_list,
+                ddl_list=ddl_list,
+                doc_list=doc_list,
+                distances=distances,
+                reserved_tokens=reserved_tokens,
+            )
+        return super().get_sql_prompt(
+            initial_prompt=initial_prompt,
+            question=question,
+            question_sql_list=question_sql_list,
+            ddl_list=ddl_list,
+            # First, so VannaBase's own documentation size cap cannot cut them
+            doc_list=pinned_docs + list(doc_list),
+            **kwargs,
+        )
+
+    def generate_plotly_code(self, question: str = None, sql: str = None, df_metadata: str = None, **kwargs) -> str:
+        if self.prompt_builder is not None:
+            df_metadata = self.prompt_builder.trim_text(df_metadata)
+        return super().generate_plotly_code(question=question, sql=sql, df_metadata=df_metadata, **kwargs)
 
     #KIV custom implementation
     def generate_query_explanation(self, sql: str):
@@ -32,17 +344,83 @@ class CustomVanna(ChromaDB_VectorStore, GoogleGeminiChat): #OpenAI_Chat):
         return self.submit_prompt(prompt=my_prompt)
 
 class VannaRepository:    
-    def __init__(self, vanna_model: CustomVanna):
+    def __init__(
+        self,
+        vanna_model: CustomVanna,
+        sql_cache: Optional[SemanticSQLCache] = None,
+        sql_templates: Optional[SQLTemplateEngine] = None,
+        plotly_code_cache: Optional[PlotlyCodeCache] = None,
+    ):
         self.vanna_model = vanna_model
+        self.sql_cache = sql_cache
+        self.sql_templates = sql_templates
+        self.plotly_code_cache = plotly_code_cache
 
     def generate_sql(self, question: str, allow_llm_to_see_data: bool = False) -> str:
-        return self.vanna_model.generate_sql(question=question, allow_llm_to_see_data=allow_llm_to_see_data)
+        if self.sql_cache is None and self.sql_templates is None:
+            return self.vanna_model.generate_sql(question=question, allow_llm_to_see_data=allow_llm_to_see_data)
+
+        fingerprint = self.vanna_model.training_fingerprint()
+        if self.sql_cache is not None:
+            sql = self.sql_cache.get(question, fingerprint, allow_llm_to_see_data)
+            if sql is not None:
+                logger.info(f"SQL cache exact hit for question: {question}")
+                return sql
+
+        if self.sql_templates is not None:
+            sql = self.sql_templates.fill(question, fingerprint, self.vanna_model.get_question_sql_pairs)
+            if sql is not None:
+                if self.sql_cache is not None:
+                    self.sql_cache.put(question, sql, None, fingerprint, allow_llm_to_see_data)
+                return sql
+
+        embedding = None
+        if self.sql_cache is not None:
+            embedding = self.vanna_model.generate_embedding(question)
+            sql = self.sql_cache.get_similar(question, embedding, fingerprint, allow_llm_to_see_data)
+            if sql is not None:
+                logger.info(f"SQL cache semantic hit for question: {question}")
+                return sql
+
+        sql = self.vanna_model.generate_sql(
+            question=question, allow_llm_to_see_data=allow_llm_to_see_data, embedding=embedding
+        )
+        # Only cache real queries, not explanations or "not allowed to see data" messages
+        if self.sql_cache is not None and sql and self.vanna_model.is_sql_valid(sql):
+            self.sql_cache.put(question, sql, embedding, fingerprint, allow_llm_to_see_data)
+        return sql
 
     def run_sql(self, sql: str) -> DataFrame:
         return self.vanna_model.run_sql(sql=sql)
 
+    async def run_sql_async(self, sql: str) -> DataFrame:
+        return await self.vanna_model.run_sql_async(sql=sql)
+
+    def run_sql_arrow(self, sql: str) -> pa.Table:
+        return self.vanna_model.run_sql_arrow(sql=sql)
+
+    async def run_sql_arrow_async(self, sql: str) -> pa.Table:
+        return await self.vanna_model.run_sql_arrow_async(sql=sql)
+
+    def explain_sql(self, sql: str) -> Any:
+        """Return the planner's EXPLAIN (FORMAT JSON) output for a query without executing it."""
+        df = self.vanna_model.run_sql(sql=f"EXPLAIN (FORMAT JSON) {sql.strip().rstrip(';')}")
+        return df.iloc[0, 0]
+
     def generate_plotly_code(self, question: str, sql: str, df_metadata: str = None) -> str:
-        return self.vanna_model.generate_plotly_code(question=question, sql=sql, df_metadata=df_metadata)
+        # Without the result schema there is nothing to key the cache on
+        if self.plotly_code_cache is None or not df_metadata:
+            return self.vanna_model.generate_plotly_code(question=question, sql=sql, df_metadata=df_metadata)
+
+        plotly_code = self.plotly_code_cache.get(question, df_metadata)
+        if plotly_code is not None:
+            logger.info(f"Plotly code cache hit for question: {question}")
+            return plotly_code
+
+        plotly_code = self.vanna_model.generate_plotly_code(question=question, sql=sql, df_metadata=df_metadata)
+        if plotly_code:
+            self.plotly_code_cache.put(question, df_metadata, plotly_code)
+        return plotly_code
 
     def get_plotly_figure(self, plotly_code: str, df: DataFrame, dark_mode: bool)-> Figure:
         return self.vanna_model.get_plotly_figure(plotly_code=plotly_code, df=df, dark_mode=dark_mode)
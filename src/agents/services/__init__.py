@@ -1,3 +1,8 @@
 from src.agents.services.vanna  import VannaService
 from src.agents.services.ss.data import HistorianDatabaseService
-from src.agents.services.reporting import ReportingService
\ No newline at end of file
+from src.agents.services.reporting import ReportingService
+from src.agents.services.query_guard import QueryCostGuard
+from src.agents.services.worker_pool import ProcessWorkerPool, FigureRenderPool
+from src.agents.services.plotly_executor import PlotlyCodeExecutor
+from src.agents.services.chart_synthesizer import ChartSynthesizer
+from src.agents.services.figure_resampler import FigureResampler
@@ -0,0 +1,220 @@
+import asyncio
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+import plotly.io as pio
+from google.adk.artifacts import BaseArtifactService
+from google.genai import types
+
+from src.core import logger
+from src.agents.services.worker_pool import FigureRenderPool
+from src.agents.utils.chart_artifacts import FIGURE_MIME_TYPE, decode_figure
+
+EXPORT_FORMATS = {
+    "pdf": "application/pdf",
+    "png": "image/png",
+    "svg": "image/svg+xml",
+}
+
+
+@dataclass
+class ChartRendition:
+    """An exported chart image."""
+    data: bytes
+    mime_type: str
+    filename: str
+    cached: bool
+
+
+class ChartExportService:
+    """
+    Lazy PDF/PNG/SVG export of chart artifacts.
+
+    Charts are stored once as figure JSON. A rendition is rendered the first time it is asked for,
+    saved in the artifact store under a separate app name (so renditions never show up among the
+    session's own artifacts), and served from there afterwards. Concurrent requests for the same
+    rendition share one render. Sizes and scales are restricted, since every distinct combination
+    is rendered and stored as its own artifact.
+    """
+
+    def __init__(
+        self,
+        artifact_service: BaseArtifactService,
+        app_name: str,
+        render_pool: Optional[FigureRenderPool] = None,
+        rendition_app_name: Optional[str] = None,
+        max_dimension: int = 4096,
+        scales: Sequence[float] = (1.0, 2.0, 3.0),
+    ):
+        """
+        Args:
+            artifact_service: Store holding the chart artifacts and their renditions.
+            app_name: Application name the charts are saved under.
+            render_pool: Warm Kaleido renderers. Without it each export renders on a thread
+                with a cold Kaleido.
+            rendition_app_name: Application name renditions are saved under ("<app_name>.renditions" when None).
+            max_dimension: Largest accepted width or height in pixels.
+            scales: Accepted scale factors.
+        """
+        self.artifact_service = artifact_service
+        self.app_name = app_name
+        self.render_pool = render_pool
+        self.rendition_app_name = rendition_app_name or f"{app_name}.renditions"
+        self.max_dimension = max_dimension
+        self.scales = tuple(float(scale) for scale in scales)
+
+        self._inflight: Dict[Tuple[str, str, str], asyncio.Task] = {}
+        self._lock = threading.Lock()
+        self._renders = 0
+        self._cache_hits = 0
+        self._deduplicated = 0
+        self._failures = 0
+
+    @staticmethod
+    def rendition_filename(
+        filename: str,
+        version: int,
+        format: str,
+        width: Optional[int] = None,
+        height: Optional[int] = None,
+        scale: float = 1.0,
+    ) -> str:
+        """Artifact name of a rendition: chart name, source version and any non-default render options."""
+        options = ""
+        if width or height:
+            options += f".{width or 'auto'}x{height or 'auto'}"
+        if scale != 1.0:
+            options += f".x{scale:g}"
+        return f"{filename}.v{version}{options}.{format}"
+
+    def validate_options(self, width: Optional[int], height: Optional[int], scale: float) -> None:
+        """Raise ValueError for a size or scale outside the accepted range."""
+        for name, value in (("width", width), ("height", height)):
+            if value is not None and not 16 <= value <= self.max_dimension:
+                raise ValueError(f"{name} must be between 16 and {self.max_dimension} pixels")
+        if float(scale) not in self.scales:
+            raise ValueError(f"scale must be one of {', '.join(f'{s:g}' for s in self.scales)}")
+
+    async def export(
+        self,
+        user_id: str,
+        session_id: str,
+        filename: str,
+        format: str = "pdf",
+        version: Optional[int] = None,
+        width: Optional[int] = None,
+        height: Optional[int] = None,
+        scale: float = 1.0,
+    ) -> Optional[ChartRendition]:
+        """
+        Return a rendition of a chart, rendering it on first request.
+
+        Args:
+            user_id: Owner of the chart.
+            session_id: Session the chart was saved in.
+            filename: Chart artifact name.
+            format: One of EXPORT_FORMATS.
+            version: Chart version (latest when None).
+            width: Image width in pixels (figure default when None).
+            height: Image height in pixels (figure default when None).
+            scale: Scale factor.
+
+        Returns:
+            The rendition, or None if the chart does not exist.
+
+        Raises:
+            ValueError: If the format or render options are not supported or the artifact is not a figure.
+            WorkerPoolBusyError, WorkerPoolTimeoutError: If the render pool is saturated or the render hangs.
+        """
+        format = format.lower()
+        if format not in EXPORT_FORMATS:
+            raise ValueError(f"Unsupported export format {format!r}; expected one of {', '.join(EXPORT_FORMATS)}")
+        self.validate_options(width, height, scale)
+
+        if version is None:
+            versions = await self.artifact_service.list_versions(
+                app_name=self.app_name, user_id=user_id, session_id=session_id, filename=filename
+            )
+            if not versions:
+                return None
+            version = max(versions)
+
+        rendition_name = self.rendition_filename(filename, version, format, width, height, scale)
+        cached = await self.artifact_service.load_artifact(
+            app_name=self.rendition_app_name, user_id=user_id, session_id=session_id, filename=rendition_name
+        )
+        if cached is not None:
+            with self._lock:
+                self._cache_hits += 1
+            return ChartRendition(cached.inline_data.data, cached.inline_data.mime_type, rendition_name, cached=True)
+
+        key = (user_id, session_id, rendition_name)
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(
+                self._render_and_store(user_id, session_id, filename, version, format, rendition_name, width, height, scale)
+            )
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            with self._lock:
+                self._deduplicated += 1
+        # shield: a client disconnecting must not cancel a render other requests are waiting on
+        return await asyncio.shield(task)
+
+    async def _render_and_store(
+        self,
+        user_id: str,
+        session_id: str,
+        filename: str,
+        version: int,
+        format: str,
+        rendition_name: str,
+        width: Optional[int],
+        height: Optional[int],
+        scale: float,
+    ) -> Optional[ChartRendition]:
+        source = await self.artifact_service.load_artifact(
+            app_name=self.app_name, user_id=user_id, session_id=session_id, filename=filename, version=version
+        )
+        if source is None:
+            return None
+        if source.inline_data.mime_type != FIGURE_MIME_TYPE:
+            raise ValueError(f"Artifact {filename!r} ({source.inline_data.mime_type}) is not a figure and cannot be exported")
+
+        try:
+            figure = await asyncio.to_thread(decode_figure, source.inline_data.data)
+            data = await self._render(figure, format, width, height, scale)
+        except Exception:
+            with self._lock:
+                self._failures += 1
+            raise
+        mime_type = EXPORT_FORMATS[format]
+        await self.artifact_service.save_artifact(
+            app_name=self.rendition_app_name,
+            user_id=user_id,
+            session_id=session_id,
+            filename=rendition_name,
+            artifact=types.Part.from_bytes(data=data, mime_type=mime_type),
+        )
+        with self._lock:
+            self._renders += 1
+        logger.info(f"Exported {filename} v{version} as {format} ({len(data)} bytes)")
+        return ChartRendition(data, mime_type, rendition_name, cached=False)
+
+    async def _render(self, figure: Dict[str, Any], format: str, width: Optional[int], height: Optional[int], scale: float) -> bytes:
+        if self.render_pool is not None:
+            return await self.render_pool.render(figure, format=format, width=width, height=height, scale=scale)
+        return await asyncio.to_thread(pio.to_image, figure, format=format, width=width, height=height, scale=scale)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return render, rendition cache and dedup counters."""
+        with self._lock:
+            return {
+                "renders": self._renders,
+                "cache_hits": self._cache_hits,
+                "deduplicated": self._deduplicated,
+                "failures": self._failures,
+                "in_flight": len(self._inflight),
+            }
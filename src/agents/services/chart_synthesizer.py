@@ -0,0 +1,132 @@
+import re
+import threading
+from typing import Any, Dict, List, Optional
+
+# Explicit requests for chart types the rules do not build are left to the LLM
+_CHART_TYPE_RE = re.compile(
+    r"\b(pie|donut|doughnut|scatter|histogram|heat ?map|box ?plot|violin|area|stacked|map|bubble|3d|funnel|sunburst|treemap|gauge)\b",
+    re.IGNORECASE,
+)
+
+
+def _is_time(dtype: str) -> bool:
+    # "date": an object column of datetime.date/datetime values (see dataframe_schema)
+    return dtype.startswith("datetime64") or dtype.startswith("timestamp") or dtype == "date"
+
+
+def _is_numeric(dtype: str) -> bool:
+    return dtype.lower().startswith(("int", "uint", "float", "double", "decimal"))
+
+
+def _is_category(dtype: str) -> bool:
+    return dtype in ("object", "string", "category", "bool", "boolean") or dtype.startswith("string")
+
+
+class ChartSynthesizer:
+    """
+    Rule-based Plotly code for the common result shapes, so they need no LLM call:
+
+    - one row of numeric KPIs -> number indicators
+    - one timestamp column + numeric columns -> line chart (one trace per column)
+    - one timestamp + one category + one numeric column -> line chart coloured by category
+    - one category + one numeric column -> bar chart
+    - one category + several numeric columns -> grouped bar chart
+
+    The output is ordinary Plotly code for the `df` of the conversation, so it runs through the
+    same figure step as LLM-generated code. Any other shape returns None.
+    """
+
+    def __init__(self, max_series: int = 8, max_kpis: int = 6):
+        """
+        Args:
+            max_series: Maximum numeric columns drawn as separate series.
+            max_kpis: Maximum numeric columns shown as indicators for a one-row result.
+        """
+        self.max_series = max_series
+        self.max_kpis = max_kpis
+        self._lock = threading.Lock()
+        self._counts: Dict[str, int] = {}
+        self._delegated = 0
+
+    def synthesize(self, question: str, df_schema: Dict[str, str], row_count: Optional[int] = None) -> Optional[str]:
+        """
+        Build Plotly code for a result schema.
+
+        Args:
+            question: The chart request; used as the title, and to spot explicitly requested chart types.
+            df_schema: Column name -> pandas dtype of the result, in column order.
+            row_count: Number of rows in the result, if known.
+
+        Returns:
+            Plotly code assigning `fig`, or None when the shape should go to the LLM.
+        """
+        kind, code = self._classify(question, df_schema, row_count)
+        with self._lock:
+            if code is None:
+                self._delegated += 1
+            else:
+                self._counts[kind] = self._counts.get(kind, 0) + 1
+        return code
+
+    def _classify(self, question: str, df_schema: Dict[str, str], row_count: Optional[int]):
+        if not df_schema or _CHART_TYPE_RE.search(question or ""):
+            return None, None
+
+        times = [column for column, dtype in df_schema.items() if _is_time(dtype)]
+        numerics = [column for column, dtype in df_schema.items() if _is_numeric(dtype)]
+        categories = [column for column, dtype in df_schema.items() if _is_category(dtype)]
+        if len(times) + len(numerics) + len(categories) != len(df_schema) or not numerics:
+            return None, None
+
+        title = repr(question.strip()) if question else "None"
+        # NUMERIC aggregates arrive as Decimal objects, which plotly express does not treat as numbers
+        decimals = [column for column in numerics if df_schema[column].lower().startswith("decimal")]
+        prelude = f"df[{decimals!r}] = df[{decimals!r}].astype(float)\n" if decimals else ""
+        kind, code = None, None
+        if row_count == 1 and not times and len(numerics) <= self.max_kpis:
+            kind, code = "indicator", self._indicator_code(numerics, title)
+        elif len(times) == 1 and not categories and len(numerics) <= self.max_series:
+            kind, code = "line", (
+                f"df = df.sort_values({times[0]!r})\n"
+                f"fig = px.line(df, x={times[0]!r}, y={numerics!r}, title={title})"
+            )
+        elif len(times) == 1 and len(categories) == 1 and len(numerics) == 1:
+            kind, code = "line_by_category", (
+                f"df = df.sort_values({times[0]!r})\n"
+                f"fig = px.line(df, x={times[0]!r}, y={numerics[0]!r}, color={categories[0]!r}, title={title})"
+            )
+        elif not times and len(categories) == 1 and len(numerics) == 1:
+            kind, code = "bar", f"fig = px.bar(df, x={categories[0]!r}, y={numerics[0]!r}, title={title})"
+        elif not times and len(categories) == 1 and len(numerics) <= self.max_series:
+            kind, code = "grouped_bar", (
+                f"fig = px.bar(df, x={categories[0]!r}, y={numerics!r}, barmode='group', title={title})"
+            )
+        if code is None:
+            return None, None
+        return kind, prelude + code
+
+    @staticmethod
+    def _indicator_code(columns: List[str], title: str) -> str:
+        return (
+            "fig = go.Figure()\n"
+            f"for i, column in enumerate({columns!r}):\n"
+            "    fig.add_trace(go.Indicator(\n"
+            "        mode='number',\n"
+            "        value=float(df[column].iloc[0]),\n"
+            "        title={'text': column},\n"
+            "        domain={'row': 0, 'column': i},\n"
+            "    ))\n"
+            f"fig.update_layout(grid={{'rows': 1, 'columns': {len(columns)}}}, title={title})"
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        """Return how many charts were synthesized, by kind, and how many went to the LLM."""
+        with self._lock:
+            synthesized = sum(self._counts.values())
+            total = synthesized + self._delegated
+            return {
+                "synthesized": synthesized,
+                "by_kind": dict(self._counts),
+                "delegated": self._delegated,
+                "synthesized_rate": synthesized / total if total else 0.0,
+            }
@@ -1,6 +1,8 @@
 from __future__ import annotations
 
-from typing import Optional
+import asyncio
+import hashlib
+from typing import AsyncIterator, Optional
 from typing_extensions import override
 import asyncpg
 from google.adk.artifacts import BaseArtifactService
@@ -8,6 +10,9 @@ import logging
 from typing import Optional
 from google.genai import types
 
+from src.agents.repositories.artifact_cache import ArtifactCache, CachedArtifact
+from src.agents.utils.artifact_codec import ArtifactCodec, DICTIONARY_MIME_TYPES, IDENTITY, zstd_available
+
 
 logger = logging.getLogger("google_adk." + __name__)
 
@@ -17,21 +22,146 @@ class PostgresArtifactService(BaseArtifactService):
     Provides persistent storage for artifacts using PostgreSQL as the backend.
     """
 
-    def __init__(self, dsn: str):
+    # Payloads at least this large are (de)compressed on a worker thread
+    _OFFLOAD_BYTES = 256 * 1024
+
+    def __init__(
+        self,
+        dsn: str,
+        compress: bool = True,
+        codec: Optional[ArtifactCodec] = None,
+        cache: Optional[ArtifactCache] = None,
+    ):
         """Initialize the PostgreSQL artifact service.
         
         Args:
             dsn: PostgreSQL connection string (Data Source Name).
+            compress: Compress text-like payloads before storing them.
+            codec: Codec used for compression (a default ArtifactCodec when None).
+            cache: Read cache of loaded artifact versions. None reads every load from the database.
         """
         self.dsn = dsn
+        self.compress = compress
+        self.codec = codec or ArtifactCodec()
+        self.cache = cache
         self._pool: Optional[asyncpg.Pool] = None
+        self._schema_ready = False
+        self._schema_lock = asyncio.Lock()
+        self._blob_writes = 0
+        self._dedup_hits = 0
+        self._bytes_deduplicated = 0
+        self._bytes_in = 0
+        self._bytes_stored = 0
 
     async def _get_pool(self) -> asyncpg.Pool:
         """Lazy initialization of the connection pool."""
         if self._pool is None:
             self._pool = await asyncpg.create_pool(dsn=self.dsn)
+        if not self._schema_ready:
+            await self._ensure_schema(self._pool)
         return self._pool
 
+    async def _ensure_schema(self, pool: asyncpg.Pool) -> None:
+        """Create the per-path version counter table and seed it from existing artifacts.
+
+        Args:
+            pool: The connection pool.
+        """
+        async with self._schema_lock:
+            if self._schema_ready:
+                return
+            async with pool.acquire() as conn:
+                async with conn.transaction():
+                    await conn.execute(
+                        """
+                        CREATE TABLE IF NOT EXISTS artifact_versions (
+                            path VARCHAR(1024) PRIMARY KEY,
+                            next_version INTEGER NOT NULL
+                        )
+                        """
+                    )
+                    # Content-addressed payloads; artifacts_table rows (one per version) point at them
+                    await conn.execute(
+                        """
+                        CREATE TABLE IF NOT EXISTS artifact_blobs (
+                            sha256 BYTEA PRIMARY KEY,
+                            data BYTEA NOT NULL,
+                            size INTEGER NOT NULL,
+                            ref_count INTEGER NOT NULL,
+                            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                        )
+                        """
+                    )
+                    # Codec of each stored payload (see ArtifactCodec), and trained zstd dictionaries
+                    await conn.execute(
+                        """
+                        ALTER TABLE artifact_blobs ADD COLUMN IF NOT EXISTS codec VARCHAR(48) NOT NULL DEFAULT 'identity';
+                        CREATE TABLE IF NOT EXISTS artifact_codec_dictionaries (
+                            dictionary_id VARCHAR(32) PRIMARY KEY,
+                            data BYTEA NOT NULL,
+                            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                        );
+                        """
+                    )
+                    # Payloads are compressed (or binary) already: skip pglz so ranged reads
+                    # with substring() only fetch the TOAST chunks they need
+                    await conn.execute("ALTER TABLE artifact_blobs ALTER COLUMN data SET STORAGE EXTERNAL")
+                    # Rows saved before the blob table keep their payload inline in data
+                    await conn.execute(
+                        """
+                        ALTER TABLE artifacts_table ADD COLUMN IF NOT EXISTS blob_sha256 BYTEA;
+                        ALTER TABLE artifacts_table ALTER COLUMN data DROP NOT NULL;
+                        """
+                    )
+                    # Key parts and size as indexed columns, so listings never parse paths or touch payloads.
+                    # session_id is NULL for user-scoped ("user:") files.
+                    await conn.execute(
+                        """
+                        ALTER TABLE artifacts_table ADD COLUMN IF NOT EXISTS app_name VARCHAR(255);
+                        ALTER TABLE artifacts_table ADD COLUMN IF NOT EXISTS user_id VARCHAR(255);
+                        ALTER TABLE artifacts_table ADD COLUMN IF NOT EXISTS session_id VARCHAR(255);
+                        ALTER TABLE artifacts_table ADD COLUMN IF NOT EXISTS filename VARCHAR(1024);
+                        ALTER TABLE artifacts_table ADD COLUMN IF NOT EXISTS size INTEGER;
+                        CREATE INDEX IF NOT EXISTS idx_artifacts_scope
+                            ON artifacts_table (app_name, user_id, session_id, filename, version DESC);
+                        """
+                    )
+                    # Rows saved before these columns existed get them from their path
+                    await conn.execute(
+                        """
+                        UPDATE artifacts_table a
+                        SET app_name = split_part(a.path, '/', 1),
+                            user_id = split_part(a.path, '/', 2),
+                            filename = substring(a.path FROM '^(?:[^/]*/){3}(.*)$'),
+                            session_id = CASE
+                                WHEN substring(a.path FROM '^(?:[^/]*/){3}(.*)$') LIKE 'user:%' THEN NULL
+                                ELSE split_part(a.path, '/', 3)
+                            END,
+                            size = COALESCE(
+                                (SELECT b.size FROM artifact_blobs b WHERE b.sha256 = a.blob_sha256),
+                                octet_length(a.data)
+                            )
+                        WHERE a.filename IS NULL
+                        """
+                    )
+                    # Paths saved before the counter existed continue after their highest version
+                    await conn.execute(
+                        """
+                        INSERT INTO artifact_versions (path, next_version)
+                        SELECT path, MAX(version) + 1
+                        FROM artifacts_table
+                        GROUP BY path
+                        ON CONFLICT (path) DO NOTHING
+                        """
+                    )
+                dictionaries = await conn.fetch(
+                    "SELECT dictionary_id, data FROM artifact_codec_dictionaries ORDER BY created_at"
+                )
+            # The newest dictionary compresses new payloads; older ones are kept to decode old rows
+            for record in dictionaries:
+                self.codec.add_dictionary(record['dictionary_id'], record['data'])
+            self._schema_ready = True
+
     def _file_has_user_namespace(self, filename: str) -> bool:
         """Checks if the filename has a user namespace.
 
@@ -85,36 +215,141 @@ class PostgresArtifactService(BaseArtifactService):
             The version number assigned to the saved artifact.
         """
         path = self._artifact_path(app_name, user_id, session_id, filename)
+        data = artifact.inline_data.data
         
         pool = await self._get_pool()
         async with pool.acquire() as conn:
             async with conn.transaction():
-                # Get the next version number (count of existing versions)
+                # Take the next version from the path's counter row. The upsert locks that row until
+                # commit, so concurrent saves to one path get consecutive versions without retries,
+                # and the cost does not grow with the number of versions.
                 version = await conn.fetchval(
                     """
-                    SELECT COUNT(*) 
-                    FROM artifacts_table
-                    WHERE path = $1
+                    INSERT INTO artifact_versions (path, next_version)
+                    VALUES ($1, 1)
+                    ON CONFLICT (path)
+                    DO UPDATE SET next_version = artifact_versions.next_version + 1
+                    RETURNING next_version - 1
                     """,
                     path
                 )
                 
-                # Insert the new artifact data
+                # Point the new version at its blob, storing the payload only if it is new
+                digest = await self._store_blob(conn, data, artifact.inline_data.mime_type)
                 await conn.execute(
                     """
-                    INSERT INTO artifacts_table (path, version, mime_type, data)
-                    VALUES ($1, $2, $3, $4)
+                    INSERT INTO artifacts_table
+                        (path, version, mime_type, blob_sha256, app_name, user_id, session_id, filename, size)
+                    VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9)
                     """,
                     path,
                     version,
                     artifact.inline_data.mime_type,
-                    artifact.inline_data.data
+                    digest,
+                    app_name,
+                    user_id,
+                    None if self._file_has_user_namespace(filename) else session_id,
+                    filename,
+                    len(data)
                 )
-                
+        
+        if self.cache is not None:
+            self.cache.invalidate_latest(path)
         return version
 
-    @override
-    async def load_artifact(
+    async def _store_blob(self, conn: asyncpg.Connection, data: bytes, mime_type: str) -> bytes:
+        """Adds a reference to the blob holding data, inserting it if it does not exist yet.
+
+        Args:
+            conn: Connection inside the save transaction.
+            data: The artifact payload.
+            mime_type: Mime type of the payload, used to decide whether to compress it.
+
+        Returns:
+            The SHA-256 digest the blob is stored under.
+        """
+        digest = hashlib.sha256(data).digest()
+        # Try the reference bump first so a duplicate payload is never sent to the server
+        reused = await conn.fetchval(
+            """
+            UPDATE artifact_blobs
+            SET ref_count = ref_count + 1
+            WHERE sha256 = $1
+            RETURNING size
+            """,
+            digest
+        )
+        inserted = False
+        if reused is None:
+            codec, payload = await self._encode(data, mime_type)
+            # A concurrent save of the same payload may have inserted it meanwhile (xmax = 0 only for inserts)
+            inserted = await conn.fetchval(
+                """
+                INSERT INTO artifact_blobs (sha256, data, size, ref_count, codec)
+                VALUES ($1, $2, $3, 1, $4)
+                ON CONFLICT (sha256)
+                DO UPDATE SET ref_count = artifact_blobs.ref_count + 1
+                RETURNING xmax = 0
+                """,
+                digest,
+                payload,
+                len(data),
+                codec
+            )
+        if inserted:
+            self._blob_writes += 1
+            self._bytes_in += len(data)
+            self._bytes_stored += len(payload)
+        else:
+            self._dedup_hits += 1
+            self._bytes_deduplicated += len(data)
+        return digest
+
+    async def _encode(self, data: bytes, mime_type: str) -> tuple[str, bytes]:
+        """Compresses a payload with the codec (off the event loop for large payloads)."""
+        if not self.compress:
+            return IDENTITY, data
+        if len(data) >= self._OFFLOAD_BYTES:
+            return await asyncio.to_thread(self.codec.encode, data, mime_type)
+        return self.codec.encode(data, mime_type)
+
+    async def decode_payload(self, codec: str, data: bytes) -> bytes:
+        """Restores the original bytes of a stored payload.
+
+        Args:
+            codec: Codec the payload was stored with.
+            data: The stored bytes.
+
+        Returns:
+            The original artifact bytes.
+        """
+        if codec == IDENTITY:
+            return data
+        missing = self.codec.missing_dictionary(codec)
+        if missing is not None:
+            # Another process trained it after this one loaded its dictionaries
+            await self._load_dictionary(missing)
+        if len(data) >= self._OFFLOAD_BYTES // 8:
+            return await asyncio.to_thread(self.codec.decode, codec, data)
+        return self.codec.decode(codec, data)
+
+    async def _load_dictionary(self, dictionary_id: str) -> None:
+        """Registers a stored zstd dictionary with the codec (for decoding only).
+
+        Args:
+            dictionary_id: Id of the dictionary to load.
+        """
+        pool = await self._get_pool()
+        async with pool.acquire() as conn:
+            data = await conn.fetchval(
+                "SELECT data FROM artifact_codec_dictionaries WHERE dictionary_id = $1",
+                dictionary_id
+            )
+        # Left to decode() to report when it does not exist
+        if data is not None:
+            self.codec.add_dictionary(dictionary_id, data, active=False)
+
+    async def load_stored_artifact(
         self,
         *,
         app_name: str,
@@ -122,31 +357,42 @@ class PostgresArtifactService(BaseArtifactService):
         session_id: str,
         filename: str,
         version: Optional[int] = None,
-    ) -> Optional[types.Part]:
-        """Loads an artifact. Returns None if not found.
-        
+    ) -> Optional[tuple[bytes, str, str]]:
+        """Loads an artifact's payload as stored, without decompressing it.
+
         Args:
             app_name: The name of the application.
             user_id: The ID of the user.
             session_id: The ID of the session.
             filename: The name of the artifact file.
             version: The version to load. If None, loads the latest version.
-            
+
         Returns:
-            The artifact as a Part object, or None if not found.
+            (stored bytes, mime type, codec), or None if not found.
         """
         path = self._artifact_path(app_name, user_id, session_id, filename)
         
+        generation = None
+        if self.cache is not None:
+            if version is None:
+                cached = await self._cache_call(self.cache.get_latest, path)
+            else:
+                cached = await self._cache_call(self.cache.get, path, version)
+            if cached is not None:
+                return cached.data, cached.mime_type, cached.codec
+            generation = self.cache.generation()
+        
         pool = await self._get_pool()
         async with pool.acquire() as conn:
             if version is None:
                 # Load latest version (highest version number)
                 record = await conn.fetchrow(
                     """
-                    SELECT data, mime_type 
-                    FROM artifacts_table 
-                    WHERE path = $1
-                    ORDER BY version DESC
+                    SELECT a.version, COALESCE(b.data, a.data) AS data, a.mime_type, COALESCE(b.codec, 'identity') AS codec
+                    FROM artifacts_table a
+                    LEFT JOIN artifact_blobs b ON b.sha256 = a.blob_sha256
+                    WHERE a.path = $1
+                    ORDER BY a.version DESC
                     LIMIT 1
                     """,
                     path
@@ -155,20 +401,159 @@ class PostgresArtifactService(BaseArtifactService):
                 # Load specific version
                 record = await conn.fetchrow(
                     """
-                    SELECT data, mime_type 
-                    FROM artifacts_table 
-                    WHERE path = $1 AND version = $2
+                    SELECT a.version, COALESCE(b.data, a.data) AS data, a.mime_type, COALESCE(b.codec, 'identity') AS codec
+                    FROM artifacts_table a
+                    LEFT JOIN artifact_blobs b ON b.sha256 = a.blob_sha256
+                    WHERE a.path = $1 AND a.version = $2
                     """,
                     path, version
                 )
 
         if record:
-            return types.Part.from_bytes(
-                data=record['data'], 
-                mime_type=record['mime_type']
-            )
+            if self.cache is not None:
+                await self._cache_call(
+                    self.cache.put,
+                    path,
+                    record['version'],
+                    CachedArtifact(data=record['data'], mime_type=record['mime_type'], codec=record['codec']),
+                    generation,
+                    version is None,
+                )
+            return record['data'], record['mime_type'], record['codec']
         return None
 
+    async def _cache_call(self, method, *args):
+        """Calls a cache method, on a worker thread when it may touch the disk tier."""
+        if self.cache.disk_path is not None:
+            return await asyncio.to_thread(method, *args)
+        return method(*args)
+
+    async def stat_artifact(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        session_id: str,
+        filename: str,
+        version: Optional[int] = None,
+    ) -> Optional[dict]:
+        """Returns an artifact version's metadata without reading its payload.
+
+        Args:
+            app_name: The name of the application.
+            user_id: The ID of the user.
+            session_id: The ID of the session.
+            filename: The name of the artifact file.
+            version: The version to describe. If None, the latest version.
+
+        Returns:
+            Dict with id, version, mime_type, codec, size (original bytes), stored_size,
+            sha256 (hex, None for rows saved before blobs) and created_at; None if not found.
+        """
+        path = self._artifact_path(app_name, user_id, session_id, filename)
+        
+        pool = await self._get_pool()
+        async with pool.acquire() as conn:
+            record = await conn.fetchrow(
+                """
+                SELECT a.id, a.version, a.mime_type, a.created_at, a.blob_sha256,
+                       COALESCE(b.codec, 'identity') AS codec,
+                       COALESCE(b.size, octet_length(a.data)) AS size,
+                       COALESCE(octet_length(b.data), octet_length(a.data)) AS stored_size
+                FROM artifacts_table a
+                LEFT JOIN artifact_blobs b ON b.sha256 = a.blob_sha256
+                WHERE a.path = $1 AND ($2::integer IS NULL OR a.version = $2)
+                ORDER BY a.version DESC
+                LIMIT 1
+                """,
+                path, version
+            )
+
+        if record is None:
+            return None
+        return {
+            "id": record['id'],
+            "version": record['version'],
+            "mime_type": record['mime_type'],
+            "codec": record['codec'],
+            "size": record['size'],
+            "stored_size": record['stored_size'],
+            "sha256": record['blob_sha256'].hex() if record['blob_sha256'] else None,
+            "created_at": record['created_at'],
+        }
+
+    async def iter_stored_bytes(
+        self, artifact_id: int, start: int = 0, end: Optional[int] = None, chunk_size: int = 256 * 1024
+    ) -> AsyncIterator[bytes]:
+        """Streams a byte range of a stored payload in chunks, one short query per chunk.
+
+        Args:
+            artifact_id: The id from stat_artifact.
+            start: First byte offset.
+            end: Last byte offset, inclusive (the end of the payload when None).
+            chunk_size: Bytes fetched per query.
+
+        Yields:
+            Consecutive chunks of the stored (possibly compressed) bytes.
+        """
+        pool = await self._get_pool()
+        offset = start
+        while end is None or offset <= end:
+            length = chunk_size if end is None else min(chunk_size, end - offset + 1)
+            async with pool.acquire() as conn:
+                chunk = await conn.fetchval(
+                    """
+                    SELECT substring(COALESCE(b.data, a.data) FROM $2 FOR $3)
+                    FROM artifacts_table a
+                    LEFT JOIN artifact_blobs b ON b.sha256 = a.blob_sha256
+                    WHERE a.id = $1
+                    """,
+                    artifact_id, offset + 1, length
+                )
+            if not chunk:
+                return
+            yield chunk
+            offset += len(chunk)
+            if len(chunk) < length:
+                return
+
+    @override
+    async def load_artifact(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        session_id: str,
+        filename: str,
+        version: Optional[int] = None,
+    ) -> Optional[types.Part]:
+        """Loads an artifact. Returns None if not found.
+        
+        Args:
+            app_name: The name of the application.
+            user_id: The ID of the user.
+            session_id: The ID of the session.
+            filename: The name of the artifact file.
+            version: The version to load. If None, loads the latest version.
+            
+        Returns:
+            The artifact as a Part object, or None if not found.
+        """
+        stored = await self.load_stored_artifact(
+            app_name=app_name,
+            user_id=user_id,
+            session_id=session_id,
+            filename=filename,
+            version=version,
+        )
+        if stored is None:
+            return None
+        data, mime_type, codec = stored
+        return types.Part.from_bytes(
+            data=await self.decode_payload(codec, data), 
+            mime_type=mime_type
+        )
+
     @override
     async def list_artifact_keys(
         self, *, app_name: str, user_id: str, session_id: str
@@ -185,32 +570,81 @@ class PostgresArtifactService(BaseArtifactService):
         Returns:
             A sorted list of artifact filenames.
         """
-        session_prefix = f"{app_name}/{user_id}/{session_id}/"
-        usernamespace_prefix = f"{app_name}/{user_id}/user/"
-        
         pool = await self._get_pool()
         async with pool.acquire() as conn:
             records = await conn.fetch(
                 """
-                SELECT DISTINCT path
+                SELECT DISTINCT filename
                 FROM artifacts_table
-                WHERE path LIKE $1 OR path LIKE $2
+                WHERE app_name = $1 AND user_id = $2 AND (session_id = $3 OR session_id IS NULL)
+                ORDER BY filename
                 """,
-                f"{session_prefix}%",
-                f"{usernamespace_prefix}%"
+                app_name,
+                user_id,
+                session_id
             )
         
-        filenames = []
-        for record in records:
-            path = record['path']
-            if path.startswith(session_prefix):
-                filename = path.removeprefix(session_prefix)
-                filenames.append(filename)
-            elif path.startswith(usernamespace_prefix):
-                filename = path.removeprefix(usernamespace_prefix)
-                filenames.append(filename)
+        return [record['filename'] for record in records]
+
+    async def list_artifacts(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        session_id: str,
+        after: Optional[str] = None,
+        limit: int = 50,
+    ) -> tuple[list[dict], Optional[str]]:
+        """Lists the latest version of each artifact in a session, one page at a time.
+
+        Includes both session-scoped and user-scoped artifacts, ordered by filename. Only the
+        indexed key columns are read, never the payloads.
+
+        Args:
+            app_name: The name of the application.
+            user_id: The ID of the user.
+            session_id: The ID of the session.
+            after: Cursor returned with the previous page (the last filename it listed).
+            limit: Maximum number of artifacts per page.
+
+        Returns:
+            (artifacts, next cursor). Each artifact is a dict with filename, version (the latest),
+            mime_type, size and created_at; the cursor is None on the last page.
+        """
+        pool = await self._get_pool()
+        async with pool.acquire() as conn:
+            records = await conn.fetch(
+                """
+                WITH page AS (
+                    SELECT DISTINCT filename
+                    FROM artifacts_table
+                    WHERE app_name = $1 AND user_id = $2 AND (session_id = $3 OR session_id IS NULL)
+                      AND ($4::text IS NULL OR filename > $4)
+                    ORDER BY filename
+                    LIMIT $5
+                )
+                SELECT page.filename, latest.version, latest.mime_type, latest.size, latest.created_at
+                FROM page
+                CROSS JOIN LATERAL (
+                    SELECT version, mime_type, size, created_at
+                    FROM artifacts_table
+                    WHERE app_name = $1 AND user_id = $2 AND (session_id = $3 OR session_id IS NULL)
+                      AND filename = page.filename
+                    ORDER BY version DESC
+                    LIMIT 1
+                ) latest
+                ORDER BY page.filename
+                """,
+                app_name,
+                user_id,
+                session_id,
+                after,
+                limit + 1
+            )
         
-        return sorted(filenames)
+        artifacts = [dict(record) for record in records[:limit]]
+        next_cursor = artifacts[-1]['filename'] if len(records) > limit else None
+        return artifacts, next_cursor
 
     @override
     async def delete_artifact(
@@ -228,13 +662,42 @@ class PostgresArtifactService(BaseArtifactService):
         
         pool = await self._get_pool()
         async with pool.acquire() as conn:
-            await conn.execute(
-                """
-                DELETE FROM artifacts_table
-                WHERE path = $1
-                """,
-                path
-            )
+            async with conn.transaction():
+                # Drop the versions, release their blob references and remove blobs nothing points at
+                released = await conn.fetch(
+                    """
+                    WITH deleted AS (
+                        DELETE FROM artifacts_table
+                        WHERE path = $1
+                        RETURNING blob_sha256
+                    ), refs AS (
+                        SELECT blob_sha256, COUNT(*) AS n
+                        FROM deleted
+                        WHERE blob_sha256 IS NOT NULL
+                        GROUP BY blob_sha256
+                    )
+                    UPDATE artifact_blobs b
+                    SET ref_count = b.ref_count - refs.n
+                    FROM refs
+                    WHERE b.sha256 = refs.blob_sha256
+                    RETURNING b.sha256
+                    """,
+                    path
+                )
+                if released:
+                    await conn.execute(
+                        """
+                        DELETE FROM artifact_blobs
+                        WHERE sha256 = ANY($1::bytea[]) AND ref_count <= 0
+                        """,
+                        [record['sha256'] for record in released]
+                    )
+                # The path's counter row is kept: a re-created artifact continues after the deleted
+                # versions, so (path, version) never names two different payloads and cached copies
+                # in other processes or the disk tier can never be served for the new artifact
+        
+        if self.cache is not None:
+            await self._cache_call(self.cache.invalidate, path)
 
     @override
     async def list_versions(
@@ -267,6 +730,91 @@ class PostgresArtifactService(BaseArtifactService):
         
         return [record['version'] for record in records]
 
+    def stats(self) -> dict:
+        """Returns blob deduplication and read cache counters for this process."""
+        return {
+            "blob_writes": self._blob_writes,
+            "dedup_hits": self._dedup_hits,
+            "bytes_deduplicated": self._bytes_deduplicated,
+            "bytes_in": self._bytes_in,
+            "bytes_stored": self._bytes_stored,
+            "compression_ratio": self._bytes_in / self._bytes_stored if self._bytes_stored else None,
+            "zstd": zstd_available(),
+            "dictionary_id": self.codec.dictionary_id,
+            "cache": self.cache.stats() if self.cache is not None else None,
+        }
+
+    async def train_compression_dictionary(
+        self, sample_limit: int = 200, min_samples: int = 16, retrain: bool = False
+    ) -> Optional[str]:
+        """Trains a zstd dictionary on stored charts (HTML and figure JSON) and uses it for new ones.
+
+        Training runs under an advisory lock, so when several workers start together one trains
+        and the others pick up its dictionary instead of training their own.
+
+        Args:
+            sample_limit: Maximum number of stored chart payloads to sample.
+            min_samples: Minimum number of samples needed to train.
+            retrain: Train a new dictionary even if one is already stored.
+
+        Returns:
+            The active dictionary's id, or None if zstandard is not installed or there are too few samples.
+        """
+        if not zstd_available():
+            return None
+        pool = await self._get_pool()
+        if self.codec.dictionary_id is not None and not retrain:
+            return self.codec.dictionary_id
+        async with pool.acquire() as conn:
+            async with conn.transaction():
+                # Only one process trains: the others wait on the lock and then use its dictionary
+                await conn.execute("SELECT pg_advisory_xact_lock(hashtext('artifact_codec_dictionaries'))")
+                if not retrain:
+                    record = await conn.fetchrow(
+                        """
+                        SELECT dictionary_id, data FROM artifact_codec_dictionaries
+                        ORDER BY created_at DESC
+                        LIMIT 1
+                        """
+                    )
+                    if record is not None:
+                        self.codec.add_dictionary(record['dictionary_id'], record['data'])
+                        return record['dictionary_id']
+                records = await conn.fetch(
+                    """
+                    SELECT b.data, b.codec
+                    FROM artifact_blobs b
+                    WHERE b.sha256 IN (
+                        SELECT blob_sha256 FROM artifacts_table
+                        WHERE mime_type = ANY($2::text[]) AND blob_sha256 IS NOT NULL
+                        ORDER BY id DESC
+                        LIMIT $1
+                    )
+                    """,
+                    sample_limit,
+                    sorted(DICTIONARY_MIME_TYPES)
+                )
+                if len(records) < min_samples:
+                    return None
+                # Shared boilerplate sits at the start of the payloads; prefixes keep training memory bounded
+                samples = [(await self.decode_payload(record['codec'], record['data']))[:self._OFFLOAD_BYTES] for record in records]
+                trained = await asyncio.to_thread(self.codec.train_dictionary, samples)
+                if trained is None:
+                    return None
+                dictionary_id, dictionary = trained
+                await conn.execute(
+                    """
+                    INSERT INTO artifact_codec_dictionaries (dictionary_id, data)
+                    VALUES ($1, $2)
+                    ON CONFLICT (dictionary_id) DO NOTHING
+                    """,
+                    dictionary_id,
+                    dictionary
+                )
+        self.codec.add_dictionary(dictionary_id, dictionary)
+        logger.info(f"Trained artifact compression dictionary {dictionary_id} on {len(samples)} chart payloads")
+        return dictionary_id
+
     async def close(self):
         """Close the connection pool."""
         if self._pool:
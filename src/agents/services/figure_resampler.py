@@ -0,0 +1,270 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from src.core import logger
+from src.agents.repositories.result_store import QueryResultStore
+from src.agents.utils.resampling import minmax_indices, plotly_array
+
+
+class FigureResampler:
+    """
+    Large-series mode for line/scatter figures.
+
+    Traces with more than point_threshold points are switched to WebGL (Scattergl) and replaced
+    by a min-max decimated overview of max_points points. The full-resolution series are written
+    to the result store and referenced from layout.meta["resample"], so a zoomed view can fetch
+    a decimated slice of just the visible x-range from resample().
+    """
+
+    def __init__(
+        self,
+        result_store: Optional[QueryResultStore] = None,
+        point_threshold: int = 5000,
+        max_points: int = 4000,
+        cache_size: int = 8,
+    ):
+        """
+        Args:
+            result_store: Store for the full-resolution series. Without it figures are still
+                decimated, but zooming cannot recover the detail.
+            point_threshold: Traces with more points than this are decimated.
+            max_points: Points per trace in the overview and in every resampled slice.
+            cache_size: Number of full-resolution series tables kept in memory for zooming.
+        """
+        self.result_store = result_store
+        self.point_threshold = point_threshold
+        self.max_points = max_points
+        self.cache_size = cache_size
+
+        self._tables: "OrderedDict[str, pa.Table]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._figures = 0
+        self._traces = 0
+        self._points_in = 0
+        self._points_out = 0
+        self._resamples = 0
+
+    @staticmethod
+    def _wall_clock(x: np.ndarray) -> Tuple[np.ndarray, Optional[str]]:
+        """
+        Timestamps as naive datetime64[us] in their own wall-clock time, plus their timezone.
+
+        Plotly draws timezone-aware timestamps at their local time, so converting them to UTC would
+        shift the chart by the offset. Timestamps with differing offsets each keep their own.
+        """
+        try:
+            times = pd.to_datetime(x)
+        except ValueError:
+            # Mixed offsets (e.g. across a DST change) cannot share one timezone
+            times = pd.DatetimeIndex([pd.to_datetime(value).tz_localize(None) for value in x])
+        tz = None
+        if getattr(times, "tz", None) is not None:
+            tz = str(times.tz)
+            times = times.tz_localize(None)
+        return times.values.astype("datetime64[us]"), tz
+
+    @staticmethod
+    def _series(trace: Any) -> Optional[Tuple[np.ndarray, np.ndarray, str, Optional[str]]]:
+        """(x, y, x_type, x timezone) of a trace ordered by x, or None if it is not a numeric series."""
+        if trace.y is None:
+            return None
+        try:
+            y = plotly_array(trace.y).astype(np.float64)
+        except (TypeError, ValueError):
+            return None
+
+        tz = None
+        if trace.x is None:
+            x, x_type = np.arange(len(y), dtype=np.float64), "number"
+        else:
+            x = plotly_array(trace.x)
+            if np.issubdtype(x.dtype, np.number):
+                x, x_type = x.astype(np.float64), "number"
+            else:
+                try:
+                    (x, tz), x_type = FigureResampler._wall_clock(x), "date"
+                except (TypeError, ValueError):
+                    return None  # categorical x: nothing to zoom along
+        if len(x) != len(y):
+            return None
+
+        if len(x) > 1 and np.any(x[1:] < x[:-1]):
+            order = np.argsort(x, kind="stable")
+            x, y = x[order], y[order]
+        return x, y, x_type, tz
+
+    def optimize(self, fig: go.Figure) -> go.Figure:
+        """
+        Return the figure with large scatter traces switched to Scattergl and decimated.
+
+        Figures without large traces are returned unchanged.
+        """
+        large = [
+            i for i, trace in enumerate(fig.data)
+            if trace.type in ("scatter", "scattergl") and trace.y is not None and len(plotly_array(trace.y)) > self.point_threshold
+        ]
+        if not large:
+            return fig
+
+        traces = list(fig.data)
+        series_tables: List[pa.Table] = []
+        resampled: List[Dict[str, Any]] = []
+        x_type = None
+        x_tz = None
+        points_in = points_out = 0
+        for i in large:
+            series = self._series(traces[i])
+            if series is None:
+                continue
+            x, y, trace_x_type, trace_tz = series
+            keep = minmax_indices(y, self.max_points)
+            properties = traces[i].to_plotly_json()
+            properties.pop("type", None)
+            properties.update(x=x[keep], y=y[keep])
+            traces[i] = go.Scattergl(properties, skip_invalid=True)
+            points_in += len(y)
+            points_out += len(keep)
+
+            # Only traces sharing the first trace's x type go into the (single) zoom table
+            x_type = x_type or trace_x_type
+            x_tz = x_tz or trace_tz
+            if trace_x_type == x_type:
+                series_tables.append(pa.table({
+                    "trace": pa.array(np.full(len(x), i, dtype=np.int32)),
+                    "x": pa.array(x),
+                    "y": pa.array(y),
+                }))
+                resampled.append({"index": i, "points": len(y)})
+
+        if not points_in:
+            return fig
+
+        ref = None
+        if self.result_store is not None and series_tables:
+            table = pa.concat_tables(series_tables)
+            if x_tz is not None:
+                # The zoom bounds sent back to resample() are read in the same wall-clock time
+                table = table.replace_schema_metadata({"x_tz": x_tz})
+            ref = self.result_store.put(table)["ref"]
+
+        optimized = go.Figure(data=traces, layout=fig.layout)
+        meta = optimized.layout.meta if isinstance(optimized.layout.meta, dict) else {}
+        optimized.layout.meta = {
+            **meta,
+            "resample": {
+                "ref": ref,
+                "x_type": x_type,
+                "max_points": self.max_points,
+                "traces": resampled,
+            },
+        }
+        with self._lock:
+            self._figures += 1
+            self._traces += len(resampled)
+            self._points_in += points_in
+            self._points_out += points_out
+        logger.info(f"FigureResampler: decimated {points_in} points to {points_out} across {len(large)} traces")
+        return optimized
+
+    def _table(self, ref: str) -> Optional[pa.Table]:
+        with self._lock:
+            table = self._tables.get(ref)
+            if table is not None:
+                self._tables.move_to_end(ref)
+                return table
+        table = self.result_store.load_table(ref)
+        if table is None:
+            return None
+        with self._lock:
+            self._tables[ref] = table
+            while len(self._tables) > self.cache_size:
+                self._tables.popitem(last=False)
+        return table
+
+    def resample(
+        self,
+        ref: str,
+        x0: Optional[str] = None,
+        x1: Optional[str] = None,
+        max_points: Optional[int] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Decimated slice of the full-resolution series of a figure for the x-range [x0, x1].
+
+        Args:
+            ref: layout.meta["resample"]["ref"] of the figure.
+            x0: Start of the visible range (ISO timestamp or number; open when None).
+            x1: End of the visible range (open when None).
+            max_points: Points per trace (defaults to max_points).
+
+        Returns:
+            {"traces": [{"index", "x", "y"}], "points": ...}, or None if the series are gone.
+
+        Raises:
+            ValueError: If the range bounds cannot be parsed for the series' x type.
+        """
+        if self.result_store is None:
+            return None
+        table = self._table(ref)
+        if table is None:
+            return None
+
+        max_points = max_points or self.max_points
+        is_date = pa.types.is_timestamp(table.schema.field("x").type)
+        x_tz = (table.schema.metadata or {}).get(b"x_tz")
+
+        def bound(value: str):
+            if is_date:
+                timestamp = pd.Timestamp(value)
+                if timestamp.tzinfo is not None and x_tz is not None:
+                    timestamp = timestamp.tz_convert(x_tz.decode("utf-8"))
+                return pa.scalar(timestamp.tz_localize(None).to_pydatetime()).cast(table.schema.field("x").type)
+            return float(value)
+
+        mask = None
+        if x0 is not None:
+            mask = pc.greater_equal(table["x"], bound(x0))
+        if x1 is not None:
+            upper = pc.less_equal(table["x"], bound(x1))
+            mask = upper if mask is None else pc.and_(mask, upper)
+        if mask is not None:
+            table = table.filter(mask)
+
+        traces = []
+        points = 0
+        trace_ids = table["trace"].to_numpy()
+        x_all = table["x"].to_numpy()
+        y_all = table["y"].to_numpy()
+        for index in np.unique(trace_ids):
+            selected = trace_ids == index
+            x, y = x_all[selected], y_all[selected]
+            keep = minmax_indices(y, max_points)
+            x, y = x[keep], y[keep]
+            points += len(keep)
+            traces.append({
+                "index": int(index),
+                "x": np.datetime_as_string(x, unit="ms").tolist() if is_date else x.tolist(),
+                "y": [None if np.isnan(value) else value for value in y.tolist()],
+            })
+        with self._lock:
+            self._resamples += 1
+        return {"traces": traces, "points": points}
+
+    def stats(self) -> Dict[str, Any]:
+        """Return how many figures/traces were decimated and the point reduction."""
+        with self._lock:
+            return {
+                "figures": self._figures,
+                "traces": self._traces,
+                "points_in": self._points_in,
+                "points_out": self._points_out,
+                "resamples": self._resamples,
+                "cached_tables": len(self._tables),
+            }
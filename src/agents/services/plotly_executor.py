@@ -0,0 +1,91 @@
+import asyncio
+import threading
+from functools import partial
+from typing import Any, Dict, Optional
+
+import plotly.io as pio
+from pandas import DataFrame
+from plotly.graph_objs import Figure
+
+from src.agents.services.worker_pool import ProcessWorkerPool
+from src.agents.utils.worker_jobs import code_hash, init_plotly_worker, run_plotly_code
+
+
+class PlotlyCodeExecutor:
+    """
+    Runs LLM-generated Plotly code in sandboxed worker processes instead of exec'ing it in the
+    API process.
+
+    Workers are long-lived, keep compiled code objects cached by code hash, run with an
+    address-space limit and a per-job CPU-time limit, and hand the figure back as JSON. A snippet
+    that loops, allocates without bound or crashes only costs a recycled worker.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = 2,
+        max_queue: int = 16,
+        job_timeout: float = 30.0,
+        memory_limit_mb: Optional[int] = 2048,
+        cpu_seconds: Optional[float] = 20.0,
+    ):
+        """
+        Args:
+            max_workers: Number of worker processes.
+            max_queue: Jobs allowed to wait for a free worker before submissions are rejected.
+            job_timeout: Wall-clock limit per job in seconds.
+            memory_limit_mb: Address-space limit of each worker (None for no limit).
+            cpu_seconds: CPU-time limit per job (None for no limit).
+        """
+        self.cpu_seconds = cpu_seconds
+        self.pool = ProcessWorkerPool(
+            max_workers=max_workers,
+            max_queue=max_queue,
+            job_timeout=job_timeout,
+            initializer=init_plotly_worker,
+            initargs=(memory_limit_mb * 1024 * 1024 if memory_limit_mb else None,),
+            name="plotly_sandbox",
+        )
+        self._lock = threading.Lock()
+        self._compile_cache_hits = 0
+        self._fallback_charts = 0
+
+    async def start(self) -> None:
+        """Start the worker processes ahead of the first chart."""
+        await self.pool.start()
+
+    async def execute(self, plotly_code: str, df: DataFrame, dark_mode: bool = True) -> Optional[Figure]:
+        """
+        Build a figure from generated code in a worker process.
+
+        Falls back to a chart chosen from the column types when the code raises, like
+        VannaBase.get_plotly_figure.
+
+        Returns:
+            The figure, or None when the code ran but did not assign `fig`.
+
+        Raises:
+            WorkerPoolBusyError: If the sandbox queue is full.
+            WorkerPoolTimeoutError: If the code ran past its time limit or killed its worker.
+        """
+        figure_json, cached, used_fallback = await self.pool.submit(
+            run_plotly_code, code_hash(plotly_code), plotly_code, df, dark_mode, self.cpu_seconds
+        )
+        with self._lock:
+            self._compile_cache_hits += int(cached)
+            self._fallback_charts += int(used_fallback)
+        if figure_json is None:
+            return None
+        return await asyncio.to_thread(partial(pio.from_json, figure_json, output_type="Figure", skip_invalid=True))
+
+    def stats(self) -> Dict[str, Any]:
+        """Return pool metrics plus compiled-code cache hits and fallback charts."""
+        stats = self.pool.stats()
+        with self._lock:
+            stats["compile_cache_hits"] = self._compile_cache_hits
+            stats["fallback_charts"] = self._fallback_charts
+        return stats
+
+    async def close(self) -> None:
+        """Stop the worker processes."""
+        await self.pool.close()
@@ -0,0 +1,252 @@
+import json
+import re
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+from src.core import logger
+from src.core.interface import VannaRepositoryProtocol
+from src.agents.dto.internal.database import PlanEstimateDTO
+
+_SCAN_NODE_TYPES = {"Seq Scan", "Index Scan", "Index Only Scan", "Bitmap Heap Scan", "Parallel Seq Scan"}
+# Words that can follow a table reference and must not be mistaken for its alias
+_CLAUSE_KEYWORDS = {
+    "where", "group", "order", "limit", "offset", "having", "window", "union", "intersect", "except",
+    "join", "inner", "left", "right", "full", "cross", "natural", "on", "using", "lateral", "fetch", "for",
+}
+
+# A WHERE/ON/HAVING condition, up to the clause that ends it
+_CONDITION_CLAUSE = re.compile(
+    r"\b(?:WHERE|ON|HAVING)\b(.*?)(?=\bGROUP\s+BY\b|\bORDER\s+BY\b|\bLIMIT\b|\bOFFSET\b|\bWINDOW\b"
+    r"|\bUNION\b|\bINTERSECT\b|\bEXCEPT\b|\bWHERE\b|\bHAVING\b|\bJOIN\b|\bFETCH\b|$)",
+    re.IGNORECASE | re.DOTALL,
+)
+
+
+def parse_plan(explain_output: Any) -> PlanEstimateDTO:
+    """
+    Summarize the output of EXPLAIN (FORMAT JSON).
+
+    Args:
+        explain_output: The JSON plan, either already decoded (psycopg2 decodes json columns) or as text.
+
+    Returns:
+        A PlanEstimateDTO for the root plan node.
+    """
+    if isinstance(explain_output, (str, bytes)):
+        explain_output = json.loads(explain_output)
+    if isinstance(explain_output, list):
+        explain_output = explain_output[0]
+    root = explain_output["Plan"]
+
+    seq_scans: List[str] = []
+    max_scan_rows = 0
+    # Scans below a Limit stop early; scale their row estimates by the fraction of work the Limit keeps
+    stack = [(root, 1.0)]
+    while stack:
+        node, fraction = stack.pop()
+        node_type = node.get("Node Type")
+        if node_type in _SCAN_NODE_TYPES:
+            max_scan_rows = max(max_scan_rows, int(node.get("Plan Rows", 0) * fraction))
+            if "Seq Scan" in node_type and node.get("Relation Name"):
+                seq_scans.append(node["Relation Name"])
+        children = node.get("Plans", [])
+        if node_type == "Limit" and children and children[0].get("Total Cost"):
+            fraction *= min(1.0, float(node.get("Total Cost", 0.0)) / float(children[0]["Total Cost"]))
+        stack.extend((child, fraction) for child in children)
+
+    return PlanEstimateDTO(
+        total_cost=float(root.get("Total Cost", 0.0)),
+        plan_rows=int(root.get("Plan Rows", 0)),
+        max_scan_rows=max_scan_rows,
+        node_type=root.get("Node Type"),
+        seq_scans=sorted(set(seq_scans)),
+    )
+
+
+def has_time_filter(sql: str, time_column: str) -> bool:
+    """
+    Whether a WHERE, JOIN or HAVING condition compares the time column.
+
+    Only comparison and BETWEEN predicates inside the condition itself count (the column may be
+    wrapped in DATE_TRUNC, DATE() or a cast); mentions in GROUP BY, ORDER BY or the select list do
+    not, so an unbounded aggregate such as `... GROUP BY DATE(datetimegenerated)` is still narrowed.
+    """
+    column = rf"(?:\b\w+\.)?\"?\b{re.escape(time_column)}\b\"?"
+    # Column (possibly inside a function call or cast) followed by an operator, or an operator followed by it
+    compared = re.compile(
+        rf"{column}(?:\s*::\s*\w+|\s*\))*\s*(?:<>|!=|[<>]=?|=|(?:NOT\s+)?BETWEEN\b)"
+        rf"|(?:<>|!=|[<>]=?|=)\s*(?:\w+\s*\(\s*(?:\w+\s+FROM\s+|'[^']*'\s*,\s*)?)*{column}",
+        re.IGNORECASE,
+    )
+    for match in _CONDITION_CLAUSE.finditer(sql):
+        if compared.search(match.group(1)):
+            return True
+    return False
+
+
+def bound_time_window(sql: str, table: str, time_column: str, window: str) -> str:
+    """
+    Replace every reference to `table` with a time-windowed subquery under the same name.
+
+    `FROM public.power p` becomes `FROM (SELECT * FROM public.power WHERE datetimegenerated >= NOW() -
+    INTERVAL '30 days') AS p`, so the rest of the query is unchanged. Unaliased references keep the
+    bare table name as alias so qualified column references (power.value) still resolve.
+    """
+    reference = re.compile(
+        rf"\b(FROM|JOIN)\s+((?:\"?(\w+)\"?\.)?\"?{re.escape(table)}\"?)(?![\w.])(?:\s+(?:AS\s+)?(\w+))?",
+        re.IGNORECASE,
+    )
+
+    def replace(match: re.Match) -> str:
+        alias = match.group(4)
+        trailing = ""
+        if alias is None or alias.lower() in _CLAUSE_KEYWORDS:
+            trailing = f" {alias}" if alias else ""
+            alias = table
+        subquery = (
+            f"(SELECT * FROM {match.group(2)} "
+            f"WHERE {time_column} >= NOW() - INTERVAL '{window}')"
+        )
+        return f"{match.group(1)} {subquery} AS {alias}{trailing}"
+
+    return reference.sub(replace, sql)
+
+
+def limit_rows(sql: str, limit: int) -> str:
+    """Wrap a query so it returns at most `limit` rows."""
+    return f"SELECT * FROM (\n{sql.strip().rstrip(';')}\n) AS bounded_result LIMIT {limit}"
+
+
+@dataclass
+class GuardDecision:
+    """Outcome of checking one query against the cost thresholds."""
+    allowed: bool
+    sql: str
+    estimate: Optional[PlanEstimateDTO] = None
+    bounded: bool = False
+    reasons: List[str] = field(default_factory=list)
+
+
+class QueryCostGuard:
+    """
+    EXPLAIN-based guard run before LLM-generated SQL is executed.
+
+    Queries whose estimated cost or scanned rows exceed the thresholds are first bounded: time-series
+    tables queried without a filter on their time column are restricted to a default window, and
+    queries returning too many rows get a LIMIT. Queries that are still too expensive are rejected.
+    """
+
+    def __init__(
+        self,
+        repository: VannaRepositoryProtocol,
+        max_cost: float = 5_000_000,
+        max_scan_rows: int = 5_000_000,
+        max_result_rows: int = 50_000,
+        default_window: str = "30 days",
+        time_columns: Optional[Mapping[str, str]] = None,
+    ):
+        """
+        Args:
+            repository: Repository providing explain_sql.
+            max_cost: Maximum estimated planner cost.
+            max_scan_rows: Maximum estimated rows produced by a single table scan.
+            max_result_rows: Row limit injected when a bounded query would still return more rows.
+            default_window: PostgreSQL interval applied to unfiltered time-series tables.
+            time_columns: Time-series tables mapped to their timestamp column.
+        """
+        self.repository = repository
+        self.max_cost = max_cost
+        self.max_scan_rows = max_scan_rows
+        self.max_result_rows = max_result_rows
+        self.default_window = default_window
+        self.time_columns = dict(time_columns or {"power": "datetimegenerated", "historian": "startdatetime"})
+
+        self._lock = threading.Lock()
+        self._checked = 0
+        self._bounded = 0
+        self._rejected = 0
+
+    def _violations(self, estimate: PlanEstimateDTO) -> List[str]:
+        reasons = []
+        if estimate.total_cost > self.max_cost:
+            reasons.append(f"estimated cost {estimate.total_cost:,.0f} exceeds {self.max_cost:,.0f}")
+        if estimate.max_scan_rows > self.max_scan_rows:
+            reasons.append(f"estimated scan of {estimate.max_scan_rows:,} rows exceeds {self.max_scan_rows:,}")
+        return reasons
+
+    def _explain(self, sql: str) -> PlanEstimateDTO:
+        return parse_plan(self.repository.explain_sql(sql))
+
+    def _explain_rewrite(
+        self, rewritten_sql: str, sql: str, estimate: PlanEstimateDTO
+    ) -> Tuple[str, PlanEstimateDTO]:
+        """
+        Estimate a rewritten query. When the rewrite cannot be explained, keep the SQL and estimate
+        it replaced, so the query is judged (and, if still too expensive, rejected) as it was.
+        """
+        try:
+            return rewritten_sql, self._explain(rewritten_sql)
+        except Exception as e:
+            logger.warning(f"QueryCostGuard could not EXPLAIN rewritten query, keeping the previous one: {e}")
+            return sql, estimate
+
+    def check(self, sql: str) -> GuardDecision:
+        """
+        Check a query and, if needed, bound it.
+
+        Args:
+            sql: The SQL to execute.
+
+        Returns:
+            A GuardDecision with the SQL to run (possibly rewritten) and the plan estimate.
+        """
+        with self._lock:
+            self._checked += 1
+        try:
+            estimate = self._explain(sql)
+        except Exception as e:
+            # A query that cannot be explained will fail on execution with a clearer error
+            logger.warning(f"QueryCostGuard could not EXPLAIN query, executing unchecked: {e}")
+            return GuardDecision(allowed=True, sql=sql)
+
+        reasons = self._violations(estimate)
+        if not reasons:
+            return GuardDecision(allowed=True, sql=sql, estimate=estimate)
+
+        bounded_sql = sql
+        for table, column in self.time_columns.items():
+            if re.search(rf"\b{re.escape(table)}\b", bounded_sql, re.IGNORECASE) and not has_time_filter(bounded_sql, column):
+                bounded_sql = bound_time_window(bounded_sql, table, column, self.default_window)
+        if bounded_sql != sql:
+            bounded_sql, estimate = self._explain_rewrite(bounded_sql, sql, estimate)
+
+        if self._violations(estimate) and estimate.plan_rows > self.max_result_rows:
+            bounded_sql, estimate = self._explain_rewrite(
+                limit_rows(bounded_sql, self.max_result_rows), bounded_sql, estimate
+            )
+
+        remaining = self._violations(estimate)
+        if remaining:
+            with self._lock:
+                self._rejected += 1
+            logger.warning(f"QueryCostGuard rejected query: {'; '.join(remaining)}")
+            return GuardDecision(allowed=False, sql=bounded_sql, estimate=estimate, reasons=remaining)
+
+        bounded = bounded_sql != sql
+        if bounded:
+            with self._lock:
+                self._bounded += 1
+            logger.info(f"QueryCostGuard bounded query ({'; '.join(reasons)})")
+        return GuardDecision(allowed=True, sql=bounded_sql, estimate=estimate, bounded=bounded, reasons=reasons)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return how many queries were checked, bounded and rejected."""
+        with self._lock:
+            return {
+                "checked": self._checked,
+                "bounded": self._bounded,
+                "rejected": self._rejected,
+                "max_cost": self.max_cost,
+                "max_scan_rows": self.max_scan_rows,
+            }
@@ -1,4 +1,5 @@
 from datetime import datetime
+from typing import Iterator, Optional
 import functools
 
 from src.agents.dto.internal.database import DatabaseQueryRequestDTO, QueryResultDTO
@@ -44,16 +45,64 @@ class HistorianDatabaseService:
     @_local_error_handler
     def execute_query(self, request: DatabaseQueryRequestDTO) -> QueryResultDTO:
         # Add service-level validation if needed
+
+        if request.columnar:
+            data = self.repository.execute_query_columnar(
+                query = request.query,
+                parameters = request.parameters,
+                max_rows = request.max_rows
+            )
+            return QueryResultDTO(
+                columnar=data['table'],
+                row_count=data['row_count'],
+                execution_time_ms=data.get('execution_time_ms'),
+                truncated=data.get('truncated', False),
+                truncation_reason=data.get('truncation_reason')
+            )
         
         data = self.repository.execute_query(
             query = request.query, 
-            parameters = request.parameters
+            parameters = request.parameters,
+            max_rows = request.max_rows
         )
 
         queryResultDTO = QueryResultDTO(
-            rows= data['rows'], 
-            row_count=data['row_count']
+            rows= [{"data": row} for row in data['rows']], 
+            row_count=data['row_count'],
+            execution_time_ms=data.get('execution_time_ms'),
+            truncated=data.get('truncated', False),
+            truncation_reason=data.get('truncation_reason')
             )
         
         return queryResultDTO
 
+    def stream_query(self, request: DatabaseQueryRequestDTO, batch_size: Optional[int] = None) -> Iterator[QueryResultDTO]:
+        """
+        Stream query results as a sequence of QueryResultDTO chunks, stopping at request.max_rows.
+        """
+        remaining = request.max_rows
+        batches = self.repository.stream_query(
+            query = request.query,
+            parameters = request.parameters,
+            batch_size = batch_size
+        )
+        try:
+            for batch in batches:
+                truncated = remaining is not None and len(batch) > remaining
+                if remaining is not None:
+                    batch = batch[:remaining]
+                    remaining -= len(batch)
+                    if remaining == 0 and not truncated:
+                        # The limit landed on a batch boundary; only the next batch shows whether rows remain
+                        truncated = bool(next(batches, None))
+                yield QueryResultDTO(
+                    rows=[{"data": row} for row in batch],
+                    row_count=len(batch),
+                    truncated=truncated,
+                    truncation_reason=f"row limit of {request.max_rows} reached" if truncated else None
+                )
+                if remaining == 0:
+                    break
+        finally:
+            batches.close()
+
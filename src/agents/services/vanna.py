@@ -9,15 +9,35 @@ from src.agents.dto.internal.database import (
     GenerateSQLResultDTO,
     RunSQLResultDTO,
     GeneratePlotlyCodeResultDTO,
-    GetPlotlyFigureResultDTO
+    GetPlotlyFigureResultDTO,
+    PlanEstimateDTO
 
     )
 from src.agents.dto.response import ResponseDTO, ErrorDTO, ErrorType, ResponseStatus
+from src.agents.services.query_guard import QueryCostGuard, GuardDecision
+from src.agents.repositories.result_cache import SQLResultCache
+from src.agents.services.plotly_executor import PlotlyCodeExecutor
+from src.agents.services.chart_synthesizer import ChartSynthesizer
+from src.core.errors import WorkerPoolBusyError, WorkerPoolTimeoutError
+from typing import Any, Optional, Tuple
+import asyncio
+import time
 
 # Updated Service Implementation
 class VannaService:
-    def __init__(self, repository: VannaRepositoryProtocol):
+    def __init__(
+        self,
+        repository: VannaRepositoryProtocol,
+        query_guard: Optional[QueryCostGuard] = None,
+        result_cache: Optional[SQLResultCache] = None,
+        plotly_executor: Optional[PlotlyCodeExecutor] = None,
+        chart_synthesizer: Optional[ChartSynthesizer] = None,
+    ):
         self.repository = repository
+        self.query_guard = query_guard
+        self.result_cache = result_cache
+        self.plotly_executor = plotly_executor
+        self.chart_synthesizer = chart_synthesizer
     
     def generate_sql(self, request: QueryRequestDTO) -> ResponseDTO[GenerateSQLResultDTO]:
         # Add service-level validation if needed
@@ -35,7 +55,8 @@ class VannaService:
         return ResponseDTO(status=ResponseStatus.SUCCESS,data=GenerateSQLResultDTO(result=sql_code))
 
 
-    def run_sql(self, request: RunSQLRequestDTO) -> ResponseDTO[RunSQLResultDTO]:
+    def _prepare_sql(self, request: RunSQLRequestDTO) -> Tuple[Optional[GuardDecision], Optional[ResponseDTO[RunSQLResultDTO]]]:
+        """Validate the request and run the cost guard. Returns (decision, error_response)."""
         # Add service-level validation if needed
         if not request.sql.strip():
             error = ErrorDTO(
@@ -43,11 +64,110 @@ class VannaService:
                 message="SQL query cannot be empty",
                 timestamp=datetime.utcnow().isoformat()
             )
-            return ResponseDTO.error(error)
-        
+            return None, ResponseDTO(status=ResponseStatus.ERROR, error=error)
+
+        if self.query_guard is None:
+            return GuardDecision(allowed=True, sql=request.sql), None
+
+        decision = self.query_guard.check(request.sql)
+        if not decision.allowed:
+            plan_estimate = decision.estimate
+            error = ErrorDTO(
+                type=ErrorType.QUERY_TOO_EXPENSIVE,
+                message="Query is too expensive to run: " + "; ".join(decision.reasons)
+                    + ". Narrow the time range, filter by site or tag, or aggregate the data and try again.",
+                details={
+                    "plan_estimate": plan_estimate.model_dump() if plan_estimate else None,
+                    "attempted_sql": decision.sql,
+                    "max_cost": self.query_guard.max_cost,
+                    "max_scan_rows": self.query_guard.max_scan_rows,
+                },
+                timestamp=datetime.utcnow().isoformat()
+            )
+            return decision, ResponseDTO(status=ResponseStatus.ERROR, error=error)
+        return decision, None
+
+    def _cached_result(self, request: RunSQLRequestDTO) -> Optional[ResponseDTO[RunSQLResultDTO]]:
+        """Serve a query from the result cache, skipping the cost guard and the database."""
+        if self.result_cache is None:
+            return None
+        if not request.use_cache:
+            self.result_cache.record_bypass()
+            return None
+        hit = self.result_cache.get(request.sql, columnar=request.columnar)
+        if hit is None:
+            return None
+        plan_estimate = hit.metadata.get("plan_estimate")
+        return ResponseDTO(
+            status=ResponseStatus.SUCCESS,
+            data=RunSQLResultDTO(
+                result=hit.result,
+                plan_estimate=PlanEstimateDTO(**plan_estimate) if plan_estimate else None,
+                bounded_sql=hit.metadata.get("bounded_sql"),
+                cached=True,
+            )
+        )
+
+    def _store_result(self, request: RunSQLRequestDTO, decision: GuardDecision, sql_result: Any, ran_at: float) -> None:
+        if self.result_cache is None or not request.use_cache:
+            return
+        self.result_cache.put(
+            request.sql,
+            sql_result,
+            metadata={
+                "plan_estimate": decision.estimate.model_dump() if decision.estimate else None,
+                "bounded_sql": decision.sql if decision.bounded else None,
+            },
+            ran_at=ran_at,
+        )
+
+    @staticmethod
+    def _run_sql_result(decision: GuardDecision, sql_result: Any) -> ResponseDTO[RunSQLResultDTO]:
+        return ResponseDTO(
+            status=ResponseStatus.SUCCESS,
+            data=RunSQLResultDTO(
+                result=sql_result,
+                plan_estimate=decision.estimate,
+                bounded_sql=decision.sql if decision.bounded else None,
+            )
+        )
+
+    def run_sql(self, request: RunSQLRequestDTO) -> ResponseDTO[RunSQLResultDTO]:
+        cached_response = self._cached_result(request)
+        if cached_response is not None:
+            return cached_response
+
+        decision, error_response = self._prepare_sql(request)
+        if error_response is not None:
+            return error_response
+
         # Forward to repository
-        sql_result = self.repository.run_sql(sql=request.sql) 
-        return ResponseDTO(status=ResponseStatus.SUCCESS,data=RunSQLResultDTO(result=sql_result))
+        ran_at = time.time()
+        if request.columnar:
+            sql_result = self.repository.run_sql_arrow(sql=decision.sql)
+        else:
+            sql_result = self.repository.run_sql(sql=decision.sql)
+        self._store_result(request, decision, sql_result, ran_at)
+        return self._run_sql_result(decision, sql_result)
+
+    async def run_sql_async(self, request: RunSQLRequestDTO) -> ResponseDTO[RunSQLResultDTO]:
+        # Watermark reads and IPC decoding are blocking, so the cache lookup runs on a worker thread
+        cached_response = await asyncio.to_thread(self._cached_result, request)
+        if cached_response is not None:
+            return cached_response
+
+        # EXPLAIN is cheap, so the guard runs on a worker thread; the query itself uses the async pool
+        decision, error_response = await asyncio.to_thread(self._prepare_sql, request)
+        if error_response is not None:
+            return error_response
+
+        ran_at = time.time()
+        if request.columnar:
+            sql_result = await self.repository.run_sql_arrow_async(sql=decision.sql)
+        else:
+            sql_result = await self.repository.run_sql_async(sql=decision.sql)
+        await asyncio.to_thread(self._store_result, request, decision, sql_result, ran_at)
+        return self._run_sql_result(decision, sql_result)
 
     def generate_plotly_code(self, request: GeneratePlotlyCodeRequestDTO) -> ResponseDTO[GeneratePlotlyCodeResultDTO]:
         if not request.sql.strip():
@@ -66,17 +186,22 @@ class VannaService:
             )
             return ResponseDTO.error(error)
         
+        if self.chart_synthesizer is not None and request.df_schema:
+            plotly_result = self.chart_synthesizer.synthesize(request.question, request.df_schema, request.row_count)
+            if plotly_result is not None:
+                return ResponseDTO(status=ResponseStatus.SUCCESS,data=GeneratePlotlyCodeResultDTO(result=plotly_result, synthesized=True))
+
         plotly_result = self.repository.generate_plotly_code(question = request.question, sql = request.sql, df_metadata = request.df_metadata)
         return ResponseDTO(status=ResponseStatus.SUCCESS,data=GeneratePlotlyCodeResultDTO(result=plotly_result))
 
-    def get_plotly_figure(self, request: GetPlotlyFigureRequestDTO) -> ResponseDTO[GetPlotlyFigureResultDTO]:
+    def _validate_plotly_request(self, request: GetPlotlyFigureRequestDTO) -> Optional[ResponseDTO[GetPlotlyFigureResultDTO]]:
         if not request.plotly_code.strip():
             error = ErrorDTO(
                 type=ErrorType.VALIDATION_ERROR,
                 message="plotly_code cannot be empty",
                 timestamp=datetime.utcnow().isoformat()
             )
-            return ResponseDTO.error(error)
+            return ResponseDTO(status=ResponseStatus.ERROR, error=error)
         
         if request.df.empty:
             error = ErrorDTO(
@@ -84,8 +209,34 @@ class VannaService:
                 message="df cannot be empty",
                 timestamp=datetime.utcnow().isoformat()
             )
-            return ResponseDTO.error(error)
+            return ResponseDTO(status=ResponseStatus.ERROR, error=error)
+        return None
+
+    def get_plotly_figure(self, request: GetPlotlyFigureRequestDTO) -> ResponseDTO[GetPlotlyFigureResultDTO]:
+        error_response = self._validate_plotly_request(request)
+        if error_response is not None:
+            return error_response
         
         fig = self.repository.get_plotly_figure(plotly_code=request.plotly_code, df=request.df, dark_mode=request.dark_mode)
         return ResponseDTO(status=ResponseStatus.SUCCESS,data=GetPlotlyFigureResultDTO(result=fig))
 
+    async def get_plotly_figure_async(self, request: GetPlotlyFigureRequestDTO) -> ResponseDTO[GetPlotlyFigureResultDTO]:
+        """Like get_plotly_figure, but runs the generated code in the sandbox workers when configured."""
+        if self.plotly_executor is None:
+            return await asyncio.to_thread(self.get_plotly_figure, request)
+
+        error_response = self._validate_plotly_request(request)
+        if error_response is not None:
+            return error_response
+
+        try:
+            fig = await self.plotly_executor.execute(plotly_code=request.plotly_code, df=request.df, dark_mode=request.dark_mode)
+        except (WorkerPoolBusyError, WorkerPoolTimeoutError, MemoryError) as e:
+            error = ErrorDTO(
+                type=ErrorType.RUNTIME_ERROR,
+                message=f"Plot code could not be executed: {e}",
+                timestamp=datetime.utcnow().isoformat()
+            )
+            return ResponseDTO(status=ResponseStatus.ERROR, error=error)
+        return ResponseDTO(status=ResponseStatus.SUCCESS,data=GetPlotlyFigureResultDTO(result=fig))
+
@@ -0,0 +1,385 @@
+import abc
+import asyncio
+import multiprocessing
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from src.core import logger
+from src.core.errors import WorkerPoolBusyError, WorkerPoolTimeoutError
+from src.agents.utils.worker_jobs import warm_up
+
+
+class AsyncJobPool(abc.ABC):
+    """
+    Admission control and metrics shared by the worker pools.
+
+    At most max_workers jobs run at a time and at most max_queue more wait; further submissions
+    fail fast with WorkerPoolBusyError. A job running longer than its timeout raises
+    WorkerPoolTimeoutError and the pool is recycled (subclasses decide what that means). Pools
+    whose workers may be left unusable by a failed job set recycle_on_error to recycle after
+    any failure.
+
+    Every job runs on the workers it was started with and remembers their generation; a failure
+    recycles only that generation, so jobs failing because an earlier recycle tore down their
+    workers do not trigger further recycles.
+    """
+
+    recycle_on_error = False
+
+    def __init__(self, max_workers: int = 2, max_queue: int = 16, job_timeout: float = 60.0, name: str = "worker_pool"):
+        """
+        Args:
+            max_workers: Number of jobs run concurrently.
+            max_queue: Jobs allowed to wait for a free worker before submissions are rejected.
+            job_timeout: Default per-job timeout in seconds.
+            name: Name used in logs and metrics.
+        """
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.job_timeout = job_timeout
+        self.name = name
+
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._start_lock: Optional[asyncio.Lock] = None
+        # Bumped by every recycle; the workers started afterwards belong to the new generation
+        self._generation = 0
+        self._started_at = time.monotonic()
+
+        self._stats_lock = threading.Lock()
+        self._pending = 0
+        self._running = 0
+        self._submitted = 0
+        self._completed = 0
+        self._failed = 0
+        self._timeouts = 0
+        self._rejected = 0
+        self._recycles = 0
+        self._durations_ms: deque = deque(maxlen=1000)
+        self._waits_ms: deque = deque(maxlen=1000)
+
+    @abc.abstractmethod
+    async def _ensure_started(self) -> None:
+        """Bring the workers up (a no-op once they are running)."""
+
+    @abc.abstractmethod
+    def _workers(self) -> Any:
+        """The running workers handed to jobs (None when not started)."""
+
+    @abc.abstractmethod
+    async def _recycle(self) -> None:
+        """Replace workers after a timed-out or crashed job."""
+
+    async def start(self) -> None:
+        """Start the workers ahead of the first job so no request pays the startup cost."""
+        if self._start_lock is None:
+            self._start_lock = asyncio.Lock()
+        async with self._start_lock:
+            await self._ensure_started()
+
+    async def _run(self, job: Callable[[Any], Awaitable[Any]], timeout: Optional[float] = None) -> Any:
+        """Admit, queue and run one job (called with the current workers) with the pool's timeout and accounting."""
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_workers)
+        with self._stats_lock:
+            if self._pending >= self.max_workers + self.max_queue:
+                self._rejected += 1
+                raise WorkerPoolBusyError(
+                    f"{self.name} is busy ({self._pending} jobs pending, queue limit {self.max_queue})"
+                )
+            self._pending += 1
+            self._submitted += 1
+
+        timeout = timeout or self.job_timeout
+        queued_at = time.perf_counter()
+        try:
+            async with self._slots:
+                # Started (and re-started after a recycle) outside the job timeout
+                try:
+                    await self.start()
+                except Exception:
+                    with self._stats_lock:
+                        self._failed += 1
+                    raise
+                # Captured with no await since start(), so they cannot have been recycled in between
+                workers, generation = self._workers(), self._generation
+                if workers is None:
+                    with self._stats_lock:
+                        self._failed += 1
+                    raise WorkerPoolTimeoutError(f"{self.name} has no running workers")
+                started_at = time.perf_counter()
+                with self._stats_lock:
+                    self._running += 1
+                    self._waits_ms.append((started_at - queued_at) * 1000)
+                try:
+                    result = await asyncio.wait_for(job(workers), timeout)
+                except asyncio.TimeoutError:
+                    with self._stats_lock:
+                        self._timeouts += 1
+                    await self._recycle_counted(generation)
+                    raise WorkerPoolTimeoutError(f"{self.name} job exceeded {timeout}s")
+                except BrokenProcessPool as e:
+                    with self._stats_lock:
+                        self._failed += 1
+                    await self._recycle_counted(generation)
+                    raise WorkerPoolTimeoutError(f"{self.name} worker died: {e}")
+                except Exception:
+                    with self._stats_lock:
+                        self._failed += 1
+                    if self.recycle_on_error:
+                        await self._recycle_counted(generation)
+                    raise
+                finally:
+                    with self._stats_lock:
+                        self._running -= 1
+                with self._stats_lock:
+                    self._completed += 1
+                    self._durations_ms.append((time.perf_counter() - started_at) * 1000)
+                return result
+        finally:
+            with self._stats_lock:
+                self._pending -= 1
+
+    async def _recycle_counted(self, generation: int) -> None:
+        if generation != self._generation:
+            # Those workers were already replaced after another job's failure
+            return
+        self._generation += 1
+        with self._stats_lock:
+            self._recycles += 1
+        logger.warning(f"{self.name}: recycling workers")
+        await self._recycle()
+
+    @staticmethod
+    def _percentile(values, fraction: float) -> float:
+        if not values:
+            return 0.0
+        ordered = sorted(values)
+        return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+    def stats(self) -> Dict[str, Any]:
+        """Return queue depth, job counters, latency percentiles and throughput."""
+        with self._stats_lock:
+            durations = list(self._durations_ms)
+            waits = list(self._waits_ms)
+            uptime = time.monotonic() - self._started_at
+            return {
+                "workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "running": self._running,
+                "queued": self._pending - self._running,
+                "submitted": self._submitted,
+                "completed": self._completed,
+                "failed": self._failed,
+                "timeouts": self._timeouts,
+                "rejected": self._rejected,
+                "recycles": self._recycles,
+                "job_ms_p50": self._percentile(durations, 0.5),
+                "job_ms_p95": self._percentile(durations, 0.95),
+                "queue_wait_ms_p95": self._percentile(waits, 0.95),
+                "jobs_per_minute": self._completed / uptime * 60 if uptime else 0.0,
+            }
+
+
+class ProcessWorkerPool(AsyncJobPool):
+    """
+    Long-lived process pool behind an async API, for CPU-bound or untrusted jobs.
+
+    Worker processes are started once (running `initializer` to warm up expensive state) and
+    reused. They are spawned, so they re-import the entry module: run the server with
+    `uvicorn src.backend.ag_ui.main:app` rather than `python -m` to keep workers light.
+    A stuck worker cannot be interrupted, so a timed-out job recycles the whole pool.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = 2,
+        max_queue: int = 16,
+        job_timeout: float = 60.0,
+        initializer: Optional[Callable[..., None]] = None,
+        initargs: Tuple[Any, ...] = (),
+        name: str = "process_pool",
+    ):
+        """
+        Args:
+            max_workers: Number of worker processes.
+            max_queue: Jobs allowed to wait for a free worker before submissions are rejected.
+            job_timeout: Default per-job timeout in seconds.
+            initializer: Module-level function called once in every worker process when it starts.
+            initargs: Arguments for the initializer.
+            name: Name used in logs and metrics.
+        """
+        super().__init__(max_workers=max_workers, max_queue=max_queue, job_timeout=job_timeout, name=name)
+        self.initializer = initializer
+        self.initargs = initargs
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    async def _ensure_started(self) -> None:
+        if self._executor is not None:
+            return
+        start = time.perf_counter()
+        executor = ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            # spawn: workers must not inherit the server's threads, sockets or event loop
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=self.initializer,
+            initargs=self.initargs,
+        )
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(executor, warm_up) for _ in range(self.max_workers)))
+        self._executor = executor
+        logger.info(f"{self.name}: {self.max_workers} workers started in {time.perf_counter() - start:.1f}s")
+
+    def _workers(self) -> Optional[ProcessPoolExecutor]:
+        return self._executor
+
+    async def _recycle(self) -> None:
+        executor, self._executor = self._executor, None
+        if executor is None:
+            return
+        # ProcessPoolExecutor has no public way to stop a running job; terminate the processes directly
+        processes = list((getattr(executor, "_processes", None) or {}).values())
+        executor.shutdown(wait=False, cancel_futures=True)
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+
+    async def submit(self, func: Callable[..., Any], *args: Any, timeout: Optional[float] = None) -> Any:
+        """
+        Run func(*args) in a worker process.
+
+        Args:
+            func: A picklable, module-level function.
+            *args: Picklable arguments.
+            timeout: Seconds the job may run (defaults to job_timeout).
+
+        Returns:
+            The function's return value.
+
+        Raises:
+            WorkerPoolBusyError: If the queue is full.
+            WorkerPoolTimeoutError: If the job ran longer than the timeout or its worker died.
+        """
+        async def job(executor: ProcessPoolExecutor):
+            # Never None here: run_in_executor(None, ...) would run the job in the server's thread pool
+            return await asyncio.get_running_loop().run_in_executor(executor, func, *args)
+
+        return await self._run(job, timeout)
+
+    async def close(self) -> None:
+        """Stop the worker processes."""
+        executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+class FigureRenderPool(AsyncJobPool):
+    """
+    Warm Kaleido renderers for exporting Plotly figures to images.
+
+    Kaleido 1.x renders in a headless Chromium process; one long-lived Kaleido instance keeps
+    that browser and max_workers render tabs open, so exports skip the browser startup and run
+    concurrently without blocking the event loop.
+
+    Kaleido does not return a tab to its queue when a render raises, so any failed render
+    recycles the browser it ran on (unless that one was already replaced); otherwise a few bad
+    figures would leave every later render waiting. New renders go to a fresh browser right away,
+    while the old one is closed once the renders still running on it have finished.
+    """
+
+    recycle_on_error = True
+
+    def __init__(self, max_workers: int = 2, max_queue: int = 16, job_timeout: float = 60.0):
+        """
+        Args:
+            max_workers: Number of browser tabs rendering concurrently.
+            max_queue: Renders allowed to wait for a free tab before submissions are rejected.
+            job_timeout: Per-render timeout in seconds.
+        """
+        super().__init__(max_workers=max_workers, max_queue=max_queue, job_timeout=job_timeout, name="figure_render_pool")
+        self._kaleido = None
+        # Renders running per Kaleido instance (by id), and recycled instances waiting for them to finish
+        self._active: Dict[int, int] = {}
+        self._retired: Dict[int, Any] = {}
+
+    async def _ensure_started(self) -> None:
+        if self._kaleido is not None:
+            return
+        import kaleido
+
+        start = time.perf_counter()
+        renderer = kaleido.Kaleido(n=self.max_workers, timeout=None)
+        await renderer.open()
+        self._kaleido = renderer
+        logger.info(f"{self.name}: Chromium with {self.max_workers} tabs started in {time.perf_counter() - start:.1f}s")
+
+    def _workers(self) -> Any:
+        return self._kaleido
+
+    async def _close(self, renderer: Any) -> None:
+        try:
+            await renderer.close()
+        except Exception as e:
+            logger.warning(f"{self.name}: error closing Kaleido: {e}")
+
+    async def _recycle(self) -> None:
+        renderer, self._kaleido = self._kaleido, None
+        if renderer is None:
+            return
+        if self._active.get(id(renderer)):
+            # Closed by the last render still running on it
+            self._retired[id(renderer)] = renderer
+        else:
+            await self._close(renderer)
+
+    async def render(
+        self,
+        figure: Any,
+        format: str = "png",
+        width: Optional[int] = None,
+        height: Optional[int] = None,
+        scale: float = 1.0,
+        timeout: Optional[float] = None,
+    ) -> bytes:
+        """
+        Render a figure to image bytes.
+
+        Args:
+            figure: A plotly Figure or figure dict.
+            format: Image format (png, jpeg, webp, svg, pdf).
+            width: Image width in pixels (figure layout default when None).
+            height: Image height in pixels (figure layout default when None).
+            scale: Scale factor.
+            timeout: Seconds the render may take (defaults to job_timeout).
+
+        Returns:
+            The rendered image bytes.
+        """
+        opts = {"format": format, "scale": scale}
+        if width:
+            opts["width"] = width
+        if height:
+            opts["height"] = height
+
+        async def job(renderer):
+            key = id(renderer)
+            self._active[key] = self._active.get(key, 0) + 1
+            try:
+                return await renderer.calc_fig(figure, opts=opts)
+            finally:
+                # Also runs when the render is cancelled by its timeout
+                self._active[key] -= 1
+                if not self._active[key]:
+                    del self._active[key]
+                    retired = self._retired.pop(key, None)
+                    if retired is not None:
+                        await self._close(retired)
+
+        return await self._run(job, timeout)
+
+    async def close(self) -> None:
+        """Close the browser."""
+        await self._recycle()
@@ -49,6 +49,7 @@ class DatabaseAgentManager:
                 - The database is Microsoft SQL Server 
                 - When encountering error, get schema from the power table to readjust your query calls
                 - Whenever the output from the database has more than 10 rows, you should return the first 10 rows to the user only to not keep user waiting. 
+                - If a result comes back with `truncated` set, tell the user the result was cut off and narrow the time range or aggregate instead of re-running the same query
                 
                 Available operations:
                 - For specific time range queries, construct appropriate SQL queries with date/time filters
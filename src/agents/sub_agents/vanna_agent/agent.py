@@ -64,6 +64,9 @@ class VannaDataAgentManager:
                     - Only use the provided tools - do not fabricate data or queries
                     - Only proceed to create visualization when user instructs
                     - If a query fails, explain the error clearly
+                    - If a query is rejected as too expensive, ask `generate_sql_query` again with a narrower question (shorter time range, specific site or tag) instead of retrying the same SQL
+                    - If a query was bounded before running, tell the user which time window or row limit was applied
+                    - If the user asks for live, latest or refreshed data, call `execute_sql_query` with `fresh=True`
                     - For visualizations, always generate the code first, then create the figure
                     - Present numeric data in a clear, formatted way
                 """,
@@ -99,6 +102,9 @@ class VannaDataAgentManager:
                     - Only use the provided tools - do not fabricate data or queries
                     - Only proceed to create visualization when user instructs
                     - If a query fails, explain the error clearly
+                    - If a query is rejected as too expensive, ask `generate_sql_query` again with a narrower question (shorter time range, specific site or tag) instead of retrying the same SQL
+                    - If a query was bounded before running, tell the user which time window or row limit was applied
+                    - If the user asks for live, latest or refreshed data, call `execute_sql_query` with `fresh=True`
                     - For visualizations, always generate the code first, then create the figure
                     - Present numeric data in a clear, formatted way
                 """,
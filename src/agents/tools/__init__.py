@@ -2,5 +2,5 @@ from src.agents.tools.data import DatabaseTool
 from src.agents.tools.ss.visualizations import VisualizationTool
 
 
-from src.agents.tools.vanna import VannaTool
+from src.agents.tools.vanna import VannaTool, VannaConversationTracker
 from src.agents.tools.reporting import ReportingTool
@@ -1,6 +1,7 @@
 from typing import Dict, Any, Optional
 
 from src.agents.utils.utils import global_error_handler_controller
+from src.agents.repositories.columnar import table_to_rows
 from src.core.interface import HistorianDatabaseServiceProtocol
 from src.agents.dto import (
     ResponseDTO,
@@ -11,27 +12,38 @@ from src.agents.dto import (
 
 class DatabaseTool:
 
-    def __init__(self, service: HistorianDatabaseServiceProtocol):
+    def __init__(self, service: HistorianDatabaseServiceProtocol, columnar_results: bool = False):
         self.service = service
+        self.columnar_results = columnar_results
 
     @global_error_handler_controller
-    def execute_query(self, query: str, parameters: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    def execute_query(self, query: str, parameters: Optional[Dict[str, Any]] = None, max_rows: Optional[int] = None) -> Dict[str, Any]:
         """
         Executes a raw SQL query against the database and returns the results wrapped in ResponseDTO.
         
         Args:
             query: The full SQL query string.
             parameters: (Optional) A dictionary of bind parameters to safely pass into the query.
+            max_rows: (Optional) Maximum number of rows to return. Large results are truncated and
+                flagged with `truncated`; narrow the query or aggregate if that happens.
         
         Returns:
             A ResponseDTO containing either successful QueryResultDTO or error information.
         """
         request = DatabaseQueryRequestDTO(
             query=query, 
-            parameters=parameters
+            parameters=parameters,
+            max_rows=max_rows,
+            columnar=self.columnar_results
         )
         
         queryResultDTO: QueryResultDTO = self.service.execute_query(request)
 
+        if queryResultDTO.columnar is not None:
+            # The agent reads JSON rows, so this is the one place the columnar result becomes rows
+            data = queryResultDTO.model_dump(exclude={"columnar", "rows"})
+            data["rows"] = [{"data": row} for row in table_to_rows(queryResultDTO.columnar)]
+            return {"status": ResponseStatus.SUCCESS, "data": data, "error": None, "metadata": None}
+
         return ResponseDTO(status=ResponseStatus.SUCCESS, data=queryResultDTO).model_dump()
 
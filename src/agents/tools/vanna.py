@@ -1,11 +1,15 @@
 from src.core.interface import VannaServiceProtocol
 from typing import Dict, Any, Optional, List
+from google.adk.sessions.state import State
 from google.adk.tools import ToolContext
 from google.genai import types
 from plotly.graph_objs import Figure
-from datetime import datetime
+from datetime import datetime, timedelta
+import asyncio
+import threading
 import uuid
 import pandas as pd
+import pyarrow as pa
 
 from src.agents.dto.internal.database import (
     QueryRequestDTO,
@@ -19,24 +23,245 @@ from src.agents.dto.internal.database import (
 )
 
 from src.agents.dto.response import ResponseDTO, ErrorDTO, ErrorType, ResponseStatus
+from src.agents.repositories.columnar import table_to_dataframe
+from src.agents.repositories.result_store import QueryResultStore
+from src.agents.repositories.conversation_archive import ConversationArchiveRepository
+from src.agents.repositories.plotly_code_cache import dataframe_metadata, dataframe_schema, schema_fingerprint
+from src.agents.services.figure_resampler import FigureResampler
+from src.agents.utils.chart_artifacts import encode_figure, FIGURE_MIME_TYPE
+from src.agents.utils.state_codec import encode_state_value, decode_state_value, state_size
 
 
 class VannaConversationTracker:
     """
     Tracks the complete workflow for each user question.
     Each question creates a new entry with all 4 tool outputs.
+
+    State is split into fine-grained keys so the state_delta each tool call records in its event
+    only holds what it changed: STATE_KEY holds a small index (current id, conversation order, slot
+    of each conversation), every conversation has a header key and every step its own key, and
+    larger values are stored compactly encoded. DatabaseSessionService still writes the whole
+    session state row on every event, so that row is kept small by eviction, not by the split;
+    stats() reports both sizes.
+
+    Session state holds at most MAX_CONVERSATIONS conversations; the least recently updated ones
+    (and any older than MAX_AGE_SECONDS) are evicted when a new question starts, and written to
+    the ARCHIVE repository when one is configured so they can still be looked up by id.
+    Conversations the archive fails to store stay in session state until a later eviction succeeds.
+    The current conversation is never evicted.
+
+    ADK state has no delete, so conversation keys are named after slots rather than conversation
+    ids: an evicted conversation's slot is cleared and reused by the next question, which keeps the
+    number of keys in the session bounded by MAX_CONVERSATIONS.
     """
     
     STATE_KEY = "vanna_conversations"
-    
+    CONVERSATION_KEY_PREFIX = "vanna_conversation:"
+    STEP_NAMES = ("1_sql_generated", "2_sql_executed", "3_plot_code_generated", "4_figure_created")
+    MAX_CONVERSATIONS: Optional[int] = 20
+    MAX_AGE_SECONDS: Optional[float] = None
+    ARCHIVE: Optional[ConversationArchiveRepository] = None
+
+    _stats_lock = threading.Lock()
+    _stats = {"writes": 0, "bytes_written": 0, "step_updates": 0, "state_row_bytes": 0}
+
+    @classmethod
+    def configure(
+        cls,
+        max_conversations: Optional[int] = 20,
+        max_age_seconds: Optional[float] = None,
+        archive: Optional[ConversationArchiveRepository] = None,
+    ) -> None:
+        """
+        Set the per-session capacity, maximum conversation age and the cold archive.
+
+        Args:
+            max_conversations: Conversations kept in session state. None disables the limit.
+            max_age_seconds: Conversations not updated for this long are evicted. None disables it.
+            archive: Repository evicted conversations are written to. None drops them.
+        """
+        cls.MAX_CONVERSATIONS = max_conversations
+        cls.MAX_AGE_SECONDS = max_age_seconds
+        cls.ARCHIVE = archive
+
+    # --- state keys -----------------------------------------------------------------------
+
+    @staticmethod
+    def _conversation_key(slot: str) -> str:
+        return f"{VannaConversationTracker.CONVERSATION_KEY_PREFIX}{slot}"
+
+    @staticmethod
+    def _step_key(slot: str, step_name: str) -> str:
+        return f"{VannaConversationTracker.CONVERSATION_KEY_PREFIX}{slot}:{step_name}"
+
+    @staticmethod
+    def _slot(index: Dict, conv_id: str) -> Optional[str]:
+        """Slot holding the keys of a conversation in session state, or None if it is not there."""
+        if conv_id not in index.get("conversation_ids", []):
+            return None
+        # Conversations recorded before slots keep their keys named after the conversation id
+        return index.get("slots", {}).get(conv_id, conv_id)
+
+    @staticmethod
+    def _free_slot(index: Dict) -> str:
+        """Lowest slot not held by a conversation in session state."""
+        used = set(index.get("slots", {}).values())
+        slot = 0
+        while str(slot) in used:
+            slot += 1
+        return str(slot)
+
+    @staticmethod
+    def _write(tool_context: ToolContext, key: str, value: Any) -> None:
+        """Assign one state key (recorded in the event's state_delta for that key only)."""
+        encoded = encode_state_value(value) if value is not None else None
+        tool_context.state[key] = encoded
+        with VannaConversationTracker._stats_lock:
+            VannaConversationTracker._stats["writes"] += 1
+            VannaConversationTracker._stats["bytes_written"] += len(key) + state_size(encoded)
+
+    @staticmethod
+    def _read(tool_context: ToolContext, key: str) -> Any:
+        return decode_state_value(tool_context.state.get(key))
+
+    @staticmethod
+    def _index(tool_context: ToolContext) -> Dict:
+        # The index goes through _write like every other key, so it may be stored encoded
+        return VannaConversationTracker._read(tool_context, VannaConversationTracker.STATE_KEY)
+
+    @staticmethod
+    def _write_index(tool_context: ToolContext, index: Dict) -> None:
+        # Copy so ADK sees a new value rather than the same mutated dict
+        VannaConversationTracker._write(tool_context, VannaConversationTracker.STATE_KEY, dict(index))
+
+    @staticmethod
+    def _assemble(tool_context: ToolContext, conv_id: str, index: Optional[Dict] = None) -> Optional[Dict]:
+        """Build the full conversation dict (header plus steps) from its state keys."""
+        slot = VannaConversationTracker._slot(index or VannaConversationTracker._index(tool_context), conv_id)
+        if slot is None:
+            return None
+        header = VannaConversationTracker._read(tool_context, VannaConversationTracker._conversation_key(slot))
+        if header is None:
+            return None
+        conversation = {key: value for key, value in header.items() if key != "step_names"}
+        step_names = list(VannaConversationTracker.STEP_NAMES)
+        step_names += [name for name in header.get("step_names", []) if name not in step_names]
+        conversation["steps"] = {
+            name: VannaConversationTracker._read(tool_context, VannaConversationTracker._step_key(slot, name))
+            for name in step_names
+        }
+        return conversation
+
+    @staticmethod
+    def _migrate_legacy(tool_context: ToolContext, state: Dict) -> None:
+        """Split a pre-delta state blob (all conversations in one dict) into per-conversation keys."""
+        conversations = state.get("conversations", {})
+        slots = {conv_id: str(slot) for slot, conv_id in enumerate(conversations)}
+        for conv_id, conversation in conversations.items():
+            steps = conversation.get("steps", {})
+            header = {key: value for key, value in conversation.items() if key != "steps"}
+            header["step_names"] = [name for name in steps if name not in VannaConversationTracker.STEP_NAMES]
+            VannaConversationTracker._write(tool_context, VannaConversationTracker._conversation_key(slots[conv_id]), header)
+            for name, data in steps.items():
+                if data is not None:
+                    VannaConversationTracker._write(tool_context, VannaConversationTracker._step_key(slots[conv_id], name), data)
+        VannaConversationTracker._write_index(
+            tool_context,
+            {
+                "current_id": state.get("current_id"),
+                "conversation_ids": list(conversations),
+                "slots": slots,
+                "archived_count": state.get("archived_count", 0),
+            },
+        )
+
     @staticmethod
     def initialize(tool_context: ToolContext) -> None:
         """Initialize conversation tracking in state."""
-        if VannaConversationTracker.STATE_KEY not in tool_context.state:
-            tool_context.state[VannaConversationTracker.STATE_KEY] = {
-                "conversations": {},  # Dict of all question workflows
-                "current_id": None    # ID of current active conversation
-            }
+        state = VannaConversationTracker._read(tool_context, VannaConversationTracker.STATE_KEY)
+        if state is None:
+            VannaConversationTracker._write_index(
+                tool_context,
+                {
+                    "current_id": None,        # ID of current active conversation
+                    "conversation_ids": [],    # Conversations kept in session state, oldest first
+                    "slots": {},               # Conversation id -> slot its state keys are named after
+                    "archived_count": 0,
+                },
+            )
+        elif "conversations" in state:
+            VannaConversationTracker._migrate_legacy(tool_context, state)
+
+    # --- eviction -------------------------------------------------------------------------
+
+    @staticmethod
+    def _session_key(tool_context: ToolContext) -> str:
+        """Identify the session for archive lookups (user id and session id of the invocation)."""
+        invocation_context = getattr(tool_context, "_invocation_context", None)
+        session = getattr(invocation_context, "session", None)
+        user_id = getattr(invocation_context, "user_id", None) or getattr(session, "user_id", "")
+        return f"{user_id}/{getattr(session, 'id', '')}"
+
+    @staticmethod
+    def _last_updated(header: Dict) -> str:
+        return header.get("updated_at") or header.get("timestamp") or ""
+
+    @staticmethod
+    def _evict(tool_context: ToolContext, index: Dict) -> None:
+        """Evict stale and least recently updated conversations, archiving them when possible."""
+        current_id = index.get("current_id")
+        slots = {conv_id: VannaConversationTracker._slot(index, conv_id) for conv_id in index["conversation_ids"]}
+        headers = {
+            conv_id: VannaConversationTracker._read(tool_context, VannaConversationTracker._conversation_key(slot)) or {}
+            for conv_id, slot in slots.items()
+        }
+        candidates = sorted(
+            (conv_id for conv_id in headers if conv_id != current_id),
+            key=lambda conv_id: VannaConversationTracker._last_updated(headers[conv_id]),
+        )
+
+        evicted = []
+        max_age = VannaConversationTracker.MAX_AGE_SECONDS
+        if max_age is not None:
+            cutoff = (datetime.utcnow() - timedelta(seconds=max_age)).isoformat()
+            evicted = [conv_id for conv_id in candidates if VannaConversationTracker._last_updated(headers[conv_id]) < cutoff]
+        max_conversations = VannaConversationTracker.MAX_CONVERSATIONS
+        if max_conversations is not None:
+            overflow = len(headers) - len(evicted) - max_conversations
+            remaining = [conv_id for conv_id in candidates if conv_id not in evicted]
+            evicted.extend(remaining[:max(overflow, 0)])
+        if not evicted:
+            return
+
+        if VannaConversationTracker.ARCHIVE is not None:
+            conversations = {conv_id: VannaConversationTracker._assemble(tool_context, conv_id, index) for conv_id in evicted}
+            to_archive = [conversation for conversation in conversations.values() if conversation is not None]
+            archived = VannaConversationTracker.ARCHIVE.archive(VannaConversationTracker._session_key(tool_context), to_archive)
+            if archived < len(to_archive):
+                # The archive write failed; keep them in session state and retry on the next eviction
+                evicted = [conv_id for conv_id in evicted if conversations[conv_id] is None]
+                print(f"[WARNING] Archiving failed, keeping {len(to_archive)} conversations in session state")
+                if not evicted:
+                    return
+        for conv_id in evicted:
+            # ADK state has no delete; None clears the slot until the next conversation reuses it
+            VannaConversationTracker._clear_slot(tool_context, slots[conv_id], headers[conv_id])
+        index["conversation_ids"] = [conv_id for conv_id in index["conversation_ids"] if conv_id not in evicted]
+        index["slots"] = {conv_id: slot for conv_id, slot in index.get("slots", {}).items() if conv_id not in evicted}
+        index["archived_count"] = index.get("archived_count", 0) + len(evicted)
+        print(f"[DEBUG] Evicted {len(evicted)} conversations from session state")
+
+    @staticmethod
+    def _clear_slot(tool_context: ToolContext, slot: str, header: Optional[Dict]) -> None:
+        """Set the header and step keys of a slot to None."""
+        step_names = set(VannaConversationTracker.STEP_NAMES) | set((header or {}).get("step_names", []))
+        for name in step_names:
+            if tool_context.state.get(VannaConversationTracker._step_key(slot, name)) is not None:
+                VannaConversationTracker._write(tool_context, VannaConversationTracker._step_key(slot, name), None)
+        if tool_context.state.get(VannaConversationTracker._conversation_key(slot)) is not None:
+            VannaConversationTracker._write(tool_context, VannaConversationTracker._conversation_key(slot), None)
+
+    # --- public API -----------------------------------------------------------------------
     
     @staticmethod
     def start_new_conversation(tool_context: ToolContext, question: str) -> str:
@@ -49,24 +274,28 @@ class VannaConversationTracker:
         VannaConversationTracker.initialize(tool_context)
         
         conversation_id = str(uuid.uuid4())[:8]
-        conversation = {
+        header = {
             "id": conversation_id,
             "question": question,
             "timestamp": datetime.utcnow().isoformat(),
+            "updated_at": datetime.utcnow().isoformat(),
             "artifact": None,
-            "steps": {
-                "1_sql_generated": None,
-                "2_sql_executed": None,
-                "3_plot_code_generated": None,
-                "4_figure_created": None
-            }
+            "step_names": [],
         }
-        
-        state = tool_context.state[VannaConversationTracker.STATE_KEY]
-        state["conversations"][conversation_id] = conversation
-        state["current_id"] = conversation_id
 
-        tool_context.state[VannaConversationTracker.STATE_KEY] = state
+        index = dict(VannaConversationTracker._index(tool_context))
+        index["conversation_ids"] = list(index["conversation_ids"]) + [conversation_id]
+        index["current_id"] = conversation_id
+        VannaConversationTracker._evict(tool_context, index)
+
+        # Take a slot freed by the eviction (or a new one while below MAX_CONVERSATIONS)
+        slot = VannaConversationTracker._free_slot(index)
+        VannaConversationTracker._clear_slot(
+            tool_context, slot, VannaConversationTracker._read(tool_context, VannaConversationTracker._conversation_key(slot))
+        )
+        index["slots"] = dict(index.get("slots", {}), **{conversation_id: slot})
+        VannaConversationTracker._write(tool_context, VannaConversationTracker._conversation_key(slot), header)
+        VannaConversationTracker._write_index(tool_context, index)
         
         return conversation_id
     
@@ -74,28 +303,39 @@ class VannaConversationTracker:
     def get_current_conversation(tool_context: ToolContext) -> Optional[Dict]:
         """Get the current active conversation."""
         VannaConversationTracker.initialize(tool_context)
-        state = tool_context.state[VannaConversationTracker.STATE_KEY]
-        
-        current_id = state.get("current_id")
+        current_id = VannaConversationTracker._index(tool_context).get("current_id")
         if not current_id:
             return None
-        
-        if current_id in state["conversations"]:
-            return state["conversations"][current_id]
-        
-        return None
+        return VannaConversationTracker._assemble(tool_context, current_id)
     
     @staticmethod
     def get_conversation_by_id(tool_context: ToolContext, conv_id: str) -> Optional[Dict]:
-        """Get a specific conversation by ID."""
+        """Get a specific conversation by ID, falling back to the archive for evicted conversations."""
         VannaConversationTracker.initialize(tool_context)
-        state = tool_context.state[VannaConversationTracker.STATE_KEY]
-        return state["conversations"].get(conv_id)
+        conversation = VannaConversationTracker._assemble(tool_context, conv_id)
+        if conversation is None and VannaConversationTracker.ARCHIVE is not None:
+            conversation = VannaConversationTracker.ARCHIVE.load(VannaConversationTracker._session_key(tool_context), conv_id)
+            if conversation is not None:
+                conversation["archived"] = True
+        return conversation
     
+    @staticmethod
+    def _touch(tool_context: ToolContext, conv_id: str, **fields: Any) -> Optional[Dict]:
+        """Update fields of a conversation header (and its updated_at). Returns the header."""
+        slot = VannaConversationTracker._slot(VannaConversationTracker._index(tool_context), conv_id)
+        header = VannaConversationTracker._read(tool_context, VannaConversationTracker._conversation_key(slot)) if slot else None
+        if header is None:
+            return None
+        header = dict(header, updated_at=datetime.utcnow().isoformat(), **fields)
+        VannaConversationTracker._write(tool_context, VannaConversationTracker._conversation_key(slot), header)
+        return header
+
     @staticmethod
     def update_step(tool_context: ToolContext, step_name: str, data: Any, conversation_id: Optional[str] = None) -> None:
         """
         Update a specific step in a conversation.
+
+        Only the step's own key and the conversation header are written.
         
         Args:
             tool_context: The tool context
@@ -103,40 +343,74 @@ class VannaConversationTracker:
             data: Data to store in the step
             conversation_id: Optional specific conversation ID. If None, uses current conversation.
         """
-        # Get the full state first
-        state = tool_context.state.get(VannaConversationTracker.STATE_KEY)
+        state = VannaConversationTracker._read(tool_context, VannaConversationTracker.STATE_KEY)
         if not state:
             print(f"[WARNING] No state found to update step '{step_name}'")
             return
+        VannaConversationTracker.initialize(tool_context)
         
         # Get the conversation to update
-        if conversation_id:
-            conversation = state["conversations"].get(conversation_id)
-        else:
-            current_id = state.get("current_id")
-            conversation = state["conversations"].get(current_id) if current_id else None
-        
-        if conversation:
-            # Update the step
-            conversation["steps"][step_name] = data
-            
-            # Update the conversation in the state
-            state["conversations"][conversation['id']] = conversation
-            
-            # CRITICAL: Reassign the entire state dict to trigger save (Google ADK bug workaround)
-            tool_context.state[VannaConversationTracker.STATE_KEY] = state
-            
-            # Debug logging
-            print(f"[DEBUG] Updated step '{step_name}' for conversation {conversation['id']}")
-        else:
+        index = VannaConversationTracker._index(tool_context)
+        conv_id = conversation_id or index.get("current_id")
+        slot = VannaConversationTracker._slot(index, conv_id) if conv_id else None
+        header = VannaConversationTracker._read(tool_context, VannaConversationTracker._conversation_key(slot)) if slot else None
+        if header is None:
             print(f"[WARNING] No conversation found to update step '{step_name}'")
-    
+            return
+
+        step_names = list(header.get("step_names", []))
+        if step_name not in VannaConversationTracker.STEP_NAMES and step_name not in step_names:
+            step_names.append(step_name)
+        VannaConversationTracker._write(tool_context, VannaConversationTracker._step_key(slot, step_name), data)
+        VannaConversationTracker._touch(tool_context, conv_id, step_names=step_names)
+
+        state_row_bytes = VannaConversationTracker._state_row_size(tool_context)
+        with VannaConversationTracker._stats_lock:
+            VannaConversationTracker._stats["step_updates"] += 1
+            VannaConversationTracker._stats["state_row_bytes"] += state_row_bytes
+
+        # Debug logging
+        print(f"[DEBUG] Updated step '{step_name}' for conversation {conv_id}")
+
+    @staticmethod
+    def set_artifact(tool_context: ToolContext, conv_id: str, filename: str) -> None:
+        """Record the artifact filename produced for a conversation."""
+        if VannaConversationTracker._touch(tool_context, conv_id, artifact=filename) is None:
+            print(f"[WARNING] No conversation found to set artifact '{filename}'")
+
+    @staticmethod
+    def _state_row_size(tool_context: ToolContext) -> int:
+        """Size of the session state row DatabaseSessionService writes with the current event."""
+        state = tool_context.state
+        values = state.to_dict() if hasattr(state, "to_dict") else dict(state)
+        # app:, user: and temp: keys are stored elsewhere (or not at all)
+        scoped = (State.APP_PREFIX, State.USER_PREFIX, State.TEMP_PREFIX)
+        return state_size({key: value for key, value in values.items() if not key.startswith(scoped)})
 
     @staticmethod
     def get_all_conversations(tool_context: ToolContext) -> Dict[str, Dict]:
         """Get all conversations in this session."""
         VannaConversationTracker.initialize(tool_context)
-        return tool_context.state[VannaConversationTracker.STATE_KEY]["conversations"]
+        conversations = {}
+        index = VannaConversationTracker._index(tool_context)
+        for conv_id in index["conversation_ids"]:
+            conversation = VannaConversationTracker._assemble(tool_context, conv_id, index)
+            if conversation is not None:
+                conversations[conv_id] = conversation
+        return conversations
+
+    @staticmethod
+    def stats() -> Dict[str, Any]:
+        """
+        Return state write counters: bytes recorded in event state_deltas (bytes_written) and the
+        size of the session state row rewritten with each step update (state_row_bytes).
+        """
+        with VannaConversationTracker._stats_lock:
+            stats = dict(VannaConversationTracker._stats)
+        updates = stats["step_updates"]
+        stats["avg_state_row_bytes_per_step"] = stats["state_row_bytes"] / updates if updates else 0.0
+        stats["codec"] = "json+zlib"
+        return stats
 
 
 class VannaTool:
@@ -144,9 +418,43 @@ class VannaTool:
     Tool wrapper for Vanna AI with conversation tracking.
     Tracks the complete workflow: Question → SQL → Results → Plot → Figure
     """
-    
-    def __init__(self, service: VannaServiceProtocol):
+
+    # User-scoped session state setting (shared by all of a user's sessions); False always runs
+    # queries against the live database. Set through PUT /api/settings/result-cache.
+    RESULT_CACHE_SETTING_KEY = "user:result_cache_enabled"
+
+    def __init__(
+        self,
+        service: VannaServiceProtocol,
+        columnar_results: bool = False,
+        result_store: Optional[QueryResultStore] = None,
+        chart_artifact_format: str = "json",
+        figure_resampler: Optional[FigureResampler] = None,
+    ):
+        """
+        Args:
+            service: The Vanna service.
+            columnar_results: Fetch query results as Arrow tables instead of row-built DataFrames.
+            result_store: Store for query results; session state then only keeps a reference to them.
+                Without it the whole result is serialized into session state.
+            chart_artifact_format: "json" saves charts as figure JSON, which the artifact store compresses
+                (viewed through /api/charts/view with the shared plotly.js); "html" saves self-contained HTML.
+            figure_resampler: Decimates large time series and switches them to WebGL before saving.
+        """
         self.service = service
+        self.columnar_results = columnar_results
+        self.result_store = result_store
+        self.chart_artifact_format = chart_artifact_format
+        self.figure_resampler = figure_resampler
+
+    def _load_result(self, step: Dict[str, Any]) -> Optional[pd.DataFrame]:
+        """Load the result of an executed query from the result store (or legacy inline JSON)."""
+        if step.get("result_ref") and self.result_store is not None:
+            return self.result_store.load(step["result_ref"])
+        if "df" in step:
+            # Conversations recorded before results moved out of session state
+            return pd.read_json(step["df"])
+        return None
 
     def generate_sql_query(
         self, 
@@ -187,10 +495,15 @@ class VannaTool:
         else:
             return f"Error executing SQL: {response}"
                 
-    def execute_sql_query(self, tool_context: ToolContext, sql: str) -> str:
+    async def execute_sql_query(self, tool_context: ToolContext, sql: str, fresh: bool = False) -> str:
         """
         Step 2: Execute the SQL query.
         Updates current conversation with results.
+
+        Args:
+            sql: The SQL query to run.
+            fresh: Set to True when the user asks for live or refreshed data, so the query runs
+                against the database instead of being answered from recently cached results.
         """
         try:
             # Get current conversation
@@ -202,34 +515,89 @@ class VannaTool:
             print(f"[DEBUG] Executing SQL for conversation {conv_id}")
             
             # Create request DTO
-            request = RunSQLRequestDTO(sql=sql)
+            request = RunSQLRequestDTO(
+                sql=sql,
+                columnar=self.columnar_results,
+                use_cache=not fresh and tool_context.state.get(self.RESULT_CACHE_SETTING_KEY, True) is not False,
+            )
             
-            # Call service
-            response = self.service.run_sql(request)
+            # Call service (async so a slow query does not block other sessions on the event loop)
+            response = await self.service.run_sql_async(request)
+
+            if response.status == ResponseStatus.ERROR and response.error:
+                if response.error.type == ErrorType.QUERY_TOO_EXPENSIVE:
+                    # Keep the estimate with the conversation so the retry can be compared against it
+                    VannaConversationTracker.update_step(
+                        tool_context,
+                        "2_sql_rejected",
+                        {
+                            "sql": sql,
+                            "plan_estimate": response.error.details.get("plan_estimate"),
+                            "reason": response.error.message,
+                            "timestamp": datetime.utcnow().isoformat()
+                        },
+                        conversation_id=conv_id
+                    )
+                return f"[Conversation {conv_id}]\n\nError executing SQL: {response.error.message}\n\nSQL Query:\n{sql}"
             
             if response.data.result is not None:
-                df = response.data.result
+                result = response.data.result
+                plan_estimate = response.data.plan_estimate
+                executed_sql = response.data.bounded_sql or sql
+
+                df_metadata = dataframe_metadata(result)
+                step = {
+                    "sql": executed_sql,
+                    "plan_estimate": plan_estimate.model_dump() if plan_estimate else None,
+                    "bounded": response.data.bounded_sql is not None,
+                    "cached": response.data.cached,
+                    # Schema description for the plot code prompt, and the key it is cached under
+                    "df_metadata": df_metadata,
+                    "schema_fingerprint": schema_fingerprint(df_metadata),
+                    "df_schema": dataframe_schema(result),
+                    "timestamp": datetime.utcnow().isoformat()
+                }
+                if self.result_store is not None:
+                    # Keep only a reference and the schema in session state; the rows go to the store
+                    stored = await asyncio.to_thread(self.result_store.put, result)
+                    step.update(
+                        result_ref=stored["ref"],
+                        row_count=stored["row_count"],
+                        columns=stored["columns"],
+                        dtypes=stored["dtypes"],
+                    )
+                    # Columnar results become a DataFrame only here, at the tool boundary
+                    preview = table_to_dataframe(result.slice(0, 10)) if isinstance(result, pa.Table) else result.head(10)
+                else:
+                    df = table_to_dataframe(result) if isinstance(result, pa.Table) else result
+                    step.update(
+                        df=df.to_json(),
+                        row_count=len(df),
+                        columns=df.columns.tolist(),
+                    )
+                    preview = df.head(10)
                 
                 # Save to conversation tracking with explicit conversation_id
                 VannaConversationTracker.update_step(
                     tool_context,
                     "2_sql_executed",
-                    {
-                        "sql": sql,
-                        "df": df.to_json(),
-                        "row_count": len(df),
-                        "columns": df.columns.tolist(),
-                        "timestamp": datetime.utcnow().isoformat()
-                    },
+                    step,
                     conversation_id=conv_id
                 )
                 
                 # Format response
                 result_str = f"[Conversation {conv_id}]\n\n"
                 result_str += f"Query executed successfully!\n\n"
-                result_str += f"Rows returned: {len(df)}\n"
-                result_str += f"Columns: {', '.join(df.columns.tolist())}\n\n"
-                result_str += f"Preview (first 10 rows):\n{df.head(10).to_string()}"
+                if response.data.cached:
+                    result_str += "(Served from the result cache; the underlying data has not changed since it was run.)\n\n"
+                if response.data.bounded_sql:
+                    result_str += (
+                        "Note: the original query was too expensive, so it was bounded before running. "
+                        f"Executed SQL (use this for the chart):\n```sql\n{executed_sql}\n```\n\n"
+                    )
+                result_str += f"Rows returned: {step['row_count']}\n"
+                result_str += f"Columns: {', '.join(step['columns'])}\n\n"
+                result_str += f"Preview (first 10 rows):\n{preview.to_string()}"
                 
                 return result_str
             else:
@@ -261,7 +629,13 @@ class VannaTool:
             return "Error: SQL must be executed before generating plot code. Use `execute_sql_query` first."
         
         # Create request DTO
-        request = GeneratePlotlyCodeRequestDTO(question=question, sql=sql)
+        request = GeneratePlotlyCodeRequestDTO(
+            question=question,
+            sql=sql,
+            df_metadata=current_conv['steps']['2_sql_executed'].get("df_metadata"),
+            df_schema=current_conv['steps']['2_sql_executed'].get("df_schema"),
+            row_count=current_conv['steps']['2_sql_executed'].get("row_count"),
+        )
         
         # Call service
         response = self.service.generate_plotly_code(request)
@@ -275,6 +649,7 @@ class VannaTool:
                 "3_plot_code_generated",
                 {
                     "plot_code": plot_code,
+                    "synthesized": response.data.synthesized,
                     "question": question,
                     "sql": sql,
                     "timestamp": datetime.utcnow().isoformat()
@@ -314,8 +689,9 @@ class VannaTool:
         
         try:
             # Get the data from the conversation state
-            df_json = current_conv['steps']['2_sql_executed']['df']
-            df = pd.read_json(df_json)
+            df = await asyncio.to_thread(self._load_result, current_conv['steps']['2_sql_executed'])
+            if df is None:
+                return "Error: The query result is no longer available. Run `execute_sql_query` again."
             
             # Create figure request
             fig_request = GetPlotlyFigureRequestDTO(
@@ -325,41 +701,40 @@ class VannaTool:
             )
             
             # Generate figure
-            fig_response = self.service.get_plotly_figure(fig_request)
+            fig_response = await self.service.get_plotly_figure_async(fig_request)
             
             if not fig_response.success or not fig_response.data:
                 error_msg = fig_response.error if fig_response.error else "Failed to create figure"
                 return f"Error: {error_msg}"
             
             fig: Figure = fig_response.data.result
+            if self.figure_resampler is not None:
+                # Large series: WebGL traces with a decimated overview; zooming fetches detail from /api/charts/resample
+                fig = await asyncio.to_thread(self.figure_resampler.optimize, fig)
             
-            # Convert to HTML
-            html_string = fig.to_html()
-            html_artifact = types.Part.from_bytes(
-                data=html_string.encode('utf-8'),
-                mime_type="text/html"
-            )
-            
-            # Generate filename with timestamp
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"chart_{conv_id}_{timestamp}.html"
-            
-            if filename.endswith(".html"):
-                tempfilename = filename.replace(".html", ".pdf")
-                
-            from pathlib import Path
-            output_dir = Path("charts")
-            output_dir.mkdir(exist_ok=True)
-            output_path = output_dir / tempfilename
-            fig.write_image(str(output_path))
+            if self.chart_artifact_format == "json":
+                # Figure spec only; plotly.js is served once from /api/assets and cached by the browser.
+                # The artifact store compresses it.
+                artifact_bytes = await asyncio.to_thread(encode_figure, fig)
+                chart_artifact = types.Part.from_bytes(data=artifact_bytes, mime_type=FIGURE_MIME_TYPE)
+                filename = f"chart_{conv_id}_{timestamp}.json"
+            else:
+                # Convert to HTML
+                html_string = fig.to_html()
+                chart_artifact = types.Part.from_bytes(
+                    data=html_string.encode('utf-8'),
+                    mime_type="text/html"
+                )
+                filename = f"chart_{conv_id}_{timestamp}.html"
 
             # Update artifact in conversation
-            current_conv['artifact'] = filename
+            VannaConversationTracker.set_artifact(tool_context, conv_id, filename)
             
             # Save artifact
             version = await tool_context.save_artifact(
                 filename=filename, 
-                artifact=html_artifact
+                artifact=chart_artifact
             )
             
             # Save to conversation tracking with explicit conversation_id - COMPLETE
@@ -370,13 +745,15 @@ class VannaTool:
                     "filename": filename,
                     "version": version,
                     "timestamp": timestamp,
-                    "sql_used": sql,
-                    "path": str(output_path)
+                    "sql_used": sql
                 },
                 conversation_id=conv_id
             )
             
-            return f"✅ [Conversation {conv_id}] Chart created and saved as artifact '{filename}' (version {version})."
+            result = f"✅ [Conversation {conv_id}] Chart created and saved as artifact '{filename}' (version {version})."
+            if self.chart_artifact_format == "json":
+                result += " PDF, PNG and SVG downloads are available from /api/charts/export."
+            return result
             
         except Exception as e:
             return f"Error generating figure: {str(e)}\n\nPlease check the query and plot code."
\ No newline at end of file
@@ -0,0 +1,153 @@
+import gzip
+import hashlib
+import threading
+from typing import Dict, Iterable, Optional, Tuple
+
+try:
+    import zstandard
+except ImportError:  # optional: gzip is used when zstandard is not installed
+    zstandard = None
+
+IDENTITY = "identity"
+GZIP = "gzip"
+ZSTD = "zstd"
+# Dictionary-compressed payloads are stored as "zstd:<dictionary id>"
+_ZSTD_DICT_PREFIX = ZSTD + ":"
+
+_COMPRESSIBLE_MIME_TYPES = {
+    "application/json",
+    "application/javascript",
+    "application/xml",
+    "application/vnd.plotly.v1+json",
+    "image/svg+xml",
+}
+# Payloads that are compressed already (gzip, zstd, PNG, JPEG, PDF streams, zip)
+_COMPRESSED_MAGIC = (b"\x1f\x8b", b"\x28\xb5\x2f\xfd", b"\x89PNG", b"\xff\xd8\xff", b"PK\x03\x04")
+# The trained dictionary targets charts: HTML pages repeat the same plotly.js boilerplate, and both
+# the pages and figure JSON repeat the same trace and layout keys
+DICTIONARY_MIME_TYPES = {"text/html", "application/vnd.plotly.v1+json"}
+
+
+def is_compressible(mime_type: str, data: bytes) -> bool:
+    """Whether a payload of this type is worth compressing (text-like and not compressed already)."""
+    base_type = (mime_type or "").split(";")[0].strip().lower()
+    if not (base_type.startswith("text/") or base_type in _COMPRESSIBLE_MIME_TYPES or base_type.endswith("+json")):
+        return False
+    return not data.startswith(_COMPRESSED_MAGIC)
+
+
+def zstd_available() -> bool:
+    """Whether zstandard is installed (otherwise payloads are gzip-compressed)."""
+    return zstandard is not None
+
+
+class ArtifactCodec:
+    """
+    Mime-aware compression of artifact payloads.
+
+    Text-like payloads are compressed with zstd (using a trained dictionary for charts when
+    one is loaded) or with gzip when zstandard is not installed. Payloads that are small, already
+    compressed, or do not shrink enough are stored as-is. The codec name returned by encode() is
+    stored with the payload and is all decode() needs.
+    """
+
+    def __init__(self, min_bytes: int = 1024, min_saving: float = 0.1, gzip_level: int = 6, zstd_level: int = 10):
+        """
+        Args:
+            min_bytes: Payloads smaller than this are stored uncompressed.
+            min_saving: Minimum fraction of bytes compression must save to be kept.
+            gzip_level: gzip compression level.
+            zstd_level: zstd compression level.
+        """
+        self.min_bytes = min_bytes
+        self.min_saving = min_saving
+        self.gzip_level = gzip_level
+        self.zstd_level = zstd_level
+
+        self._dictionaries: Dict[str, bytes] = {}
+        self._active_dictionary: Optional[str] = None
+        self._lock = threading.Lock()
+
+    @property
+    def dictionary_id(self) -> Optional[str]:
+        """Id of the dictionary new chart payloads are compressed with, if any."""
+        return self._active_dictionary
+
+    def add_dictionary(self, dictionary_id: str, data: bytes, active: bool = True) -> None:
+        """Register a trained dictionary (needed to decode payloads compressed with it)."""
+        with self._lock:
+            self._dictionaries[dictionary_id] = data
+            if active:
+                self._active_dictionary = dictionary_id
+
+    def missing_dictionary(self, codec: Optional[str]) -> Optional[str]:
+        """Id of the dictionary a stored codec needs when it is not registered here, else None."""
+        if not codec or not codec.startswith(_ZSTD_DICT_PREFIX):
+            return None
+        dictionary_id = codec[len(_ZSTD_DICT_PREFIX):]
+        with self._lock:
+            return None if dictionary_id in self._dictionaries else dictionary_id
+
+    def train_dictionary(self, samples: Iterable[bytes], size: int = 112640) -> Optional[Tuple[str, bytes]]:
+        """
+        Train a zstd dictionary from sample payloads.
+
+        Returns:
+            (dictionary_id, dictionary bytes), or None when zstandard is not installed.
+        """
+        if zstandard is None:
+            return None
+        dictionary = zstandard.train_dictionary(size, list(samples)).as_bytes()
+        return hashlib.sha256(dictionary).hexdigest()[:16], dictionary
+
+    def encode(self, data: bytes, mime_type: str) -> Tuple[str, bytes]:
+        """
+        Compress a payload if it is worth it.
+
+        Returns:
+            (codec, stored bytes)
+        """
+        if len(data) < self.min_bytes or not is_compressible(mime_type, data):
+            return IDENTITY, data
+
+        if zstandard is not None:
+            dictionary_id = self._active_dictionary if mime_type.split(";")[0].strip().lower() in DICTIONARY_MIME_TYPES else None
+            if dictionary_id is not None:
+                dictionary = zstandard.ZstdCompressionDict(self._dictionaries[dictionary_id])
+                compressor = zstandard.ZstdCompressor(level=self.zstd_level, dict_data=dictionary)
+                codec = _ZSTD_DICT_PREFIX + dictionary_id
+            else:
+                compressor = zstandard.ZstdCompressor(level=self.zstd_level)
+                codec = ZSTD
+            payload = compressor.compress(data)
+        else:
+            codec, payload = GZIP, gzip.compress(data, compresslevel=self.gzip_level)
+
+        if len(payload) > len(data) * (1 - self.min_saving):
+            return IDENTITY, data
+        return codec, payload
+
+    def decode(self, codec: Optional[str], payload: bytes) -> bytes:
+        """Restore the original bytes of a stored payload."""
+        if not codec or codec == IDENTITY:
+            return payload
+        if codec == GZIP:
+            return gzip.decompress(payload)
+        if zstandard is None:
+            raise RuntimeError(f"Artifact payload was compressed with {codec}, but zstandard is not installed")
+        if codec == ZSTD:
+            return zstandard.ZstdDecompressor().decompress(payload)
+        if codec.startswith(_ZSTD_DICT_PREFIX):
+            dictionary_id = codec[len(_ZSTD_DICT_PREFIX):]
+            dictionary = self._dictionaries.get(dictionary_id)
+            if dictionary is None:
+                raise RuntimeError(f"Unknown zstd dictionary {dictionary_id}")
+            return zstandard.ZstdDecompressor(dict_data=zstandard.ZstdCompressionDict(dictionary)).decompress(payload)
+        raise ValueError(f"Unknown artifact codec {codec!r}")
+
+    @staticmethod
+    def http_encoding(codec: Optional[str]) -> Optional[str]:
+        """Content-Encoding under which a stored payload can be sent as-is, or None if it must be decoded."""
+        if codec in (GZIP, ZSTD):
+            return codec
+        return None
@@ -0,0 +1,87 @@
+import gzip
+import html
+import json
+import os
+from typing import Any, Dict
+
+import plotly
+from plotly.graph_objs import Figure
+
+# Figure JSON artifacts: the plotly figure spec only. HTML views load plotly.js from
+# /api/assets/plotly.min.js instead of inlining the ~4.5 MB bundle into every artifact. They are
+# saved as plain JSON and compressed by the artifact store; only legacy artifacts saved before that
+# are gzip-compressed themselves (FIGURE_CONTENT_ENCODING).
+FIGURE_MIME_TYPE = "application/vnd.plotly.v1+json"
+FIGURE_CONTENT_ENCODING = "gzip"
+PLOTLY_JS_PATH = os.path.join(os.path.dirname(plotly.__file__), "package_data", "plotly.min.js")
+PLOTLY_JS_VERSION = plotly.__version__
+PLOTLY_JS_URL = f"/api/assets/plotly.min.js?v={PLOTLY_JS_VERSION}"
+
+_GZIP_MAGIC = b"\x1f\x8b"
+
+# Zoom handler for large-series figures (layout.meta.resample): refetch the visible x-range at full detail
+_RESAMPLE_SCRIPT = """
+const resample = (figure.layout && figure.layout.meta && figure.layout.meta.resample) || null;
+if (resample && resample.ref) {
+  const chart = document.getElementById("chart");
+  chart.on("plotly_relayout", async (event) => {
+    let range = event["xaxis.range"] || [event["xaxis.range[0]"], event["xaxis.range[1]"]];
+    const params = new URLSearchParams({ref: resample.ref});
+    if (!event["xaxis.autorange"]) {
+      if (range[0] === undefined) return;
+      params.set("x0", range[0]);
+      params.set("x1", range[1]);
+    }
+    const response = await fetch(RESAMPLE_URL + "?" + params);
+    if (!response.ok) return;
+    const slice = await response.json();
+    Plotly.restyle(chart, {x: slice.traces.map(t => t.x), y: slice.traces.map(t => t.y)}, slice.traces.map(t => t.index));
+  });
+}
+"""
+
+
+def encode_figure(fig: Figure) -> bytes:
+    """Serialize a figure to plotly JSON (compression is left to the artifact store)."""
+    return fig.to_json().encode("utf-8")
+
+
+def decode_figure(data: bytes) -> Dict[str, Any]:
+    """Parse a figure artifact (gzip-compressed or plain plotly JSON) into a figure dict."""
+    if data[:2] == _GZIP_MAGIC:
+        data = gzip.decompress(data)
+    return json.loads(data)
+
+
+def figure_html(
+    figure_json: str,
+    title: str = "Chart",
+    plotly_js_url: str = PLOTLY_JS_URL,
+    resample_url: str = "/api/charts/resample",
+) -> str:
+    """
+    Minimal HTML page rendering a figure with the shared, separately cached plotly.js.
+    Decimated large-series figures refetch detail from resample_url when zoomed.
+    """
+    # Escape "</" so figure text cannot close the script element
+    safe_json = figure_json.replace("</", "<\\/")
+    return f"""<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>{html.escape(title)}</title>
+<script src="{plotly_js_url}"></script>
+<style>html, body, #chart {{ margin: 0; width: 100%; height: 100%; }}</style>
+</head>
+<body>
+<div id="chart"></div>
+<script>
+const figure = {safe_json};
+const RESAMPLE_URL = {json.dumps(resample_url)};
+Plotly.newPlot("chart", figure.data, figure.layout, {{responsive: true}}).then(() => {{
+{_RESAMPLE_SCRIPT}
+}});
+</script>
+</body>
+</html>
+"""
@@ -0,0 +1,52 @@
+import base64
+from typing import Any
+
+import numpy as np
+
+
+def plotly_array(value: Any) -> np.ndarray:
+    """
+    A trace data array as numpy. Plotly 6 JSON stores numeric arrays as base64 typed arrays
+    ({"dtype": "f8", "bdata": ...}), which figures parsed from JSON keep as dicts.
+    """
+    if isinstance(value, dict) and "bdata" in value and "dtype" in value:
+        array = np.frombuffer(base64.b64decode(value["bdata"]), dtype=np.dtype(value["dtype"]))
+        shape = value.get("shape")
+        if shape:
+            array = array.reshape([int(dim) for dim in str(shape).split(",")])
+        return array
+    return np.asarray(value)
+
+
+def minmax_indices(y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Indices of a min-max decimation of y to about n_out points.
+
+    y is split into n_out // 2 equal buckets and the minimum and maximum of every bucket are
+    kept, so peaks and dips survive at any zoom level. The first and last points are always
+    kept. NaNs are never selected unless a bucket holds nothing else.
+
+    Args:
+        y: The series values, ordered by x.
+        n_out: Target number of points.
+
+    Returns:
+        Sorted indices into y.
+    """
+    n = len(y)
+    if n <= n_out or n_out < 4:
+        return np.arange(n)
+
+    n_buckets = n_out // 2
+    size = -(-n // n_buckets)  # ceil
+    values = np.asarray(y, dtype=np.float64)
+    padded = np.full(n_buckets * size, np.nan)
+    padded[:n] = values
+    buckets = padded.reshape(n_buckets, size)
+
+    offsets = np.arange(n_buckets) * size
+    low = np.where(np.isnan(buckets), np.inf, buckets).argmin(axis=1) + offsets
+    high = np.where(np.isnan(buckets), -np.inf, buckets).argmax(axis=1) + offsets
+
+    indices = np.concatenate(([0, n - 1], low, high))
+    return np.unique(indices[indices < n])
@@ -0,0 +1,36 @@
+import base64
+import json
+import zlib
+from typing import Any
+
+# Encoded values are plain strings so session state stays JSON-serializable for DatabaseSessionService
+_JSON_ZLIB_PREFIX = "z1:"
+
+
+def state_size(value: Any) -> int:
+    """Size in bytes of a state value once serialized to JSON (what the session service writes)."""
+    return len(json.dumps(value, default=str, separators=(",", ":")).encode("utf-8"))
+
+
+def encode_state_value(value: Any, min_bytes: int = 512) -> Any:
+    """
+    Compactly encode a session state value.
+
+    Values smaller than min_bytes, and values that do not shrink, are returned unchanged. Larger
+    ones are serialized to JSON, zlib-compressed and base64-encoded into a prefixed string that
+    decode_state_value recognizes.
+    """
+    raw = json.dumps(value, default=str, separators=(",", ":")).encode("utf-8")
+    if len(raw) < min_bytes:
+        return value
+    encoded = _JSON_ZLIB_PREFIX + base64.b64encode(zlib.compress(raw)).decode("ascii")
+    return encoded if len(encoded) < len(raw) else value
+
+
+def decode_state_value(value: Any) -> Any:
+    """Decode a value produced by encode_state_value; anything else is returned unchanged."""
+    if not isinstance(value, str):
+        return value
+    if value.startswith(_JSON_ZLIB_PREFIX):
+        return json.loads(zlib.decompress(base64.b64decode(value[len(_JSON_ZLIB_PREFIX):])))
+    return value
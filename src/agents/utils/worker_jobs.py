@@ -0,0 +1,122 @@
+# Functions executed inside ProcessWorkerPool processes. They live outside src.agents.services so
+# that spawned workers only import what they need instead of the whole services package.
+import hashlib
+from collections import OrderedDict
+from typing import Any, Optional, Tuple
+
+try:
+    import resource
+except ImportError:  # not available on Windows; limits are then not applied
+    resource = None
+
+# Compiled generated-code objects, per worker process, keyed by the code's hash
+_CODE_CACHE: "OrderedDict[str, Any]" = OrderedDict()
+_CODE_CACHE_MAX_ENTRIES = 256
+
+
+def warm_up() -> bool:
+    """No-op job used to force a worker process (and its initializer) to start."""
+    return True
+
+
+def code_hash(code: str) -> str:
+    """Key of a code snippet in the compiled-code cache."""
+    return hashlib.sha256(code.encode("utf-8")).hexdigest()
+
+
+def init_plotly_worker(memory_limit_bytes: Optional[int] = None) -> None:
+    """
+    Initializer for Plotly sandbox workers: cap the address space and import plotly up front
+    so neither the limit nor the import cost is paid inside a job.
+    """
+    import pandas  # noqa: F401
+    import plotly.express  # noqa: F401
+    import plotly.graph_objects  # noqa: F401
+
+    if resource is not None and memory_limit_bytes:
+        _, hard = resource.getrlimit(resource.RLIMIT_AS)
+        if hard != resource.RLIM_INFINITY:
+            memory_limit_bytes = min(memory_limit_bytes, hard)
+        resource.setrlimit(resource.RLIMIT_AS, (memory_limit_bytes, hard))
+
+
+def _compile(code_key: str, code: str) -> Tuple[Any, bool]:
+    compiled = _CODE_CACHE.get(code_key)
+    if compiled is not None:
+        _CODE_CACHE.move_to_end(code_key)
+        return compiled, True
+    compiled = compile(code, f"<plotly_code:{code_key[:12]}>", "exec")
+    _CODE_CACHE[code_key] = compiled
+    if len(_CODE_CACHE) > _CODE_CACHE_MAX_ENTRIES:
+        _CODE_CACHE.popitem(last=False)
+    return compiled, False
+
+
+def _fallback_figure(df):
+    """Same chart choice as VannaBase.get_plotly_figure when the generated code fails."""
+    import plotly.express as px
+
+    numeric_cols = df.select_dtypes(include=["number"]).columns.tolist()
+    categorical_cols = df.select_dtypes(include=["object", "category"]).columns.tolist()
+    if len(numeric_cols) >= 2:
+        return px.scatter(df, x=numeric_cols[0], y=numeric_cols[1])
+    if len(numeric_cols) == 1 and len(categorical_cols) >= 1:
+        return px.bar(df, x=categorical_cols[0], y=numeric_cols[0])
+    if len(categorical_cols) >= 1 and df[categorical_cols[0]].nunique() < 10:
+        return px.pie(df, names=categorical_cols[0])
+    return px.line(df)
+
+
+def run_plotly_code(
+    code_key: str,
+    code: str,
+    df: Any,
+    dark_mode: bool = True,
+    cpu_seconds: Optional[float] = None,
+) -> Tuple[Optional[str], bool, bool]:
+    """
+    Execute generated Plotly code against df and return the figure as JSON.
+
+    The job's CPU time is capped with RLIMIT_CPU; exceeding it kills the worker (SIGXCPU), which
+    the pool reports as a failed job and recycles.
+
+    Returns:
+        (figure_json or None, compiled_code_was_cached, used_fallback_chart)
+    """
+    import pandas as pd
+    import plotly.express as px
+    import plotly.graph_objects as go
+
+    previous_cpu_limit = None
+    if resource is not None and cpu_seconds:
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        previous_cpu_limit = resource.getrlimit(resource.RLIMIT_CPU)
+        # RLIMIT_CPU counts the process' lifetime CPU, so the job's budget is added to what was used so far
+        soft = int(usage.ru_utime + usage.ru_stime + cpu_seconds) + 1
+        hard = previous_cpu_limit[1]
+        if hard != resource.RLIM_INFINITY:
+            soft = min(soft, hard)
+        resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+    try:
+        cached = False
+        used_fallback = False
+        namespace = {"df": df, "px": px, "go": go, "pd": pd}
+        try:
+            compiled, cached = _compile(code_key, code)
+            exec(compiled, namespace)
+            fig = namespace.get("fig")
+        except MemoryError:
+            raise
+        except Exception:
+            fig = _fallback_figure(df)
+            used_fallback = True
+
+        if fig is None:
+            return None, cached, used_fallback
+        if dark_mode:
+            fig.update_layout(template="plotly_dark")
+        return fig.to_json(), cached, used_fallback
+    finally:
+        if previous_cpu_limit is not None:
+            resource.setrlimit(resource.RLIMIT_CPU, previous_cpu_limit)
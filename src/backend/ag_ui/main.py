@@ -1,18 +1,45 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import FileResponse, HTMLResponse, Response, StreamingResponse
 from ag_ui_adk import ADKAgent, add_adk_fastapi_endpoint
+from google.adk.events import Event, EventActions
 from google.adk.sessions import DatabaseSessionService
-from src.core.dependencies import root_agent
-from src.core.config import HOST, DBNAME, USER, PASSWORD, PORT
+from src.core.dependencies import root_agent, dataAgent, sqlCache, sqlTemplates, promptBuilder, queryGuard, pgPool, resultCache, resultStore, conversationArchive, renderPool, plotlyExecutor, plotlyCodeCache, chartSynthesizer, figureResampler, artifactCache
+from src.core.config import (
+    HOST, DBNAME, USER, PASSWORD, PORT,
+    ARTIFACT_COMPRESSION_ENABLED, ARTIFACT_COMPRESSION_DICTIONARY_ENABLED
+)
 from ag_ui.core import RunAgentInput
 from google.genai import types
+import asyncio
 import base64
+import json
 
 from src.agents.services.custom_artifact_service import PostgresArtifactService
+from src.agents.services.chart_export import ChartExportService
+from src.core.errors import WorkerPoolBusyError, WorkerPoolTimeoutError
+from src.agents.tools import VannaConversationTracker, VannaTool
+from src.agents.utils.chart_artifacts import (
+    FIGURE_MIME_TYPE,
+    FIGURE_CONTENT_ENCODING,
+    PLOTLY_JS_PATH,
+    decode_figure,
+    figure_html,
+)
 from typing import List, Dict, Optional
 
 # Direct DSN string
 artifact_service = PostgresArtifactService(
     dsn=f"postgresql://{USER}:{PASSWORD}@{HOST}:{PORT}/{DBNAME}",
+    compress=ARTIFACT_COMPRESSION_ENABLED,
+    cache=artifactCache,
+)
+
+# PDF/PNG/SVG renditions of charts, rendered on first download and kept in the artifact store
+# (under "manufacturing_chat_app.renditions", apart from the session's artifacts)
+chart_export_service = ChartExportService(
+    artifact_service=artifact_service,
+    app_name="manufacturing_chat_app",
+    render_pool=renderPool,
 )
 
 # from fastapi import Request, HTTPException
@@ -129,11 +156,7 @@ def extract_user_id_from_forwarded_props(run_input: RunAgentInput) -> str:
     
     return user_id
 
-# Create ADK middleware agent instance
-adk_root_agent = ADKAgent(
-    adk_agent=root_agent,
-    app_name="manufacturing_chat_app",
-    session_service=DatabaseSessionService(
+session_service = DatabaseSessionService(
     db_url=f"postgresql://{USER}:{PASSWORD}@{HOST}:{PORT}/{DBNAME}",
     
     # More robust connection pool settings
@@ -151,7 +174,13 @@ adk_root_agent = ADKAgent(
         "keepalives_interval": 10,
         "keepalives_count": 5,
     } 
-    ),
+)
+
+# Create ADK middleware agent instance
+adk_root_agent = ADKAgent(
+    adk_agent=root_agent,
+    app_name="manufacturing_chat_app",
+    session_service=session_service,
     artifact_service=artifact_service,
     user_id_extractor=extract_user_id_from_forwarded_props,
     session_timeout_seconds=None,
@@ -161,12 +190,45 @@ adk_root_agent = ADKAgent(
 # Create FastAPI app
 app = FastAPI(title="ADK Middleware Root Agent")
 
-@app.get("/api/files", response_model=Dict)
+@app.on_event("startup")
+async def start_render_pool():
+    # Start the Kaleido workers now so the first chart export does not pay the Chromium startup
+    if renderPool:
+        try:
+            await renderPool.start()
+        except Exception as e:
+            # The pool retries on the first export; a missing Chrome must not keep the API down
+            logger.warning(f"Figure render pool did not start: {e}")
+    if plotlyExecutor:
+        try:
+            await plotlyExecutor.start()
+        except Exception as e:
+            logger.warning(f"Plotly sandbox workers did not start: {e}")
+
+@app.on_event("startup")
+async def prepare_artifact_compression():
+    # Loads stored zstd dictionaries, or trains one on existing charts (HTML and figure JSON) when there is none yet
+    if ARTIFACT_COMPRESSION_ENABLED and ARTIFACT_COMPRESSION_DICTIONARY_ENABLED:
+        try:
+            await artifact_service.train_compression_dictionary()
+        except Exception as e:
+            logger.warning(f"Artifact compression dictionary unavailable: {e}")
+
+@app.on_event("shutdown")
+async def close_database_pools():
+    await pgPool.close()
+    if renderPool:
+        await renderPool.close()
+    if plotlyExecutor:
+        await plotlyExecutor.close()
+
+@app.get("/api/files", response_model=Dict, deprecated=True)
 async def list_resources(user_id: Optional[str] = None, session_id: Optional[str] = None, filename: Optional[str] = None):
     """
-    Returns a list of metadata for all available artifacts/resources 
-    managed by the PostgresArtifactService.
-    
+    Returns an artifact as base64 inside JSON.
+
+    Deprecated: kept for existing clients only. Use /api/files/content, which streams the raw
+    bytes with caching and Range support instead of inflating them by a third.
     """
     try:
         # Assuming list_all_resources is implemented on your custom service
@@ -184,16 +246,23 @@ async def list_resources(user_id: Optional[str] = None, session_id: Optional[str
         
         # 3. CRITICAL: Encode the bytes to Base64 (ASCII string)
         if isinstance(bytes_data, bytes):
-            base64_encoded_data = base64.b64encode(bytes_data).decode('ascii')
+            base64_encoded_data = await asyncio.to_thread(lambda: base64.b64encode(bytes_data).decode('ascii'))
         else:
             # Handle case where data might already be a string (though less likely here)
             base64_encoded_data = bytes_data 
 
-        return {
+        response = {
             "mime_type": artifact_part.inline_data.mime_type,
             "data": base64_encoded_data # <-- 4. Return the Base64 string
         }
+        if artifact_part.inline_data.mime_type == FIGURE_MIME_TYPE and bytes_data[:2] == b"\x1f\x8b":
+            # Only figure JSON saved before the artifact store compressed payloads is gzip-compressed;
+            # for those the client must gunzip after base64
+            response["content_encoding"] = FIGURE_CONTENT_ENCODING
+        return response
     
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error retrieving resources via /api/files: {e}")
         # Return a 500 error on failure
@@ -202,6 +271,280 @@ async def list_resources(user_id: Optional[str] = None, session_id: Optional[str
             detail=f"Failed to retrieve resources from artifact service: {str(e)}"
         )
     
+def _byte_range(range_header: Optional[str], size: int) -> Optional[tuple]:
+    """
+    Parses a single-range "bytes=" Range header into inclusive (start, end) offsets.
+
+    Returns None when the header is absent or not a single byte range (the full body is sent),
+    and (size, size) when the range cannot be satisfied.
+    """
+    if not range_header or not range_header.startswith("bytes=") or "," in range_header:
+        return None
+    first, _, last = range_header[len("bytes="):].strip().partition("-")
+    try:
+        if first:
+            start = int(first)
+            end = min(int(last), size - 1) if last else size - 1
+        elif last:
+            start, end = max(size - int(last), 0), size - 1
+        else:
+            return None
+    except ValueError:
+        return None
+    if start > end or start >= size:
+        return (size, size)
+    return (start, end)
+
+@app.api_route("/api/files/content", methods=["GET", "HEAD"])
+async def artifact_content(
+    request: Request,
+    user_id: str,
+    session_id: str,
+    filename: str,
+    version: Optional[int] = None,
+):
+    """
+    Streams an artifact's raw bytes with its Content-Type, an ETag (If-None-Match → 304) and
+    single-range Range requests (206). Payloads are read from Postgres in chunks, so large files
+    are never held in memory. Payloads stored gzip- or zstd-compressed are sent as stored, with
+    Content-Encoding, to clients that accept that encoding; other clients get them decoded.
+    HEAD returns the same headers from the artifact's metadata without reading the payload.
+    """
+    stat = await artifact_service.stat_artifact(
+        app_name="manufacturing_chat_app",
+        user_id=user_id,
+        session_id=session_id,
+        filename=filename,
+        version=version,
+    )
+    if stat is None:
+        raise HTTPException(status_code=404, detail="Artifact not found")
+
+    codec = stat["codec"]
+    encoding = artifact_service.codec.http_encoding(codec)
+    accepted = {value.split(";")[0].strip().lower() for value in request.headers.get("accept-encoding", "").split(",")}
+    # The blob key hashes the original bytes; encoded representations get their own tag
+    tag = stat["sha256"] or f"a{stat['id']}"
+    headers = {
+        "Accept-Ranges": "bytes",
+        "Vary": "Accept-Encoding",
+        "Content-Disposition": f"inline; filename=\"{filename}\"",
+        # A pinned version never changes; "latest" must be revalidated against the ETag
+        "Cache-Control": "private, max-age=31536000, immutable" if version is not None else "private, no-cache",
+    }
+    if encoding and encoding in accepted:
+        headers["Content-Encoding"] = encoding
+        tag = f"{tag}-{encoding}"
+    headers["ETag"] = f'"{tag}"'
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and (if_none_match.strip() == "*" or headers["ETag"] in [t.strip().removeprefix("W/") for t in if_none_match.split(",")]):
+        return Response(status_code=304, headers=headers)
+
+    size = stat["stored_size"] if "Content-Encoding" in headers else stat["size"]
+    byte_range = None
+    if_range = request.headers.get("if-range")
+    if not if_range or if_range.strip() == headers["ETag"]:
+        byte_range = _byte_range(request.headers.get("range"), size)
+    if byte_range == (size, size):
+        return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+
+    status_code = 200
+    start, end = 0, size - 1
+    if byte_range is not None:
+        start, end = byte_range
+        status_code = 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(end - start + 1 if size else 0)
+
+    if request.method == "HEAD":
+        return Response(status_code=status_code, media_type=stat["mime_type"], headers=headers)
+    if codec != "identity" and "Content-Encoding" not in headers:
+        # Compressed payload for a client that cannot take it: decoding needs the whole payload
+        stored = await artifact_service.load_stored_artifact(
+            app_name="manufacturing_chat_app",
+            user_id=user_id,
+            session_id=session_id,
+            filename=filename,
+            version=stat["version"],
+        )
+        if stored is None:
+            raise HTTPException(status_code=404, detail="Artifact not found")
+        decoded = await artifact_service.decode_payload(codec, stored[0])
+        return Response(content=decoded[start:end + 1], status_code=status_code, media_type=stat["mime_type"], headers=headers)
+    body = artifact_service.iter_stored_bytes(stat["id"], start, end) if size else iter(())
+    return StreamingResponse(body, status_code=status_code, media_type=stat["mime_type"], headers=headers)
+
+@app.get("/api/files/list", response_model=Dict)
+async def list_artifacts(user_id: str, session_id: str, after: Optional[str] = None, limit: int = 50):
+    """
+    Lists the latest version of each artifact in a session (including the user's "user:" files),
+    ordered by filename, with metadata only. Pass next_cursor back as after to get the next page.
+    """
+    if not 1 <= limit <= 500:
+        raise HTTPException(status_code=400, detail="limit must be between 1 and 500")
+    artifacts, next_cursor = await artifact_service.list_artifacts(
+        app_name="manufacturing_chat_app",
+        user_id=user_id,
+        session_id=session_id,
+        after=after,
+        limit=limit,
+    )
+    for artifact in artifacts:
+        artifact["created_at"] = artifact["created_at"].isoformat() if artifact["created_at"] else None
+    return {"artifacts": artifacts, "next_cursor": next_cursor}
+
+@app.get("/api/assets/plotly.min.js")
+async def plotly_js():
+    """
+    Serves the plotly.js bundle shared by all chart views. URLs carry the plotly version,
+    so the file can be cached indefinitely.
+    """
+    return FileResponse(
+        PLOTLY_JS_PATH,
+        media_type="application/javascript",
+        headers={"Cache-Control": "public, max-age=31536000, immutable"},
+    )
+
+@app.get("/api/charts/view", response_class=HTMLResponse)
+async def view_chart(user_id: str, session_id: str, filename: str, version: Optional[int] = None):
+    """
+    Renders a chart artifact as an HTML page. Figure JSON artifacts are wrapped in a small page
+    that loads the shared plotly.js; legacy self-contained HTML artifacts are returned as stored.
+    """
+    artifact_part: types.Part = await artifact_service.load_artifact(
+        app_name="manufacturing_chat_app",
+        user_id=user_id,
+        session_id=session_id,
+        filename=filename,
+        version=version,
+    )
+    if not artifact_part:
+        raise HTTPException(status_code=404, detail="Artifact not found")
+
+    mime_type = artifact_part.inline_data.mime_type
+    data = artifact_part.inline_data.data
+    if mime_type == "text/html":
+        return HTMLResponse(content=data)
+    if mime_type != FIGURE_MIME_TYPE:
+        raise HTTPException(status_code=415, detail=f"Artifact of type {mime_type} is not a chart")
+    figure = decode_figure(data)
+    return HTMLResponse(content=figure_html(json.dumps(figure), title=filename))
+
+@app.get("/api/charts/export")
+async def export_chart(
+    user_id: str,
+    session_id: str,
+    filename: str,
+    format: str = "pdf",
+    version: Optional[int] = None,
+    width: Optional[int] = None,
+    height: Optional[int] = None,
+    scale: float = 1.0,
+):
+    """
+    Downloads a chart as PDF, PNG or SVG. The rendition is rendered on the first request and
+    served from the artifact store afterwards.
+    """
+    try:
+        rendition = await chart_export_service.export(
+            user_id=user_id,
+            session_id=session_id,
+            filename=filename,
+            format=format,
+            version=version,
+            width=width,
+            height=height,
+            scale=scale,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except WorkerPoolBusyError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    except WorkerPoolTimeoutError as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    if rendition is None:
+        raise HTTPException(status_code=404, detail="Artifact not found")
+
+    download_name = f"{filename.rsplit('.', 1)[0]}.{format.lower()}"
+    return Response(
+        content=rendition.data,
+        media_type=rendition.mime_type,
+        headers={"Content-Disposition": f'attachment; filename="{download_name}"'},
+    )
+
+@app.get("/api/charts/resample", response_model=Dict)
+async def resample_chart(ref: str, x0: Optional[str] = None, x1: Optional[str] = None, points: Optional[int] = None):
+    """
+    Returns a decimated slice of a large figure's full-resolution series for the visible x-range.
+    `ref` is layout.meta.resample.ref of the figure; the result can be applied with Plotly.restyle.
+    """
+    if figureResampler is None:
+        raise HTTPException(status_code=404, detail="Large figure resampling is disabled")
+    if points is not None and not 4 <= points <= 100_000:
+        raise HTTPException(status_code=400, detail="points must be between 4 and 100000")
+    try:
+        result = await asyncio.to_thread(figureResampler.resample, ref, x0, x1, points)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if result is None:
+        raise HTTPException(status_code=404, detail="Series not found")
+    return result
+
+@app.get("/api/settings/result-cache", response_model=Dict)
+async def get_result_cache_setting(user_id: str, session_id: str):
+    """
+    Returns whether the user's queries may be answered from the result cache.
+    """
+    session = await session_service.get_session(
+        app_name="manufacturing_chat_app", user_id=user_id, session_id=session_id
+    )
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    return {"enabled": session.state.get(VannaTool.RESULT_CACHE_SETTING_KEY, True) is not False}
+
+@app.put("/api/settings/result-cache", response_model=Dict)
+async def set_result_cache_setting(user_id: str, session_id: str, enabled: bool):
+    """
+    Turns the result cache on or off for a user. The setting is user-scoped session state, so
+    the session only identifies where the change is recorded; it applies to all of the user's sessions.
+    """
+    session = await session_service.get_session(
+        app_name="manufacturing_chat_app", user_id=user_id, session_id=session_id
+    )
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    await session_service.append_event(
+        session,
+        Event(author="user", actions=EventActions(state_delta={VannaTool.RESULT_CACHE_SETTING_KEY: enabled})),
+    )
+    return {"enabled": enabled}
+
+@app.get("/api/metrics", response_model=Dict)
+async def get_metrics():
+    """
+    Returns runtime metrics (cache hit rates, evictions) for the data agent.
+    """
+    return {
+        "sql_cache": sqlCache.stats() if sqlCache else None,
+        "sql_templates": sqlTemplates.stats() if sqlTemplates else None,
+        "sql_generation": dataAgent.timing_stats(),
+        "prompt_budget": promptBuilder.stats() if promptBuilder else None,
+        "query_guard": queryGuard.stats() if queryGuard else None,
+        "postgres_pool": pgPool.stats(),
+        "result_cache": resultCache.stats() if resultCache else None,
+        "result_store": resultStore.stats() if resultStore else None,
+        "conversation_archive": conversationArchive.stats() if conversationArchive else None,
+        "conversation_state": VannaConversationTracker.stats(),
+        "figure_render_pool": renderPool.stats() if renderPool else None,
+        "plotly_sandbox": plotlyExecutor.stats() if plotlyExecutor else None,
+        "plotly_code_cache": plotlyCodeCache.stats() if plotlyCodeCache else None,
+        "chart_synthesizer": chartSynthesizer.stats() if chartSynthesizer else None,
+        "artifact_store": artifact_service.stats(),
+        "chart_export": chart_export_service.stats(),
+        "figure_resampler": figureResampler.stats() if figureResampler else None,
+    }
+
 # app.add_middleware(CopilotKitAuthMiddleware)
 
 # Add the ADK endpoint
@@ -24,6 +24,23 @@ PASSWORD=os.getenv("PASSWORD")
 OPENAI_API_KEY=os.getenv("OPENAI_API_KEY")
 OPENAI_MODEL = os.getenv("OPENAI_MODEL")
 
+# Semantic question-to-SQL cache
+SQL_CACHE_ENABLED = os.getenv("SQL_CACHE_ENABLED", "true").lower() == "true"
+SQL_CACHE_DISTANCE_THRESHOLD = float(os.getenv("SQL_CACHE_DISTANCE_THRESHOLD", "0.08"))
+SQL_CACHE_MAX_ENTRIES = int(os.getenv("SQL_CACHE_MAX_ENTRIES", "512"))
+SQL_CACHE_TTL_SECONDS = int(os.getenv("SQL_CACHE_TTL_SECONDS", "86400"))
+
+# Parameterized SQL templates learned from trained question/SQL pairs
+SQL_TEMPLATES_ENABLED = os.getenv("SQL_TEMPLATES_ENABLED", "true").lower() == "true"
+SQL_TEMPLATE_MIN_CONFIDENCE = float(os.getenv("SQL_TEMPLATE_MIN_CONFIDENCE", "0.8"))
+
+# Token-budgeted prompt assembly for SQL and Plotly generation
+PROMPT_BUDGET_ENABLED = os.getenv("PROMPT_BUDGET_ENABLED", "true").lower() == "true"
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "6000"))
+PROMPT_MAX_CHUNK_TOKENS = int(os.getenv("PROMPT_MAX_CHUNK_TOKENS", "800"))
+PROMPT_MAX_COLUMNS_PER_TABLE = int(os.getenv("PROMPT_MAX_COLUMNS_PER_TABLE", "30"))
+PROMPT_MAX_METADATA_TOKENS = int(os.getenv("PROMPT_MAX_METADATA_TOKENS", "1000"))
+
 logger.info(f"Environment variables have been set.")
 logger.debug(f"COMPLEX_GEMINI_MODEL: {COMPLEX_GEMINI_MODEL}")
 logger.debug(f"SIMPLE_GEMINI_MODEL: {SIMPLE_GEMINI_MODEL}")
@@ -53,3 +70,87 @@ def get_llm_config(prefer_complex_model: bool = True) -> dict:
             model_name = "gemini-2.5-flash"
     return {"provider": provider, "api_key": api_key, "model_name": model_name}
 
+
+# EXPLAIN-based cost guard run before generated SQL is executed
+QUERY_GUARD_ENABLED = os.getenv("QUERY_GUARD_ENABLED", "true").lower() == "true"
+QUERY_GUARD_MAX_COST = float(os.getenv("QUERY_GUARD_MAX_COST", "5000000"))
+QUERY_GUARD_MAX_SCAN_ROWS = int(os.getenv("QUERY_GUARD_MAX_SCAN_ROWS", "5000000"))
+QUERY_GUARD_MAX_RESULT_ROWS = int(os.getenv("QUERY_GUARD_MAX_RESULT_ROWS", "50000"))
+QUERY_GUARD_DEFAULT_WINDOW = os.getenv("QUERY_GUARD_DEFAULT_WINDOW", "30 days")
+
+# Shared PostgreSQL connection pool behind CustomVanna.run_sql
+PG_POOL_MIN_SIZE = int(os.getenv("PG_POOL_MIN_SIZE", "1"))
+PG_POOL_MAX_SIZE = int(os.getenv("PG_POOL_MAX_SIZE", "10"))
+PG_POOL_ACQUIRE_TIMEOUT = float(os.getenv("PG_POOL_ACQUIRE_TIMEOUT", "10"))
+PG_STATEMENT_TIMEOUT_MS = int(os.getenv("PG_STATEMENT_TIMEOUT_MS", "60000"))
+
+# Historian query streaming limits
+HISTORIAN_MAX_ROWS = int(os.getenv("HISTORIAN_MAX_ROWS", "100000"))
+HISTORIAN_MAX_BYTES = int(os.getenv("HISTORIAN_MAX_BYTES", str(50 * 1024 * 1024)))
+HISTORIAN_FETCH_BATCH_SIZE = int(os.getenv("HISTORIAN_FETCH_BATCH_SIZE", "1000"))
+
+# Columnar (Arrow) query results, converted to rows/DataFrames only at the tool boundary
+COLUMNAR_RESULTS_ENABLED = os.getenv("COLUMNAR_RESULTS_ENABLED", "false").lower() == "true"
+PG_FETCH_SIZE = int(os.getenv("PG_FETCH_SIZE", "5000"))
+
+# Watermark-invalidated cache of executed SQL results
+RESULT_CACHE_ENABLED = os.getenv("RESULT_CACHE_ENABLED", "true").lower() == "true"
+RESULT_CACHE_MAX_BYTES = int(os.getenv("RESULT_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+RESULT_CACHE_MAX_ENTRY_BYTES = int(os.getenv("RESULT_CACHE_MAX_ENTRY_BYTES", str(32 * 1024 * 1024)))
+RESULT_CACHE_TTL_SECONDS = int(os.getenv("RESULT_CACHE_TTL_SECONDS", "900"))
+RESULT_CACHE_WATERMARK_POLL_SECONDS = float(os.getenv("RESULT_CACHE_WATERMARK_POLL_SECONDS", "30"))
+# Results of SQL calling NOW()/CURRENT_DATE are reused only within the same bucket of wall-clock time
+RESULT_CACHE_CLOCK_BUCKET_SECONDS = float(os.getenv("RESULT_CACHE_CLOCK_BUCKET_SECONDS", "60"))
+
+# Query results are kept out of session state, in compressed Parquet files referenced by id
+RESULT_STORE_ENABLED = os.getenv("RESULT_STORE_ENABLED", "true").lower() == "true"
+RESULT_STORE_PATH = os.getenv("RESULT_STORE_PATH", "query_results")
+RESULT_STORE_MAX_AGE_SECONDS = int(os.getenv("RESULT_STORE_MAX_AGE_SECONDS", str(7 * 86400)))
+
+# Conversation history kept in session state; evicted conversations go to a cold archive table
+CONVERSATION_MAX_PER_SESSION = int(os.getenv("CONVERSATION_MAX_PER_SESSION", "20"))
+CONVERSATION_MAX_AGE_SECONDS = int(os.getenv("CONVERSATION_MAX_AGE_SECONDS", "0"))  # 0 disables age eviction
+CONVERSATION_ARCHIVE_ENABLED = os.getenv("CONVERSATION_ARCHIVE_ENABLED", "true").lower() == "true"
+
+# Warm Kaleido renderers (one Chromium, RENDER_POOL_WORKERS tabs) for figure image export
+RENDER_POOL_ENABLED = os.getenv("RENDER_POOL_ENABLED", "true").lower() == "true"
+RENDER_POOL_WORKERS = int(os.getenv("RENDER_POOL_WORKERS", "2"))
+RENDER_POOL_MAX_QUEUE = int(os.getenv("RENDER_POOL_MAX_QUEUE", "16"))
+RENDER_POOL_JOB_TIMEOUT = float(os.getenv("RENDER_POOL_JOB_TIMEOUT", "60"))
+
+# Chart artifact format: "json" (figure JSON, compressed by the artifact store, + shared plotly.js) or "html" (self-contained)
+CHART_ARTIFACT_FORMAT = os.getenv("CHART_ARTIFACT_FORMAT", "json").lower()
+
+# Sandbox worker processes executing generated Plotly code (memory and CPU-time capped)
+PLOTLY_SANDBOX_ENABLED = os.getenv("PLOTLY_SANDBOX_ENABLED", "true").lower() == "true"
+PLOTLY_SANDBOX_WORKERS = int(os.getenv("PLOTLY_SANDBOX_WORKERS", "2"))
+PLOTLY_SANDBOX_MAX_QUEUE = int(os.getenv("PLOTLY_SANDBOX_MAX_QUEUE", "16"))
+PLOTLY_SANDBOX_TIMEOUT = float(os.getenv("PLOTLY_SANDBOX_TIMEOUT", "30"))
+PLOTLY_SANDBOX_MEMORY_MB = int(os.getenv("PLOTLY_SANDBOX_MEMORY_MB", "2048"))
+PLOTLY_SANDBOX_CPU_SECONDS = float(os.getenv("PLOTLY_SANDBOX_CPU_SECONDS", "20"))
+
+# Generated Plotly code cache keyed by (normalized question, result schema fingerprint)
+PLOTLY_CODE_CACHE_ENABLED = os.getenv("PLOTLY_CODE_CACHE_ENABLED", "true").lower() == "true"
+PLOTLY_CODE_CACHE_MAX_ENTRIES = int(os.getenv("PLOTLY_CODE_CACHE_MAX_ENTRIES", "512"))
+PLOTLY_CODE_CACHE_TTL_SECONDS = float(os.getenv("PLOTLY_CODE_CACHE_TTL_SECONDS", "86400"))
+
+# Rule-based Plotly code for common result shapes (time series, category bars, KPIs) without an LLM call
+CHART_SYNTHESIZER_ENABLED = os.getenv("CHART_SYNTHESIZER_ENABLED", "true").lower() == "true"
+
+# Large-series mode: WebGL traces with a min-max decimated overview, detail served on zoom
+LARGE_FIGURE_ENABLED = os.getenv("LARGE_FIGURE_ENABLED", "true").lower() == "true"
+LARGE_FIGURE_POINT_THRESHOLD = int(os.getenv("LARGE_FIGURE_POINT_THRESHOLD", "5000"))
+LARGE_FIGURE_MAX_POINTS = int(os.getenv("LARGE_FIGURE_MAX_POINTS", "4000"))
+
+# Transparent compression of artifact payloads (zstd when installed, gzip otherwise)
+ARTIFACT_COMPRESSION_ENABLED = os.getenv("ARTIFACT_COMPRESSION_ENABLED", "true").lower() == "true"
+# Train a zstd dictionary on stored charts (HTML and figure JSON) at startup (requires zstandard)
+ARTIFACT_COMPRESSION_DICTIONARY_ENABLED = os.getenv("ARTIFACT_COMPRESSION_DICTIONARY_ENABLED", "true").lower() == "true"
+
+# Read cache of artifact versions: in-memory LRU plus an optional local disk tier (empty path disables it)
+ARTIFACT_CACHE_ENABLED = os.getenv("ARTIFACT_CACHE_ENABLED", "true").lower() == "true"
+ARTIFACT_CACHE_MAX_BYTES = int(os.getenv("ARTIFACT_CACHE_MAX_BYTES", str(128 * 1024 * 1024)))
+ARTIFACT_CACHE_MAX_ENTRY_BYTES = int(os.getenv("ARTIFACT_CACHE_MAX_ENTRY_BYTES", str(16 * 1024 * 1024)))
+ARTIFACT_CACHE_DISK_PATH = os.getenv("ARTIFACT_CACHE_DISK_PATH", "")
+ARTIFACT_CACHE_DISK_MAX_BYTES = int(os.getenv("ARTIFACT_CACHE_DISK_MAX_BYTES", str(1024 * 1024 * 1024)))
+ARTIFACT_CACHE_LATEST_TTL_SECONDS = float(os.getenv("ARTIFACT_CACHE_LATEST_TTL_SECONDS", "30"))
@@ -4,20 +4,35 @@ from src.agents.repositories import (
     HistorianDatabaseRepository, 
     CustomVanna, 
     VannaRepository,
-    ReportingRepository
+    ReportingRepository,
+    SemanticSQLCache,
+    SQLTemplateEngine,
+    PromptBuilder,
+    PostgresConnectionPool,
+    SQLResultCache,
+    QueryResultStore,
+    ConversationArchiveRepository,
+    PlotlyCodeCache,
+    ArtifactCache
 )
 
 from src.agents.services import (
     HistorianDatabaseService,
     VannaService,
-    ReportingService
+    ReportingService,
+    QueryCostGuard,
+    FigureRenderPool,
+    PlotlyCodeExecutor,
+    ChartSynthesizer,
+    FigureResampler
 )
 
 from src.agents.tools import (
     DatabaseTool, 
     ReportingTool, 
     VisualizationTool, 
-    VannaTool
+    VannaTool,
+    VannaConversationTracker
 )
 
 from src.agents.sub_agents import (
@@ -27,13 +42,42 @@ from src.agents.sub_agents import (
     VannaDataAgentManager
     )
 
-from src.core.config import MSSQL, CHROMA_PATH, HOST, PORT, DBNAME, USER, PASSWORD
+from src.core.config import (
+    MSSQL, CHROMA_PATH, HOST, PORT, DBNAME, USER, PASSWORD,
+    SQL_CACHE_ENABLED, SQL_CACHE_DISTANCE_THRESHOLD, SQL_CACHE_MAX_ENTRIES, SQL_CACHE_TTL_SECONDS,
+    SQL_TEMPLATES_ENABLED, SQL_TEMPLATE_MIN_CONFIDENCE,
+    PROMPT_BUDGET_ENABLED, PROMPT_TOKEN_BUDGET, PROMPT_MAX_CHUNK_TOKENS, PROMPT_MAX_COLUMNS_PER_TABLE,
+    PROMPT_MAX_METADATA_TOKENS,
+    QUERY_GUARD_ENABLED, QUERY_GUARD_MAX_COST, QUERY_GUARD_MAX_SCAN_ROWS, QUERY_GUARD_MAX_RESULT_ROWS,
+    QUERY_GUARD_DEFAULT_WINDOW,
+    PG_POOL_MIN_SIZE, PG_POOL_MAX_SIZE, PG_POOL_ACQUIRE_TIMEOUT, PG_STATEMENT_TIMEOUT_MS,
+    HISTORIAN_MAX_ROWS, HISTORIAN_MAX_BYTES, HISTORIAN_FETCH_BATCH_SIZE,
+    COLUMNAR_RESULTS_ENABLED, PG_FETCH_SIZE,
+    RESULT_CACHE_ENABLED, RESULT_CACHE_MAX_BYTES, RESULT_CACHE_MAX_ENTRY_BYTES, RESULT_CACHE_TTL_SECONDS,
+    RESULT_CACHE_WATERMARK_POLL_SECONDS, RESULT_CACHE_CLOCK_BUCKET_SECONDS,
+    RESULT_STORE_ENABLED, RESULT_STORE_PATH, RESULT_STORE_MAX_AGE_SECONDS,
+    CONVERSATION_MAX_PER_SESSION, CONVERSATION_MAX_AGE_SECONDS, CONVERSATION_ARCHIVE_ENABLED,
+    RENDER_POOL_ENABLED, RENDER_POOL_WORKERS, RENDER_POOL_MAX_QUEUE, RENDER_POOL_JOB_TIMEOUT,
+    CHART_ARTIFACT_FORMAT,
+    PLOTLY_SANDBOX_ENABLED, PLOTLY_SANDBOX_WORKERS, PLOTLY_SANDBOX_MAX_QUEUE, PLOTLY_SANDBOX_TIMEOUT,
+    PLOTLY_SANDBOX_MEMORY_MB, PLOTLY_SANDBOX_CPU_SECONDS,
+    PLOTLY_CODE_CACHE_ENABLED, PLOTLY_CODE_CACHE_MAX_ENTRIES, PLOTLY_CODE_CACHE_TTL_SECONDS,
+    CHART_SYNTHESIZER_ENABLED,
+    LARGE_FIGURE_ENABLED, LARGE_FIGURE_POINT_THRESHOLD, LARGE_FIGURE_MAX_POINTS,
+    ARTIFACT_CACHE_ENABLED, ARTIFACT_CACHE_MAX_BYTES, ARTIFACT_CACHE_MAX_ENTRY_BYTES, ARTIFACT_CACHE_DISK_PATH,
+    ARTIFACT_CACHE_DISK_MAX_BYTES, ARTIFACT_CACHE_LATEST_TTL_SECONDS
+)
 
 
 # --- Custom Database and Visualization Agent ---
-historianDatabaseRepository=HistorianDatabaseRepository(connection_string=MSSQL)
+historianDatabaseRepository=HistorianDatabaseRepository(
+    connection_string=MSSQL,
+    max_rows=HISTORIAN_MAX_ROWS,
+    max_bytes=HISTORIAN_MAX_BYTES,
+    batch_size=HISTORIAN_FETCH_BATCH_SIZE,
+)
 historianDatabaseService=HistorianDatabaseService(repository=historianDatabaseRepository)
-databaseTool=DatabaseTool(service=historianDatabaseService)
+databaseTool=DatabaseTool(service=historianDatabaseService, columnar_results=COLUMNAR_RESULTS_ENABLED)
 databaseAgentManager = DatabaseAgentManager(database_tool=databaseTool)
 
 visualizationTool=VisualizationTool()
@@ -42,19 +86,40 @@ visualizationAgentManager = VisualizationAgentManager(visualization_tool=visuali
 
 # --- Custom Vanna Agent ---
 
-dataAgent = CustomVanna({"path":CHROMA_PATH})
+promptBuilder = PromptBuilder(
+    token_budget=PROMPT_TOKEN_BUDGET,
+    max_chunk_tokens=PROMPT_MAX_CHUNK_TOKENS,
+    max_columns_per_table=PROMPT_MAX_COLUMNS_PER_TABLE,
+    max_metadata_tokens=PROMPT_MAX_METADATA_TOKENS,
+) if PROMPT_BUDGET_ENABLED else None
+
+dataAgent = CustomVanna({"path":CHROMA_PATH}, prompt_builder=promptBuilder)
 
 # dataAgent.connect_to_mssql(
 #     odbc_conn_str='DRIVER={ODBC Driver 17 for SQL Server};SERVER=localhost,54180;DATABASE=power;UID=n8n;PWD=password'
 # )
 
-dataAgent.connect_to_postgres(
+# dataAgent.connect_to_postgres(
+#     host=HOST,
+#     dbname=DBNAME,
+#     user=USER,
+#     password=PASSWORD,
+#     port=PORT,
+# )
+
+pgPool = PostgresConnectionPool(
     host=HOST,
     dbname=DBNAME,
     user=USER,
     password=PASSWORD,
     port=PORT,
+    min_size=PG_POOL_MIN_SIZE,
+    max_size=PG_POOL_MAX_SIZE,
+    acquire_timeout=PG_POOL_ACQUIRE_TIMEOUT,
+    statement_timeout_ms=PG_STATEMENT_TIMEOUT_MS,
+    fetch_size=PG_FETCH_SIZE,
 )
+dataAgent.connect_to_postgres_pool(pgPool)
 
 try:
     # Use the 'run_sql' method (common in Vanna) to run a simple query
@@ -66,9 +131,98 @@ try:
 except Exception as e:
     print(f"❌ Database connection test failed: {e}")
 
-vannaRepository = VannaRepository(vanna_model=dataAgent)
-vannaService = VannaService(repository=vannaRepository)
-vannaTool = VannaTool(service=vannaService)
+sqlCache = SemanticSQLCache(
+    distance_threshold=SQL_CACHE_DISTANCE_THRESHOLD,
+    max_entries=SQL_CACHE_MAX_ENTRIES,
+    ttl_seconds=SQL_CACHE_TTL_SECONDS,
+) if SQL_CACHE_ENABLED else None
+
+sqlTemplates = SQLTemplateEngine(min_confidence=SQL_TEMPLATE_MIN_CONFIDENCE) if SQL_TEMPLATES_ENABLED else None
+
+plotlyCodeCache = PlotlyCodeCache(
+    max_entries=PLOTLY_CODE_CACHE_MAX_ENTRIES,
+    ttl_seconds=PLOTLY_CODE_CACHE_TTL_SECONDS or None,
+) if PLOTLY_CODE_CACHE_ENABLED else None
+
+vannaRepository = VannaRepository(
+    vanna_model=dataAgent,
+    sql_cache=sqlCache,
+    sql_templates=sqlTemplates,
+    plotly_code_cache=plotlyCodeCache,
+)
+queryGuard = QueryCostGuard(
+    repository=vannaRepository,
+    max_cost=QUERY_GUARD_MAX_COST,
+    max_scan_rows=QUERY_GUARD_MAX_SCAN_ROWS,
+    max_result_rows=QUERY_GUARD_MAX_RESULT_ROWS,
+    default_window=QUERY_GUARD_DEFAULT_WINDOW,
+) if QUERY_GUARD_ENABLED else None
+
+resultCache = SQLResultCache(
+    run_sql=vannaRepository.run_sql,
+    max_bytes=RESULT_CACHE_MAX_BYTES,
+    max_entry_bytes=RESULT_CACHE_MAX_ENTRY_BYTES,
+    ttl_seconds=RESULT_CACHE_TTL_SECONDS,
+    watermark_poll_seconds=RESULT_CACHE_WATERMARK_POLL_SECONDS,
+    clock_bucket_seconds=RESULT_CACHE_CLOCK_BUCKET_SECONDS,
+) if RESULT_CACHE_ENABLED else None
+
+plotlyExecutor = PlotlyCodeExecutor(
+    max_workers=PLOTLY_SANDBOX_WORKERS,
+    max_queue=PLOTLY_SANDBOX_MAX_QUEUE,
+    job_timeout=PLOTLY_SANDBOX_TIMEOUT,
+    memory_limit_mb=PLOTLY_SANDBOX_MEMORY_MB or None,
+    cpu_seconds=PLOTLY_SANDBOX_CPU_SECONDS or None,
+) if PLOTLY_SANDBOX_ENABLED else None
+
+chartSynthesizer = ChartSynthesizer() if CHART_SYNTHESIZER_ENABLED else None
+
+vannaService = VannaService(
+    repository=vannaRepository,
+    query_guard=queryGuard,
+    result_cache=resultCache,
+    plotly_executor=plotlyExecutor,
+    chart_synthesizer=chartSynthesizer,
+)
+resultStore = QueryResultStore(
+    path=RESULT_STORE_PATH,
+    max_age_seconds=RESULT_STORE_MAX_AGE_SECONDS,
+) if RESULT_STORE_ENABLED else None
+
+artifactCache = ArtifactCache(
+    max_bytes=ARTIFACT_CACHE_MAX_BYTES,
+    max_entry_bytes=ARTIFACT_CACHE_MAX_ENTRY_BYTES,
+    disk_path=ARTIFACT_CACHE_DISK_PATH or None,
+    disk_max_bytes=ARTIFACT_CACHE_DISK_MAX_BYTES,
+    latest_ttl_seconds=ARTIFACT_CACHE_LATEST_TTL_SECONDS or None,
+) if ARTIFACT_CACHE_ENABLED else None
+
+conversationArchive = ConversationArchiveRepository(pool=pgPool) if CONVERSATION_ARCHIVE_ENABLED else None
+VannaConversationTracker.configure(
+    max_conversations=CONVERSATION_MAX_PER_SESSION or None,
+    max_age_seconds=CONVERSATION_MAX_AGE_SECONDS or None,
+    archive=conversationArchive,
+)
+
+renderPool = FigureRenderPool(
+    max_workers=RENDER_POOL_WORKERS,
+    max_queue=RENDER_POOL_MAX_QUEUE,
+    job_timeout=RENDER_POOL_JOB_TIMEOUT,
+) if RENDER_POOL_ENABLED else None
+
+figureResampler = FigureResampler(
+    result_store=resultStore,
+    point_threshold=LARGE_FIGURE_POINT_THRESHOLD,
+    max_points=LARGE_FIGURE_MAX_POINTS,
+) if LARGE_FIGURE_ENABLED else None
+
+vannaTool = VannaTool(
+    service=vannaService,
+    columnar_results=COLUMNAR_RESULTS_ENABLED,
+    result_store=resultStore,
+    chart_artifact_format=CHART_ARTIFACT_FORMAT,
+    figure_resampler=figureResampler,
+)
 data_agent = VannaDataAgentManager(vanna_tool=vannaTool)
 # --- Custom Vanna Agent ---
 
@@ -14,6 +14,18 @@ class DataAgentRepositoryError(Exception):
     """Custom exception for general errors within the DataAgentRepository."""
     pass
 
+class ConnectionPoolTimeoutError(Exception):
+    """Raised when no pooled database connection becomes available within the acquire timeout."""
+    pass
+
+class WorkerPoolBusyError(Exception):
+    """Raised when a worker pool's queue is full and a job cannot be accepted."""
+    pass
+
+class WorkerPoolTimeoutError(Exception):
+    """Raised when a worker pool job does not finish within its timeout."""
+    pass
+
 class ReportingServiceError(Exception):
     """Custom exception for general errors within the ReportingService."""
     pass
@@ -1,4 +1,4 @@
-from typing import Dict, Optional, Protocol, Any, List
+from typing import Dict, Iterator, Optional, Protocol, Any, List
 from datetime import datetime
 from pandas import DataFrame
 from plotly.graph_objs import Figure
@@ -97,6 +97,18 @@ class VannaRepositoryProtocol(Protocol):
     def run_sql(self, sql: str) -> DataFrame:
         ...
 
+    async def run_sql_async(self, sql: str) -> DataFrame:
+        ...
+
+    def run_sql_arrow(self, sql: str) -> Any:
+        ...
+
+    async def run_sql_arrow_async(self, sql: str) -> Any:
+        ...
+
+    def explain_sql(self, sql: str) -> Any:
+        ...
+
     def generate_plotly_code(self, question: str, sql: str, df_metadata: str = None) -> str:
         ...
 
@@ -113,31 +125,55 @@ class VannaServiceProtocol(Protocol):
     def run_sql(self, request: RunSQLRequestDTO) -> ResponseDTO[RunSQLResultDTO]:
         ...
 
+    async def run_sql_async(self, request: RunSQLRequestDTO) -> ResponseDTO[RunSQLResultDTO]:
+        ...
+
     def generate_plotly_code(self, request: GeneratePlotlyCodeRequestDTO) -> ResponseDTO[GeneratePlotlyCodeResultDTO]:
         ...
 
     def get_plotly_figure(self, request: GetPlotlyFigureRequestDTO) -> ResponseDTO[GetPlotlyFigureResultDTO]:
         ...
 
+    async def get_plotly_figure_async(self, request: GetPlotlyFigureRequestDTO) -> ResponseDTO[GetPlotlyFigureResultDTO]:
+        ...
+
 class HistorianDatabaseRepositoryProtocol(Protocol):
     """
     Protocol for data access operations using DTOs.
     """
-    def execute_query(self, query:str, parameters: Dict[str, str]) -> Dict[str, Any]:
+    def execute_query(self, query:str, parameters: Dict[str, str], max_rows: Optional[int] = None, max_bytes: Optional[int] = None) -> Dict[str, Any]:
         """
         Executes a raw SQL query and returns the results wrapped in a ResponseDTO.
         """
         ...
 
+    def execute_query_columnar(self, query: str, parameters: Optional[Dict[str, Any]] = None, max_rows: Optional[int] = None, max_bytes: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Executes a raw SQL query into a pyarrow.Table without building per-row objects.
+        """
+        ...
+
+    def stream_query(self, query: str, parameters: Optional[Dict[str, Any]] = None, batch_size: Optional[int] = None) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Executes a raw SQL query on a server-side cursor and yields batches of rows.
+        """
+        ...
+
 class HistorianDatabaseServiceProtocol(Protocol):
     def execute_query(self, request: DatabaseQueryRequestDTO) -> QueryResultDTO:
         """
         Executes a raw SQL query using DTOs.
         """
         ...
+
+    def stream_query(self, request: DatabaseQueryRequestDTO, batch_size: Optional[int] = None) -> Iterator[QueryResultDTO]:
+        """
+        Streams a raw SQL query as QueryResultDTO chunks.
+        """
+        ...
         
 class DatabaseToolProtocol(Protocol):
-    def execute_query(self, query: str, parameters: Optional[Dict] = None) -> Dict[str, Any]:
+    def execute_query(self, query: str, parameters: Optional[Dict] = None, max_rows: Optional[int] = None) -> Dict[str, Any]:
         """
         Executes a raw SQL query using DTOs.
         """